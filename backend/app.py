@@ -1,44 +1,77 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import logging
+import multiprocessing
 import datetime
 import os
-from functools import wraps
+from functools import partial, wraps
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from bs4 import BeautifulSoup
+import soupsieve as sv
 import json
+import csv
+import io
+import html
+import hashlib
+import gzip
+import codecs
+import re
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 import time
+from collections import OrderedDict, namedtuple
+import threading
+import queue
+import atexit
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import socket
+from urllib.parse import quote, urlparse
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+# Request-path messages are logged at DEBUG, so they stay quiet unless LOG_LEVEL=DEBUG
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('bolt')
 
 app = Flask(__name__)
 CORS(app,
     resources={r"/api/*": {
         "origins": ["http://localhost:3000", "http://localhost:3001", "https://tahazouhair.github.io", "https://bolt-backend-xu7f.onrender.com"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Type", "Authorization"],
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "Last-Event-ID"],
+        "expose_headers": ["Content-Type", "Authorization", "ETag"],
         "supports_credentials": True,
         "send_wildcard": False
     }}
 )
 
 # Configuration
-print("Loading configuration...")
+logger.info("Loading configuration...")
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key')
 
 # Database Configuration
 database_url = os.environ.get('DATABASE_URL')
 if database_url:
     # Clean and print the database URL (without sensitive info)
-    print("Database URL found in environment")
+    logger.info("Database URL found in environment")
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     masked_url = database_url.split('@')[0] + '@' + '****'
-    print(f"Using database URL: {masked_url}")
+    logger.info("Using database URL: %s", masked_url)
     
     # Configure SQLAlchemy
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
@@ -47,40 +80,327 @@ if database_url:
         'pool_recycle': 300,
     }
 else:
-    print("No DATABASE_URL found, using SQLite")
+    logger.info("No DATABASE_URL found, using SQLite")
     sqlite_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{sqlite_path}'
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize extensions
-print("Initializing database...")
+logger.info("Initializing database...")
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 
+class TTLCache:
+    """Thread-safe, size-bounded LRU mapping whose entries expire after a TTL.
+
+    Each gunicorn worker holds its own instances; nothing here is shared
+    between processes.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+# Metrics
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # Bearer token required by /api/metrics when set
+# Directory gunicorn workers share snapshots through, so /api/metrics reports
+# every worker; set METRICS_DIR to an empty string to report one worker only
+app.config['METRICS_DIR'] = os.environ.get(
+    'METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics'))
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 15))  # seconds
+app.config['METRICS_STALE_AFTER'] = float(os.environ.get('METRICS_STALE_AFTER', 300))  # seconds
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class MetricsRegistry:
+    """Prometheus-style counters, gauges and histograms for one worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._values = {}  # (name, labels) -> float, or [bucket counts, sum, count]
+        self._collectors = []  # callables returning [(name, labels, value)] gauges at snapshot time
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text):
+        self._meta[name] = ('gauge', help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def collector(self, func):
+        self._collectors.append(func)
+        return func
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        buckets = self._meta[name][2]
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of every series, tagged with this worker's identity."""
+        with self._lock:
+            series = [[name, dict(labels), value if not isinstance(value, list) else
+                       [list(value[0]), value[1], value[2]]]
+                      for (name, labels), value in self._values.items()]
+        for collect in self._collectors:
+            try:
+                series.extend([name, labels, value] for name, labels, value in collect())
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", collect.__name__, e)
+        return {'worker': worker_id(), 'pid': os.getpid(), 'time': time.time(), 'series': series}
+
+    def render(self, snapshots):
+        """Prometheus text exposition for a list of worker snapshots."""
+        grouped = {}
+        for snap in snapshots:
+            for name, labels, value in snap['series']:
+                grouped.setdefault(name, []).append((dict(labels, worker=snap['worker']), value))
+
+        def fmt(labels):
+            if not labels:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+            return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+        lines = []
+        for name in sorted(grouped):
+            kind, help_text, buckets = self._meta.get(name, ('gauge', name, None))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in grouped[name]:
+                if kind != 'histogram':
+                    lines.append(f'{name}{fmt(labels)} {value}')
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{fmt(dict(labels, le=str(bound)))} {cumulative}')
+                lines.append(f'{name}_bucket{fmt(dict(labels, le="+Inf"))} {count}')
+                lines.append(f'{name}_sum{fmt(labels)} {total}')
+                lines.append(f'{name}_count{fmt(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+WORKER_STARTED_AT = time.time()
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+metrics = MetricsRegistry()
+metrics.histogram('bolt_http_request_duration_seconds', 'Request latency by route')
+metrics.counter('bolt_http_requests_total', 'Requests by route, method and status')
+metrics.counter('bolt_db_queries_total', 'SQLAlchemy queries executed, by route')
+metrics.counter('bolt_db_query_seconds_total', 'Time spent in SQLAlchemy queries, by route')
+metrics.histogram('bolt_db_queries_per_request', 'SQLAlchemy queries per request', QUERY_COUNT_BUCKETS)
+metrics.counter('bolt_scrape_cache_lookups_total', 'Scrape cache lookups by tier and result')
+metrics.counter('bolt_scrape_revalidations_total', 'Conditional product page fetches by result')
+metrics.counter('bolt_scrape_download_bytes_total', 'Product page bytes read, by how the download ended')
+metrics.histogram('bolt_outbound_request_duration_seconds', 'Outbound fetch latency by host')
+metrics.counter('bolt_outbound_requests_total', 'Outbound fetches by host and status')
+metrics.gauge('bolt_worker_info', 'Worker identity')
+metrics.gauge('bolt_worker_start_time_seconds', 'Unix time this worker started')
+
+@metrics.collector
+def worker_info_metrics():
+    return [
+        ('bolt_worker_info', {'pid': str(os.getpid()), 'hostname': socket.gethostname()}, 1),
+        ('bolt_worker_start_time_seconds', {}, WORKER_STARTED_AT)
+    ]
+
+def metrics_route():
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context() and 'metrics_started' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+    else:
+        metrics.inc('bolt_db_queries_total', {'route': 'background'})
+        metrics.inc('bolt_db_query_seconds_total', {'route': 'background'}, elapsed)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+    ensure_metrics_flusher()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_started' not in g:
+        return response
+    route = metrics_route()
+    elapsed = time.perf_counter() - g.metrics_started
+    metrics.observe('bolt_http_request_duration_seconds', elapsed, {'route': route, 'method': request.method})
+    metrics.inc('bolt_http_requests_total', {'route': route, 'method': request.method, 'status': str(response.status_code)})
+    metrics.inc('bolt_db_queries_total', {'route': route}, g.db_queries)
+    metrics.inc('bolt_db_query_seconds_total', {'route': route}, g.db_seconds)
+    metrics.observe('bolt_db_queries_per_request', g.db_queries, {'route': route})
+    return response
+
+def metrics_snapshot_path():
+    return os.path.join(app.config['METRICS_DIR'], f'{socket.gethostname()}-{os.getpid()}.json')
+
+def flush_metrics():
+    """Write this worker's snapshot to METRICS_DIR so any worker can serve the totals."""
+    if not app.config['METRICS_DIR']:
+        return
+    os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+    path = metrics_snapshot_path()
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics.snapshot(), f)
+    os.replace(tmp_path, path)
+
+_metrics_flusher_pid = None
+_metrics_flusher_lock = threading.Lock()
+
+def ensure_metrics_flusher():
+    global _metrics_flusher_pid
+    if not app.config['METRICS_DIR'] or _metrics_flusher_pid == os.getpid():
+        return
+    with _metrics_flusher_lock:
+        if _metrics_flusher_pid == os.getpid():
+            return
+        _metrics_flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(app.config['METRICS_FLUSH_INTERVAL'])
+                try:
+                    flush_metrics()
+                except OSError as e:
+                    logger.warning("Metrics flush failed: %s", e)
+
+        threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+def collect_metrics_snapshots():
+    snapshots = [metrics.snapshot()]
+    if not app.config['METRICS_DIR'] or not os.path.isdir(app.config['METRICS_DIR']):
+        return snapshots
+    own_path = metrics_snapshot_path()
+    cutoff = time.time() - app.config['METRICS_STALE_AFTER']
+    for name in os.listdir(app.config['METRICS_DIR']):
+        path = os.path.join(app.config['METRICS_DIR'], name)
+        if not name.endswith('.json') or path == own_path:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.debug("Skipping metrics snapshot %s: %s", name, e)
+    return snapshots
+
 def init_db():
-    print("Running database initialization...")
+    logger.info("Running database initialization...")
     max_retries = 3
     retry_delay = 5  # seconds
     
     for attempt in range(max_retries):
         try:
-            print(f"Attempt {attempt + 1}/{max_retries} to initialize database...")
+            logger.info("Attempt %d/%d to initialize database...", attempt + 1, max_retries)
             
             # Test database connection
             db.engine.connect()
-            print("Database connection successful")
+            logger.info("Database connection successful")
             
             # Create tables
             db.create_all()
-            print("Database tables created successfully")
+            ensure_indexes()
+            logger.info("Database tables created successfully")
             
             # Check if admin exists
             admin = User.query.filter_by(username='admin').first()
             if not admin:
-                print("Creating default admin user...")
-                hashed_password = generate_password_hash('admin')
+                logger.info("Creating default admin user...")
+                hashed_password = hash_password('admin')
                 default_admin = User(
                     username='admin',
                     password=hashed_password,
@@ -88,39 +408,27 @@ def init_db():
                 )
                 db.session.add(default_admin)
                 db.session.commit()
-                print("Default admin user created successfully")
+                logger.info("Default admin user created successfully")
             else:
-                print("Admin user already exists")
-            
+                logger.info("Admin user already exists")
+
+            ensure_cache_versions()
             return True
             
         except Exception as e:
-            print(f"Error during database initialization (attempt {attempt + 1}): {str(e)}")
+            logger.error("Error during database initialization (attempt %d): %s", attempt + 1, e)
             if attempt < max_retries - 1:
-                print(f"Retrying in {retry_delay} seconds...")
+                logger.info("Retrying in %d seconds...", retry_delay)
                 time.sleep(retry_delay)
             else:
-                print("Max retries reached. Database initialization failed.")
+                logger.error("Max retries reached. Database initialization failed.")
                 raise e
 
-def init_scrape_cache():
-    conn = sqlite3.connect('scrape_cache.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS scrape_cache
-                 (url TEXT PRIMARY KEY, brand TEXT, price TEXT, timestamp TEXT)''')
-    conn.commit()
-    conn.close()
-
-# Initialize the database
-with app.app_context():
-    try:
-        print("Starting application initialization...")
-        init_db()
-        init_scrape_cache()
-        print("Application initialization completed successfully")
-    except Exception as e:
-        print(f"Error during application initialization: {str(e)}")
-        raise e
+def ensure_indexes():
+    """Create indexes added to models after their tables already existed; create_all skips those."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 # Models
 class User(UserMixin, db.Model):
@@ -151,6 +459,143 @@ class Activity(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     action = db.Column(db.String(200), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Newest-first feed pages and per-user audit views
+    __table_args__ = (
+        db.Index('ix_activity_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_activity_user_id_timestamp', 'user_id', 'timestamp'),
+    )
+
+class ActivityRollup(db.Model):
+    # Activity counts per UTC day, user and action; outlives the raw rows
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(200), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.Index('ix_activity_rollup_user_id_day', 'user_id', 'day'),)
+
+class ActivityRetentionState(db.Model):
+    # Single row: how far activity has been rolled up and archived, and
+    # which worker currently holds the retention run
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_through = db.Column(db.Date)  # Days before this are in activity_rollup
+    archived_through = db.Column(db.Date)  # Raw rows before this day were archived and deleted
+    last_run_at = db.Column(db.DateTime)
+    run_owner = db.Column(db.String(100))
+    run_until = db.Column(db.Float)  # Unix time the run lease expires
+
+class CacheVersion(db.Model):
+    # Bumped in the same transaction as the data it describes, so every
+    # worker can tell when its in-process copy is out of date
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+CACHE_VERSION_NAMES = ['users', 'teams']
+
+class SheetSnapshot(db.Model):
+    # Last fetched copy of a Google Sheets range, shared by all workers
+    sheet_id = db.Column(db.String(100), primary_key=True)
+    range = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.String(40), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    values = db.Column(db.Text, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    refresh_owner = db.Column(db.String(100))
+    refresh_until = db.Column(db.Float)  # Unix time the refresh lease expires
+
+class ScrapeCache(db.Model):
+    # Scraped brand and price per product URL, shared by every worker and
+    # instance. failure* columns hold a tombstone: the last failure kind, how
+    # many times in a row it happened and when the URL may be fetched again.
+    # etag/last_modified are the page's validators for conditional requests.
+    __tablename__ = 'scrape_cache'
+    url = db.Column(db.String(2048), primary_key=True)
+    brand = db.Column(db.Text)
+    price = db.Column(db.Text)  # As shown on the page, e.g. '1,250'
+    price_value = db.Column(db.Numeric(12, 2))
+    timestamp = db.Column(db.DateTime, index=True)  # When the price was fetched
+    brand_timestamp = db.Column(db.DateTime)
+    failure = db.Column(db.String(20))
+    failure_count = db.Column(db.Integer, nullable=False, default=0)
+    failure_until = db.Column(db.Float)  # Unix time
+    failed_at = db.Column(db.DateTime)
+    etag = db.Column(db.Text)
+    last_modified = db.Column(db.Text)
+    __table_args__ = (db.Index('ix_scrape_cache_failure', 'failure', 'failure_until'),)
+
+# Per-worker cache of authenticated users
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))  # seconds
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1000))
+app.config['CACHE_VERSION_CHECK_INTERVAL'] = float(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 2))  # seconds
+
+AuthenticatedUser = namedtuple('AuthenticatedUser', ['id', 'username', 'role'])
+
+user_cache = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+
+_seen_cache_versions = {}  # name -> (version, checked_at)
+_acted_cache_versions = {}  # name -> version cache_version_changed last reported on
+_seen_cache_versions_lock = threading.Lock()
+
+def ensure_cache_versions():
+    existing = {name for (name,) in db.session.query(CacheVersion.name)}
+    for name in CACHE_VERSION_NAMES:
+        if name not in existing:
+            db.session.add(CacheVersion(name=name, version=0))
+    db.session.commit()
+
+# INSERT constructs that support ON CONFLICT clauses, by dialect
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def upsert_insert(table, bind):
+    return UPSERT_INSERTS[bind.dialect.name](table)
+
+def bump_cache_version(name):
+    """Bump a version stamp inside the current transaction; commit it with the change."""
+    updated = db.session.execute(
+        db.update(CacheVersion)
+        .where(CacheVersion.name == name)
+        .values(version=CacheVersion.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(CacheVersion(name=name, version=1))
+
+def cache_version(name):
+    """Return the current stamp for ``name``.
+
+    The stamp is read at most once every CACHE_VERSION_CHECK_INTERVAL
+    seconds, so most calls cost no database access.
+    """
+    now = time.monotonic()
+    with _seen_cache_versions_lock:
+        seen = _seen_cache_versions.get(name)
+        if seen and now - seen[1] < app.config['CACHE_VERSION_CHECK_INTERVAL']:
+            return seen[0]
+    version = db.session.execute(
+        db.select(CacheVersion.version).where(CacheVersion.name == name)
+    ).scalar() or 0
+    with _seen_cache_versions_lock:
+        _seen_cache_versions[name] = (version, now)
+    return version
+
+def cache_version_changed(name):
+    """Return True if ``name`` was bumped since this worker last asked."""
+    version = cache_version(name)
+    with _seen_cache_versions_lock:
+        previous = _acted_cache_versions.get(name)
+        _acted_cache_versions[name] = version
+    return previous is not None and previous != version
+
+def load_authenticated_user(user_id):
+    """Return an AuthenticatedUser for ``user_id``, from the worker cache when possible."""
+    if cache_version_changed('users'):
+        user_cache.clear()
+    cached = user_cache.get(user_id)
+    if cached is None:
+        user = User.query.get(user_id)
+        if not user:
+            return None
+        cached = AuthenticatedUser(user.id, user.username, user.role)
+        user_cache.set(user_id, cached)
+    return cached
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -165,7 +610,7 @@ def token_required(f):
         try:
             token = token.split()[1]  # Remove 'Bearer ' prefix
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            current_user = load_authenticated_user(data['user_id'])
             if not current_user:
                 return jsonify({'message': 'Invalid user'}), 401
         except jwt.ExpiredSignatureError:
@@ -173,11 +618,123 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Invalid token'}), 401
         except Exception as e:
-            print(f"Token error: {str(e)}")  # Debug log
+            logger.warning("Token error: %s", e)
             return jsonify({'message': 'Token is invalid'}), 401
         return f(current_user, *args, **kwargs)
     return decorated
 
+# Audit log writes, batched off the request path
+app.config['ACTIVITY_LOG_SYNC'] = os.environ.get('ACTIVITY_LOG_SYNC', 'false').lower() == 'true'  # Write inline, e.g. in tests
+app.config['ACTIVITY_QUEUE_SIZE'] = int(os.environ.get('ACTIVITY_QUEUE_SIZE', 10000))
+app.config['ACTIVITY_FLUSH_INTERVAL'] = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 1))  # seconds
+app.config['ACTIVITY_BATCH_SIZE'] = int(os.environ.get('ACTIVITY_BATCH_SIZE', 300))  # rows per INSERT
+app.config['ACTIVITY_WRITE_ATTEMPTS'] = int(os.environ.get('ACTIVITY_WRITE_ATTEMPTS', 3))
+
+metrics.counter('bolt_activity_events_total', 'Audit events by how they were written')
+metrics.gauge('bolt_activity_queue_depth', 'Audit events waiting to be written')
+
+class ActivityWriter:
+    """Queue audit events in memory and insert them in batches on a background thread.
+
+    The queue is bounded; when it is full the event is written by the caller
+    instead, so nothing is dropped under load. Each process starts its own
+    thread on first use (again after a fork) and flushes what is left at exit.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def record(self, user_id, action):
+        event = {'user_id': user_id, 'action': action, 'timestamp': datetime.utcnow()}
+        if app.config['ACTIVITY_LOG_SYNC']:
+            self._write([event], 'sync')
+            return
+        try:
+            self._ensure_thread().put_nowait(event)
+        except queue.Full:
+            logger.warning("Activity queue is full, writing inline")
+            self._write([event], 'overflow')
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    def flush(self):
+        """Write everything queued so far in this process."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                break
+            self._write_taken(batch)
+        # Wait for the batch the writer thread may have taken but not yet written
+        self._queue.join()
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._queue = queue.Queue(self.maxsize)
+                    self._thread = threading.Thread(target=self._run, name='activity-writer', daemon=True)
+                    self._thread.start()
+                    self._pid = pid
+        return self._queue
+
+    def _take(self, block):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=app.config['ACTIVITY_FLUSH_INTERVAL']) if block
+                         else self._queue.get_nowait())
+            while len(batch) < app.config['ACTIVITY_BATCH_SIZE']:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take(block=True)
+            if batch:
+                self._write_taken(batch)
+
+    def _write_taken(self, batch):
+        try:
+            self._write(batch, 'batched')
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, events, mode):
+        for attempt in range(app.config['ACTIVITY_WRITE_ATTEMPTS']):
+            try:
+                with app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(db.insert(Activity).values(events))
+                metrics.inc('bolt_activity_events_total', {'mode': mode}, len(events))
+                return
+            except SQLAlchemyError as e:
+                logger.warning("Activity write failed (attempt %d): %s", attempt + 1, e)
+                time.sleep(min(2 ** attempt * 0.1, 1))
+        metrics.inc('bolt_activity_events_total', {'mode': 'dropped'}, len(events))
+        logger.error("Dropped %d activity events: %s", len(events),
+                     '; '.join(f"{event['user_id']}: {event['action']}" for event in events))
+
+activity_writer = ActivityWriter(app.config['ACTIVITY_QUEUE_SIZE'])
+atexit.register(activity_writer.flush)
+
+def log_activity(user_id, action):
+    """Record an audit event. Call it after committing the change it describes."""
+    activity_writer.record(user_id, action)
+
+@metrics.collector
+def activity_queue_metrics():
+    return [('bolt_activity_queue_depth', {}, activity_writer.depth())]
+
 def clean_brand_name(brand_name):
     if not brand_name:
         return None
@@ -221,41 +778,39 @@ def normalize_price(price_str):
 @app.route('/api/login', methods=['POST'])
 def login():
     try:
-        print("Login attempt received")
+        logger.debug("Login attempt received")
         data = request.get_json()
         
         if not data:
-            print("No JSON data received")
+            logger.debug("No JSON data received")
             return jsonify({'message': 'No data provided'}), 400
             
         if 'username' not in data or 'password' not in data:
-            print("Missing username or password")
+            logger.debug("Missing username or password")
             return jsonify({'message': 'Missing username or password'}), 400
             
         username = data['username']
         password = data['password']
         
-        print(f"Attempting login for user: {username}")
+        logger.debug("Attempting login for user: %s", username)
         user = User.query.filter_by(username=username).first()
         
         if not user:
-            print(f"User not found: {username}")
+            logger.debug("User not found: %s", username)
             return jsonify({'message': 'Invalid username or password'}), 401
             
         if not check_password_hash(user.password, password):
-            print(f"Invalid password for user: {username}")
+            logger.debug("Invalid password for user: %s", username)
             return jsonify({'message': 'Invalid username or password'}), 401
             
-        print(f"Login successful for user: {username}")
+        logger.debug("Login successful for user: %s", username)
         token = jwt.encode({
             'user_id': user.id,
             'exp': datetime.utcnow() + timedelta(days=1)
         }, app.config['SECRET_KEY'])
         
         # Log the successful login
-        new_activity = Activity(user_id=user.id, action='User logged in')
-        db.session.add(new_activity)
-        db.session.commit()
+        log_activity(user.id, 'User logged in')
         
         return jsonify({
             'token': token,
@@ -265,55 +820,401 @@ def login():
             }
         })
     except Exception as e:
-        print(f"Error during login: {str(e)}")
+        logger.exception("Error during login: %s", e)
         return jsonify({'message': 'Server error during login. Please try again.'}), 500
 
 @app.route('/api/logout', methods=['POST'])
 @token_required
 def logout(current_user):
     # Log the logout activity
-    new_activity = Activity(user_id=current_user.id, action='User logged out')
-    db.session.add(new_activity)
-    db.session.commit()
+    log_activity(current_user.id, 'User logged out')
     return jsonify({'message': 'Successfully logged out'})
 
+app.config['ACTIVITY_PAGE_SIZE'] = int(os.environ.get('ACTIVITY_PAGE_SIZE', 50))
+app.config['ACTIVITY_PAGE_SIZE_MAX'] = int(os.environ.get('ACTIVITY_PAGE_SIZE_MAX', 200))
+
+def parse_activity_time(value):
+    """Parse an ISO 8601 query value into naive UTC, the way Activity.timestamp is stored."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def activity_cursor(activity):
+    return f'{activity.timestamp.isoformat()}_{activity.id}'
+
+def parse_activity_cursor(cursor):
+    timestamp, _, activity_id = cursor.rpartition('_')
+    return datetime.fromisoformat(timestamp), int(activity_id)
+
 @app.route('/api/activities', methods=['GET'])
 @token_required
 def get_activities(current_user):
+    """Newest-first activity feed, paged by keyset.
+
+    Filters: ``user_id``, ``action`` (prefix), ``since`` and ``until`` (ISO
+    8601, UTC when no offset is given). Pass the returned ``next_cursor`` as
+    ``cursor`` to get the next page; it is null on the last page.
+    """
     if current_user.role not in ['admin', 'moderator']:
         return jsonify({'message': 'Unauthorized'}), 403
-        
-    activities = Activity.query.order_by(Activity.timestamp.desc()).limit(50).all()
-    return jsonify([{
-        'id': activity.id,
-        'user': activity.user.username,
-        'action': activity.action,
-        'timestamp': activity.timestamp.isoformat()
-    } for activity in activities])
+
+    args = request.args
+    limit = min(max(args.get('limit', app.config['ACTIVITY_PAGE_SIZE'], type=int), 1),
+                app.config['ACTIVITY_PAGE_SIZE_MAX'])
+    query = Activity.query.options(db.joinedload(Activity.user))
+    try:
+        if args.get('cursor'):
+            timestamp, activity_id = parse_activity_cursor(args['cursor'])
+            query = query.filter(db.or_(
+                Activity.timestamp < timestamp,
+                db.and_(Activity.timestamp == timestamp, Activity.id < activity_id)
+            ))
+        if args.get('since'):
+            query = query.filter(Activity.timestamp >= parse_activity_time(args['since']))
+        if args.get('until'):
+            query = query.filter(Activity.timestamp < parse_activity_time(args['until']))
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor or time range'}), 400
+    if 'user_id' in args:
+        user_id = args.get('user_id', type=int)
+        if user_id is None:
+            return jsonify({'message': 'Invalid user_id'}), 400
+        query = query.filter(Activity.user_id == user_id)
+    if args.get('action'):
+        query = query.filter(Activity.action.startswith(args['action'], autoescape=True))
+
+    # One extra row tells us whether there is another page
+    activities = query.order_by(Activity.timestamp.desc(), Activity.id.desc()).limit(limit + 1).all()
+    page = activities[:limit]
+    return jsonify({
+        'activities': [{
+            'id': activity.id,
+            'user_id': activity.user_id,
+            'user': activity.user.username if activity.user else None,
+            'action': activity.action,
+            'timestamp': activity.timestamp.isoformat()
+        } for activity in page],
+        'next_cursor': activity_cursor(page[-1]) if len(activities) > limit else None
+    })
+
+# Activity retention: roll finished days up, archive and delete old raw rows.
+# Raw rows are only archived and deleted once ACTIVITY_ARCHIVE_DIR points at
+# durable storage (not the instance's own disk, which a redeploy wipes);
+# without it retention only maintains the rollups.
+app.config['ACTIVITY_RETENTION_DAYS'] = int(os.environ.get('ACTIVITY_RETENTION_DAYS', 90))  # days of raw rows kept
+app.config['ACTIVITY_RETENTION_INTERVAL'] = int(os.environ.get('ACTIVITY_RETENTION_INTERVAL', 3600))  # seconds; 0 disables
+app.config['ACTIVITY_RETENTION_LEASE_TTL'] = int(os.environ.get('ACTIVITY_RETENTION_LEASE_TTL', 1800))  # seconds
+app.config['ACTIVITY_ROLLUP_GRACE'] = int(os.environ.get('ACTIVITY_ROLLUP_GRACE', 600))  # seconds past midnight before a day is final
+app.config['ACTIVITY_ARCHIVE_DIR'] = os.environ.get('ACTIVITY_ARCHIVE_DIR') or None
+
+ACTIVITY_ROLLUP_GROUPS = ('day', 'user', 'action')
+
+def activity_day_column():
+    return db.func.date(Activity.timestamp, type_=db.Date)
+
+def acquire_activity_retention_lease(owner):
+    """Claim the retention run across workers and instances; returns the state row or None."""
+    now = time.time()
+    if not db.session.get(ActivityRetentionState, 1):
+        db.session.add(ActivityRetentionState(id=1))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+    claimed = ActivityRetentionState.query.filter(
+        ActivityRetentionState.id == 1,
+        db.or_(ActivityRetentionState.run_until.is_(None), ActivityRetentionState.run_until < now)
+    ).update({'run_owner': owner, 'run_until': now + app.config['ACTIVITY_RETENTION_LEASE_TTL']},
+             synchronize_session=False)
+    db.session.commit()
+    return db.session.get(ActivityRetentionState, 1, populate_existing=True) if claimed == 1 else None
+
+def first_activity_day():
+    first = db.session.execute(db.select(db.func.min(Activity.timestamp))).scalar()
+    return first.date() if first else None
+
+def rollup_activity_days(start, end):
+    """Count activity per user and action for each day in [start, end), replacing earlier counts."""
+    day = activity_day_column().label('day')
+    rows = db.session.execute(
+        db.select(day, Activity.user_id, Activity.action, db.func.count().label('count'))
+        .where(Activity.timestamp >= datetime.combine(start, datetime.min.time()),
+               Activity.timestamp < datetime.combine(end, datetime.min.time()))
+        .group_by(day, Activity.user_id, Activity.action)
+    ).all()
+    db.session.execute(db.delete(ActivityRollup).where(ActivityRollup.day >= start, ActivityRollup.day < end))
+    if rows:
+        db.session.execute(db.insert(ActivityRollup), [
+            {'day': row.day, 'user_id': row.user_id, 'action': row.action, 'count': row.count} for row in rows
+        ])
+    return len(rows)
+
+def activity_archive_path(day):
+    return os.path.join(app.config['ACTIVITY_ARCHIVE_DIR'], f'{day:%Y}', f'{day:%m}', f'activity-{day:%Y-%m-%d}.jsonl.gz')
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def read_archived_activity_ids(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return {json.loads(line)['id'] for line in archive}
+
+def archive_activity_day(day):
+    """Write one day of raw activity to its gzip JSON-lines file, then delete those rows.
+
+    Rows already in an existing file for the day are kept, so a run that
+    stopped between writing and deleting can simply be repeated. The rows
+    are deleted only after the file is on disk and reads back complete.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    path = activity_archive_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    seen = set()
+    archived = set()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    last_id = None
+    written = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as out:
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as existing:
+                for line in existing:
+                    seen.add(json.loads(line)['id'])
+                    out.write(line)
+        result = db.session.execute(
+            db.select(Activity.id, Activity.user_id, Activity.action, Activity.timestamp)
+            .where(Activity.timestamp >= start, Activity.timestamp < end)
+            .order_by(Activity.id)
+            .execution_options(yield_per=1000)
+        )
+        for activity_id, user_id, action, timestamp in result:
+            last_id = activity_id
+            archived.add(activity_id)
+            if activity_id in seen:
+                continue
+            out.write(json.dumps({'id': activity_id, 'user_id': user_id, 'action': action,
+                                  'timestamp': timestamp.isoformat()}) + '\n')
+            written += 1
+    if last_id is None:
+        os.remove(tmp_path)
+        return 0
+    fsync_path(tmp_path)
+    os.replace(tmp_path, path)
+    fsync_path(os.path.dirname(path))
+    missing = archived - read_archived_activity_ids(path)
+    if missing:
+        raise OSError(f'{path} is missing {len(missing)} archived rows; not deleting them')
+    db.session.execute(
+        db.delete(Activity).where(Activity.timestamp >= start, Activity.timestamp < end, Activity.id <= last_id)
+    )
+    db.session.commit()
+    return written
+
+def run_activity_retention(owner):
+    """Roll up finished days and archive raw rows past ACTIVITY_RETENTION_DAYS.
+
+    Returns a summary, or None when another worker holds the run.
+    """
+    state = acquire_activity_retention_lease(owner)
+    if state is None:
+        return None
+    summary = {'rolled_up_days': 0, 'rollup_rows': 0, 'archived_days': 0, 'archived_rows': 0,
+               'archiving': bool(app.config['ACTIVITY_ARCHIVE_DIR'])}
+    try:
+        # A day is final once the buffered activity writer has caught up past midnight
+        rollup_end = (datetime.utcnow() - timedelta(seconds=app.config['ACTIVITY_ROLLUP_GRACE'])).date()
+        rollup_start = state.rolled_through or first_activity_day()
+        if rollup_start and rollup_start < rollup_end:
+            summary['rollup_rows'] = rollup_activity_days(rollup_start, rollup_end)
+            summary['rolled_up_days'] = (rollup_end - rollup_start).days
+            state.rolled_through = rollup_end
+            db.session.commit()
+
+        # Only days that are already rolled up are archived
+        archive_end = min(datetime.utcnow().date() - timedelta(days=app.config['ACTIVITY_RETENTION_DAYS']),
+                          state.rolled_through or rollup_end)
+        day = state.archived_through or first_activity_day()
+        while summary['archiving'] and day and day < archive_end:
+            summary['archived_rows'] += archive_activity_day(day)
+            summary['archived_days'] += 1
+            state.archived_through = day = day + timedelta(days=1)
+            db.session.commit()
+        state.last_run_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        # Release the lease only while it is still ours; if it expired, another worker may hold it now
+        db.session.execute(
+            db.update(ActivityRetentionState)
+            .where(ActivityRetentionState.id == 1, ActivityRetentionState.run_owner == owner)
+            .values(run_until=None)
+        )
+        db.session.commit()
+    logger.info("Activity retention: %s", summary)
+    return summary
+
+def run_activity_retention_worker():
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    while True:
+        time.sleep(app.config['ACTIVITY_RETENTION_INTERVAL'])
+        try:
+            with app.app_context():
+                run_activity_retention(owner)
+        except Exception as e:
+            logger.error("Activity retention error: %s", e)
+
+_activity_retention_pid = None
+_activity_retention_lock = threading.Lock()
+
+@app.before_request
+def start_activity_retention():
+    """Start this process's retention thread once (again after a fork)."""
+    global _activity_retention_pid
+    if not app.config['ACTIVITY_RETENTION_INTERVAL'] or _activity_retention_pid == os.getpid():
+        return
+    with _activity_retention_lock:
+        if _activity_retention_pid == os.getpid():
+            return
+        _activity_retention_pid = os.getpid()
+        threading.Thread(target=run_activity_retention_worker, name='activity-retention', daemon=True).start()
+
+@app.route('/api/activities/retention', methods=['POST'])
+@token_required
+def run_activity_retention_now(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    try:
+        summary = run_activity_retention(f'{socket.gethostname()}:{os.getpid()}:manual')
+    except (SQLAlchemyError, OSError) as e:
+        db.session.rollback()
+        logger.error("Activity retention failed: %s", e)
+        return jsonify({'message': f'Retention failed: {str(e)}'}), 500
+    if summary is None:
+        return jsonify({'message': 'Retention is already running'}), 409
+    return jsonify(summary)
+
+@app.route('/api/activities/rollups', methods=['GET'])
+@token_required
+def get_activity_rollups(current_user):
+    """Activity counts per day, user and action.
+
+    ``since`` and ``until`` are UTC dates (``until`` exclusive); ``user_id``
+    and ``action`` (prefix) filter; ``group_by`` is a comma-separated subset
+    of day, user and action to sum over. Days not yet rolled up are counted
+    from the live table, so the latest days are included too.
+    """
+    if current_user.role not in ['admin', 'moderator']:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    args = request.args
+    groups = [group for group in args.get('group_by', ','.join(ACTIVITY_ROLLUP_GROUPS)).split(',') if group]
+    if not groups or any(group not in ACTIVITY_ROLLUP_GROUPS for group in groups):
+        return jsonify({'message': f'group_by must be a subset of {", ".join(ACTIVITY_ROLLUP_GROUPS)}'}), 400
+    try:
+        since = date.fromisoformat(args['since']) if args.get('since') else None
+        until = date.fromisoformat(args['until']) if args.get('until') else None
+    except ValueError:
+        return jsonify({'message': 'since and until must be YYYY-MM-DD dates'}), 400
+    user_id = args.get('user_id', type=int)
+    if 'user_id' in args and user_id is None:
+        return jsonify({'message': 'Invalid user_id'}), 400
+    action = args.get('action')
+
+    state = db.session.get(ActivityRetentionState, 1)
+    rolled_through = state.rolled_through if state else None
+
+    def grouped(day, user, action_column, count, conditions):
+        columns = {'day': day, 'user': user, 'action': action_column}
+        selected = [columns[group].label(group) for group in groups]
+        return db.select(*selected, count.label('count')).where(*conditions).group_by(*selected)
+
+    queries = []
+    if rolled_through and (since is None or since < rolled_through):
+        conditions = [ActivityRollup.day < rolled_through]
+        if since:
+            conditions.append(ActivityRollup.day >= since)
+        if until:
+            conditions.append(ActivityRollup.day < until)
+        if user_id is not None:
+            conditions.append(ActivityRollup.user_id == user_id)
+        if action:
+            conditions.append(ActivityRollup.action.startswith(action, autoescape=True))
+        queries.append(grouped(ActivityRollup.day, ActivityRollup.user_id, ActivityRollup.action,
+                               db.func.sum(ActivityRollup.count), conditions))
+    if until is None or rolled_through is None or until > rolled_through:
+        start = max(filter(None, [since, rolled_through]), default=None)
+        conditions = []
+        if start:
+            conditions.append(Activity.timestamp >= datetime.combine(start, datetime.min.time()))
+        if until:
+            conditions.append(Activity.timestamp < datetime.combine(until, datetime.min.time()))
+        if user_id is not None:
+            conditions.append(Activity.user_id == user_id)
+        if action:
+            conditions.append(Activity.action.startswith(action, autoescape=True))
+        queries.append(grouped(activity_day_column(), Activity.user_id, Activity.action,
+                               db.func.count(), conditions))
+
+    counts = {}
+    for query in queries:
+        for row in db.session.execute(query):
+            key = tuple(row[:-1])
+            counts[key] = counts.get(key, 0) + row[-1]
+
+    usernames = {}
+    if 'user' in groups:
+        user_ids = {key[groups.index('user')] for key in counts}
+        usernames = dict(db.session.execute(
+            db.select(User.id, User.username).where(User.id.in_(user_ids))
+        ).all()) if user_ids else {}
+
+    rollups = []
+    for key, count in counts.items():
+        row = dict(zip(groups, key))
+        if 'day' in row:
+            row['day'] = row['day'].isoformat()
+        if 'user' in row:
+            row['user_id'] = row.pop('user')
+            row['user'] = usernames.get(row['user_id'])
+        row['count'] = count
+        rollups.append(row)
+    rollups.sort(key=lambda row: (row.get('day', ''), row['count']), reverse=True)
+    return jsonify({
+        'rollups': rollups,
+        'rolled_through': rolled_through.isoformat() if rolled_through else None
+    })
 
 @app.route('/api/setup-admin', methods=['POST'])
 def setup_admin():
     try:
-        print("Starting admin setup...")
+        logger.debug("Starting admin setup...")
         # Check if admin already exists
         admin = User.query.filter_by(username='admin').first()
         if admin:
-            print("Admin already exists")
+            logger.debug("Admin already exists")
             return jsonify({'message': 'Admin already exists'}), 400
 
-        print("Creating admin user...")
+        logger.debug("Creating admin user...")
         # Create admin user
-        hashed_password = generate_password_hash('admin')
+        hashed_password = hash_password('admin')
         new_admin = User(
             username='admin',
             password=hashed_password,
             role='admin'
         )
         
-        print("Adding admin to database...")
+        logger.debug("Adding admin to database...")
         db.session.add(new_admin)
         db.session.commit()
-        print("Admin created successfully")
+        logger.info("Admin created successfully")
         
         # Create and return JWT token
         token = jwt.encode({
@@ -330,7 +1231,7 @@ def setup_admin():
             }
         })
     except Exception as e:
-        print(f"Error during admin setup: {str(e)}")
+        logger.exception("Error during admin setup: %s", e)
         db.session.rollback()
         return jsonify({'message': f'Error creating admin account: {str(e)}'}), 500
 
@@ -363,12 +1264,12 @@ def create_user(current_user):
     if User.query.filter_by(username=data['username']).first():
         return jsonify({'message': 'Username already exists'}), 400
         
-    hashed_password = generate_password_hash(data['password'], method='sha256')
+    hashed_password = hash_password(data['password'])
     new_user = User(username=data['username'], password=hashed_password, role=data['role'])
     
     db.session.add(new_user)
-    db.session.add(Activity(user_id=current_user.id, action=f'Created new user: {data["username"]} with role: {data["role"]}'))
     db.session.commit()
+    log_activity(current_user.id, f'Created new user: {data["username"]} with role: {data["role"]}')
     
     return jsonify({
         'message': 'User created successfully',
@@ -379,6 +1280,145 @@ def create_user(current_user):
         }
     })
 
+# Bulk user import
+app.config['USER_BULK_MAX_ROWS'] = int(os.environ.get('USER_BULK_MAX_ROWS', 1000))
+app.config['USER_HASH_WORKERS'] = int(os.environ.get('USER_HASH_WORKERS', min(os.cpu_count() or 1, 4)))  # processes
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+
+USER_ROLES = ['admin', 'moderator', 'user']
+
+_hash_executor = None
+_hash_executor_pid = None
+_hash_executor_lock = threading.Lock()
+
+def hash_password(password):
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+
+def hash_passwords(passwords):
+    """Hash passwords on this worker's process pool, in order; small batches are hashed inline."""
+    global _hash_executor, _hash_executor_pid
+    if len(passwords) < 2 or app.config['USER_HASH_WORKERS'] < 2:
+        return [hash_password(password) for password in passwords]
+    pid = os.getpid()
+    with _hash_executor_lock:
+        if _hash_executor is None or _hash_executor_pid != pid:
+            # Spawned, not forked: this process already runs background threads
+            _hash_executor = ProcessPoolExecutor(max_workers=app.config['USER_HASH_WORKERS'],
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            _hash_executor_pid = pid
+        executor = _hash_executor
+    chunksize = max(1, len(passwords) // (app.config['USER_HASH_WORKERS'] * 4))
+    hasher = partial(generate_password_hash, method=app.config['PASSWORD_HASH_METHOD'])
+    return list(executor.map(hasher, passwords, chunksize=chunksize))
+
+def parse_bulk_users(data, raw):
+    """Rows to import from ``{"users": [...]}``, ``{"csv": "..."}`` or a text/csv body.
+
+    CSV needs a header row naming ``username`` and ``password`` and
+    optionally ``role``; blank cells count as missing. Returns None when the
+    body has neither form.
+    """
+    if isinstance(data, dict) and isinstance(data.get('users'), list):
+        return data['users']
+    text = data.get('csv') if isinstance(data, dict) else raw
+    if not isinstance(text, str):
+        return None
+    reader = csv.DictReader(io.StringIO(text.strip()))
+    return [{(key or '').strip().lower(): (value or '').strip() for key, value in row.items() if (value or '').strip()}
+            for row in reader]
+
+@app.route('/api/users/bulk', methods=['POST'])
+@token_required
+def bulk_create_users(current_user):
+    """Create many users in one transaction and report per row.
+
+    Rows that fail validation are reported and skipped; the rest are
+    created together. ``default_role`` applies to rows without a role.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True)
+    raw = None if data is not None else request.get_data(as_text=True)
+    rows = parse_bulk_users(data, raw)
+    if rows is None:
+        return jsonify({'message': 'Send users as a list, or as CSV with username and password columns'}), 400
+    if len(rows) > app.config['USER_BULK_MAX_ROWS']:
+        return jsonify({'message': f'At most {app.config["USER_BULK_MAX_ROWS"]} users per request'}), 400
+    default_role = (data or {}).get('default_role', 'user')
+    if not isinstance(default_role, str) or default_role not in USER_ROLES:
+        return jsonify({'message': 'Invalid default_role'}), 400
+
+    results = []
+    valid = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        row = row if isinstance(row, dict) else {}
+        username = str(row.get('username') or '').strip()
+        password = str(row.get('password') or '')
+        role = row.get('role')
+        if role is None:
+            role = default_role
+        result = {'row': number, 'username': username}
+        if not username or not password:
+            result.update(status='error', message='Missing username or password')
+        elif len(username) > User.username.type.length:
+            result.update(status='error', message='Username is too long')
+        elif not isinstance(role, str) or role not in USER_ROLES:
+            result.update(status='error', message='Invalid role')
+        elif username in seen:
+            result.update(status='error', message='Duplicate username in this import')
+        else:
+            seen.add(username)
+            result.update(status='created', role=role)
+            valid.append((result, password))
+        results.append(result)
+
+    # One existence check for every candidate name
+    existing = set()
+    names = [result['username'] for result, _ in valid]
+    for start in range(0, len(names), 500):
+        existing.update(db.session.execute(
+            db.select(User.username).where(User.username.in_(names[start:start + 500]))
+        ).scalars())
+    for result, _ in valid:
+        if result['username'] in existing:
+            result.update(status='error', message='Username already exists')
+            del result['role']
+    valid = [(result, password) for result, password in valid if result['status'] == 'created']
+
+    if valid:
+        hashes = hash_passwords([password for _, password in valid])
+        users = [User(username=result['username'], password=password_hash, role=result['role'])
+                 for (result, _), password_hash in zip(valid, hashes)]
+        db.session.add_all(users)
+        try:
+            db.session.flush()
+            # Read ids before the commit expires the objects
+            for (result, _), user in zip(valid, users):
+                result['id'] = user.id
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            for result, _ in valid:
+                result.update(status='error', message='Not created')
+                result.pop('id', None)
+                result.pop('role', None)
+            return jsonify({'message': 'Some usernames were taken during the import; nothing was created',
+                            'results': results}), 409
+
+        roles = {}
+        for result, _ in valid:
+            roles[result['role']] = roles.get(result['role'], 0) + 1
+        log_activity(current_user.id, f'Bulk created {len(valid)} users (' +
+                     ', '.join(f'{count} {role}' for role, count in sorted(roles.items())) + ')')
+
+    return jsonify({
+        'created': len(valid),
+        'failed': len(results) - len(valid),
+        'results': results
+    })
+
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 @token_required
 def update_user(current_user, user_id):
@@ -395,15 +1435,15 @@ def update_user(current_user, user_id):
     if 'role' in data:
         user.role = data['role']
     if 'password' in data and data['password']:
-        user.password = generate_password_hash(data['password'])
+        user.password = hash_password(data['password'])
 
-    # Log the user update activity
-    new_activity = Activity(
-        user_id=current_user.id,
-        action=f'Updated user {user.username} (role: {user.role})'
-    )
-    db.session.add(new_activity)
+    bump_cache_version('users')
     db.session.commit()
+    user_cache.pop(user_id)
+    forget_team_listing()
+
+    # Log the user update activity
+    log_activity(current_user.id, f'Updated user {user.username} (role: {user.role})')
 
     return jsonify({
         'id': user.id,
@@ -424,37 +1464,76 @@ def delete_user(current_user, user_id):
     username = user.username
     db.session.delete(user)
     
-    # Log the user deletion activity
-    new_activity = Activity(
-        user_id=current_user.id,
-        action=f'Deleted user {username}'
-    )
-    db.session.add(new_activity)
+    bump_cache_version('users')
     db.session.commit()
+    user_cache.pop(user_id)
+    forget_team_listing()
+
+    # Log the user deletion activity
+    log_activity(current_user.id, f'Deleted user {username}')
 
     return jsonify({'message': 'User deleted successfully'})
 
+# Per-worker copy of the serialized team listing
+TeamListing = namedtuple('TeamListing', ['versions', 'body', 'etag'])
+
+_team_listing = None
+_team_listing_lock = threading.Lock()
+
+def load_team_listing():
+    """The /api/teams body and its ETag, rebuilt only after team or user data changed.
+
+    Members come from one extra query for all teams. Usernames appear in the
+    listing, so the 'users' stamp invalidates it as well as 'teams'.
+    """
+    global _team_listing
+    versions = (cache_version('teams'), cache_version('users'))
+    with _team_listing_lock:
+        listing = _team_listing
+    if listing and listing.versions == versions:
+        return listing
+
+    teams = Team.query.options(db.selectinload(Team.members)).order_by(Team.id).all()
+    body = app.json.dumps([{
+        'id': team.id,
+        'name': team.name,
+        'description': team.description,
+        'created_at': team.created_at.isoformat(),
+        'is_department': team.is_department,
+        'manual_members': team.manual_members,
+        'members': [{
+            'id': member.id,
+            'username': member.username
+        } for member in team.members]
+    } for team in teams])
+    listing = TeamListing(versions, body, f'"{hashlib.sha1(body.encode()).hexdigest()}"')
+    with _team_listing_lock:
+        _team_listing = listing
+    return listing
+
+def forget_team_listing():
+    """Drop this worker's listing right after a change; other workers follow the 'teams' stamp."""
+    global _team_listing
+    with _team_listing_lock:
+        _team_listing = None
+
 @app.route('/api/teams', methods=['GET'])
 @token_required
 def get_teams(current_user):
     try:
-        teams = Team.query.all()
-        return jsonify([{
-            'id': team.id,
-            'name': team.name,
-            'description': team.description,
-            'created_at': team.created_at.isoformat(),
-            'is_department': team.is_department,
-            'manual_members': team.manual_members,
-            'members': [{
-                'id': member.id,
-                'username': member.username
-            } for member in team.members]
-        } for team in teams])
+        listing = load_team_listing()
     except Exception as e:
-        print(f"Error fetching teams: {str(e)}")  # Debug log
+        logger.exception("Error fetching teams: %s", e)
         return jsonify({'message': 'Failed to fetch teams'}), 500
 
+    if (request.headers.get('If-None-Match') or '').strip() == listing.etag:
+        response = Response(status=304)
+    else:
+        response = Response(listing.body, mimetype='application/json')
+    response.headers['ETag'] = listing.etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/api/teams', methods=['POST'])
 @token_required
 def create_team(current_user):
@@ -470,8 +1549,10 @@ def create_team(current_user):
     )
     
     db.session.add(new_team)
-    db.session.add(Activity(user_id=current_user.id, action=f'Created new team: {data["name"]}'))
+    bump_cache_version('teams')
     db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, f'Created new team: {data["name"]}')
     
     return jsonify({
         'message': 'Team created successfully',
@@ -502,8 +1583,10 @@ def update_team(current_user, team_id):
     if 'manual_members' in data:
         team.manual_members = data['manual_members']
 
-    db.session.add(Activity(user_id=current_user.id, action=f'Updated team: {team.name}'))
+    bump_cache_version('teams')
     db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, f'Updated team: {team.name}')
 
     return jsonify({
         'message': 'Team updated successfully',
@@ -524,9 +1607,12 @@ def delete_team(current_user, team_id):
     if not team:
         return jsonify({'message': 'Team not found'}), 404
 
+    team_name = team.name
     db.session.delete(team)
-    db.session.add(Activity(user_id=current_user.id, action=f'Deleted team: {team.name}'))
+    bump_cache_version('teams')
     db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, f'Deleted team: {team_name}')
 
     return jsonify({'message': 'Team deleted successfully'})
 
@@ -545,12 +1631,14 @@ def add_team_member(current_user, team_id):
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
-    if user in team.members:
+    if db.session.get(TeamMember, (team.id, user.id)):
         return jsonify({'message': 'User is already a member of this team'}), 400
 
-    team.members.append(user)
-    db.session.add(Activity(user_id=current_user.id, action=f'Added {user.username} to team: {team.name}'))
+    db.session.add(TeamMember(team_id=team.id, user_id=user.id))
+    bump_cache_version('teams')
     db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, f'Added {user.username} to team: {team.name}')
 
     return jsonify({
         'message': 'Member added successfully',
@@ -571,15 +1659,149 @@ def remove_team_member(current_user, team_id, user_id):
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
-    if user not in team.members:
+    membership = db.session.get(TeamMember, (team.id, user.id))
+    if not membership:
         return jsonify({'message': 'User is not a member of this team'}), 400
 
-    team.members.remove(user)
-    db.session.add(Activity(user_id=current_user.id, action=f'Removed {user.username} from team: {team.name}'))
+    db.session.delete(membership)
+    action = f'Removed {user.username} from team: {team.name}'
+    bump_cache_version('teams')
     db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, action)
 
     return jsonify({'message': 'Member removed successfully'})
 
+app.config['TEAM_BULK_MAX_MEMBERS'] = int(os.environ.get('TEAM_BULK_MAX_MEMBERS', 1000))
+
+def parse_member_ids(data):
+    """The distinct user ids in ``data['userIds']``, or None if it is not a list of ids."""
+    if not isinstance(data, dict):
+        return None
+    ids = data.get('userIds')
+    if not isinstance(ids, list) or any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+def unknown_user_ids(user_ids):
+    known = set()
+    for start in range(0, len(user_ids), 500):
+        known.update(db.session.execute(
+            db.select(User.id).where(User.id.in_(user_ids[start:start + 500]))
+        ).scalars())
+    return [user_id for user_id in user_ids if user_id not in known]
+
+def insert_team_members(team_id, user_ids):
+    """Add memberships with set-based INSERTs, skipping existing ones; return the number added."""
+    table = TeamMember.__table__
+    joined_at = datetime.utcnow()
+    added = 0
+    for start in range(0, len(user_ids), 300):
+        insert = upsert_insert(table, db.session.get_bind())
+        added += db.session.execute(insert.values([
+            {'team_id': team_id, 'user_id': user_id, 'joined_at': joined_at}
+            for user_id in user_ids[start:start + 300]
+        ]).on_conflict_do_nothing(index_elements=['team_id', 'user_id'])).rowcount
+    return added
+
+def delete_team_members(team_id, user_ids=None, keep=None):
+    """Delete memberships of ``user_ids``, or all but ``keep``; return the number removed."""
+    statement = db.delete(TeamMember).where(TeamMember.team_id == team_id)
+    if keep is not None:
+        # Chunking a NOT IN would delete the kept ids of the other chunks
+        return db.session.execute(statement.where(TeamMember.user_id.not_in(keep))).rowcount
+    removed = 0
+    for start in range(0, len(user_ids), 500):
+        removed += db.session.execute(
+            statement.where(TeamMember.user_id.in_(user_ids[start:start + 500]))
+        ).rowcount
+    return removed
+
+def load_bulk_member_request(team_id, check_users=True):
+    """Validate a bulk membership request; return (team, user_ids, error_response)."""
+    user_ids = parse_member_ids(request.get_json(silent=True))
+    if user_ids is None:
+        return None, None, (jsonify({'message': 'userIds must be a list of user IDs'}), 400)
+    if len(user_ids) > app.config['TEAM_BULK_MAX_MEMBERS']:
+        return None, None, (jsonify({'message': f'At most {app.config["TEAM_BULK_MAX_MEMBERS"]} users per request'}), 400)
+    team = db.session.get(Team, team_id)
+    if not team:
+        return None, None, (jsonify({'message': 'Team not found'}), 404)
+    if check_users:
+        unknown = unknown_user_ids(user_ids)
+        if unknown:
+            return None, None, (jsonify({'message': 'Users not found', 'unknownUserIds': unknown}), 404)
+    return team, user_ids, None
+
+def commit_team_members(current_user, action):
+    bump_cache_version('teams')
+    db.session.commit()
+    forget_team_listing()
+    log_activity(current_user.id, action)
+
+@app.route('/api/teams/<int:team_id>/members/bulk', methods=['POST'])
+@token_required
+def add_team_members(current_user, team_id):
+    team, user_ids, error = load_bulk_member_request(team_id)
+    if error:
+        return error
+
+    added = insert_team_members(team.id, user_ids)
+    commit_team_members(current_user, f'Added {added} members to team: {team.name}')
+
+    return jsonify({'message': 'Members added successfully', 'added': added})
+
+@app.route('/api/teams/<int:team_id>/members/bulk', methods=['DELETE'])
+@token_required
+def remove_team_members(current_user, team_id):
+    team, user_ids, error = load_bulk_member_request(team_id, check_users=False)
+    if error:
+        return error
+
+    removed = delete_team_members(team.id, user_ids)
+    commit_team_members(current_user, f'Removed {removed} members from team: {team.name}')
+
+    return jsonify({'message': 'Members removed successfully', 'removed': removed})
+
+@app.route('/api/teams/<int:team_id>/members', methods=['PUT'])
+@token_required
+def replace_team_members(current_user, team_id):
+    team, user_ids, error = load_bulk_member_request(team_id)
+    if error:
+        return error
+
+    removed = delete_team_members(team.id, keep=user_ids)
+    added = insert_team_members(team.id, user_ids)
+    commit_team_members(current_user, f'Replaced members of team: {team.name} (+{added} -{removed})')
+
+    return jsonify({'message': 'Members replaced successfully', 'added': added, 'removed': removed})
+
+@app.route('/api/teams/<int:team_id>/members/move', methods=['POST'])
+@token_required
+def move_team_members(current_user, team_id):
+    """Move members to ``toTeamId``; users not in this team are left alone."""
+    team, user_ids, error = load_bulk_member_request(team_id, check_users=False)
+    if error:
+        return error
+    target_id = request.get_json(silent=True).get('toTeamId')
+    target = db.session.get(Team, target_id) if isinstance(target_id, int) else None
+    if not target:
+        return jsonify({'message': 'Target team not found'}), 404
+    if target.id == team.id:
+        return jsonify({'message': 'Source and target team are the same'}), 400
+
+    moving = []
+    for start in range(0, len(user_ids), 500):
+        moving.extend(db.session.execute(
+            db.select(TeamMember.user_id)
+            .where(TeamMember.team_id == team.id, TeamMember.user_id.in_(user_ids[start:start + 500]))
+        ).scalars())
+    delete_team_members(team.id, moving)
+    insert_team_members(target.id, moving)
+    commit_team_members(current_user, f'Moved {len(moving)} members from team: {team.name} to team: {target.name}')
+
+    return jsonify({'message': 'Members moved successfully', 'moved': len(moving)})
+
 @app.route('/api/update-password', methods=['POST'])
 @token_required
 def update_password(current_user):
@@ -591,18 +1813,23 @@ def update_password(current_user):
         if not current_password or not new_password:
             return jsonify({'message': 'Missing required fields'}), 400
 
+        # The cached user carries no password hash, so load the row itself
+        user = User.query.get(current_user.id)
+        if not user:
+            return jsonify({'message': 'Invalid user'}), 401
+
         # Verify current password
-        if not check_password_hash(current_user.password, current_password):
+        if not check_password_hash(user.password, current_password):
             return jsonify({'message': 'Current password is incorrect'}), 401
 
         # Update password
-        current_user.password = generate_password_hash(new_password)
+        user.password = hash_password(new_password)
+        bump_cache_version('users')
         db.session.commit()
+        user_cache.pop(user.id)
 
         # Log the activity
-        activity = Activity(user_id=current_user.id, action='Password updated')
-        db.session.add(activity)
-        db.session.commit()
+        log_activity(current_user.id, 'Password updated')
 
         return jsonify({'message': 'Password updated successfully'}), 200
 
@@ -610,219 +1837,2913 @@ def update_password(current_user):
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
-@app.route('/api/scrape-brand', methods=['POST'])
-def scrape_brand():
-    try:
-        url = request.json.get('url')
-        print(f"\n=== Starting brand scraping for URL: {url} ===")
-        
-        if not url:
-            return jsonify({'error': 'URL is required'}), 400
+# Scraper configuration
+app.config['SCRAPE_PRODUCT_URL'] = os.environ.get('SCRAPE_PRODUCT_URL', 'https://ounass.ae/{sku}.html')
+# Kept small enough that a batch of cache misses finishes within the host
+# budget and gunicorn's request timeout; larger lists go to /api/scrape-jobs
+app.config['SCRAPE_BATCH_MAX_ITEMS'] = int(os.environ.get('SCRAPE_BATCH_MAX_ITEMS', 100))
+app.config['SCRAPE_BATCH_WORKERS'] = int(os.environ.get('SCRAPE_BATCH_WORKERS', 6))
+# Local SQLite file for coordinating this machine's workers: fetch leases,
+# selector stats and host budgets. Scraped results live in the main database;
+# this state is per instance and rebuilds itself within a few requests.
+app.config['SCRAPE_CACHE_PATH'] = os.environ.get(
+    'SCRAPE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_cache.db'))
+# Copy results from the scrape_cache tables older versions kept in SQLite (see LEGACY_SCRAPE_CACHE_PATHS)
+app.config['SCRAPE_CACHE_IMPORT_LEGACY'] = os.environ.get('SCRAPE_CACHE_IMPORT_LEGACY', 'true').lower() == 'true'
+app.config['SCRAPE_MEMORY_CACHE_SIZE'] = int(os.environ.get('SCRAPE_MEMORY_CACHE_SIZE', 5000))
+app.config['SCRAPE_MEMORY_CACHE_TTL'] = int(os.environ.get('SCRAPE_MEMORY_CACHE_TTL', 600))  # seconds
+app.config['SCRAPE_PRICE_TTL'] = int(os.environ.get('SCRAPE_PRICE_TTL', 6 * 3600))  # seconds
+app.config['SCRAPE_BRAND_TTL'] = int(os.environ.get('SCRAPE_BRAND_TTL', 30 * 24 * 3600))  # seconds
+app.config['SCRAPE_STALE_WHILE_REVALIDATE'] = os.environ.get('SCRAPE_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+app.config['SCRAPE_STALE_GRACE'] = int(os.environ.get('SCRAPE_STALE_GRACE', 24 * 3600))  # seconds past the TTL
+app.config['SCRAPE_REFRESH_WORKERS'] = int(os.environ.get('SCRAPE_REFRESH_WORKERS', 2))
+app.config['SCRAPE_LEASE_TTL'] = float(os.environ.get('SCRAPE_LEASE_TTL', 30))  # seconds a worker may hold a URL
+app.config['SCRAPE_LEASE_WAIT'] = float(os.environ.get('SCRAPE_LEASE_WAIT', 15))  # seconds to wait on another worker
+app.config['SCRAPE_SELECTOR_PROBE_INTERVAL'] = int(os.environ.get('SCRAPE_SELECTOR_PROBE_INTERVAL', 50))  # pages per host
+app.config['SCRAPE_SELECTOR_STATS_TTL'] = int(os.environ.get('SCRAPE_SELECTOR_STATS_TTL', 300))  # seconds
+# How long a failed URL is answered from its tombstone, doubling with each repeat failure
+app.config['SCRAPE_TOMBSTONE_TTL'] = {
+    'not_found': int(os.environ.get('SCRAPE_TOMBSTONE_NOT_FOUND_TTL', 24 * 3600)),  # seconds
+    'timeout': int(os.environ.get('SCRAPE_TOMBSTONE_TIMEOUT_TTL', 300)),  # seconds
+    'parse_miss': int(os.environ.get('SCRAPE_TOMBSTONE_PARSE_MISS_TTL', 3600)),  # seconds
+}
+app.config['SCRAPE_TOMBSTONE_MAX_TTL'] = int(os.environ.get('SCRAPE_TOMBSTONE_MAX_TTL', 7 * 24 * 3600))  # seconds
+# Product pages are streamed; reading stops at the cap or once brand and price are in
+app.config['SCRAPE_MAX_BYTES'] = int(os.environ.get('SCRAPE_MAX_BYTES', 2 * 1024 * 1024))
+app.config['SCRAPE_STREAM_CHUNK'] = int(os.environ.get('SCRAPE_STREAM_CHUNK', 16 * 1024))  # bytes
+app.config['SCRAPE_STREAM_CHECK_BYTES'] = int(os.environ.get('SCRAPE_STREAM_CHECK_BYTES', 64 * 1024))  # between extraction attempts
 
-        # Ensure scrape_cache table exists
-        try:
-            conn = sqlite3.connect('scrape_cache.db')
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS scrape_cache
-                        (url TEXT PRIMARY KEY, brand TEXT, price TEXT, timestamp TEXT)''')
-            conn.commit()
-            print("Database connection successful, table exists")
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return jsonify({'error': f'Database error: {str(e)}'}), 500
-        
-        try:
-            # Check cache first
-            c.execute('SELECT brand, price, timestamp FROM scrape_cache WHERE url = ?', (url,))
-            cache_result = c.fetchone()
-            
-            # Validate and potentially invalidate cache
-            if cache_result:
-                brand, cached_price, timestamp = cache_result
-                # Remove AED from cached price
-                cached_price = cached_price.replace(' AED', '').replace('AED', '').strip()
-                cache_time = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
-                
-                # Invalidate cache if:
-                # 1. More than 6 hours old
-                # 2. Price seems unreasonably low (less than 10)
-                # 3. Price contains suspicious characters
-                if (datetime.now() - cache_time > timedelta(hours=6) or 
-                    not cached_price or 
-                    float(cached_price.replace(',', '')) < 10):
-                    print(f"Cache invalidated for {url}")
-                    cache_result = None
+# Outbound HTTP client configuration
+app.config['HTTP_POOL_CONNECTIONS'] = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))  # Hosts kept pooled
+app.config['HTTP_POOL_MAXSIZE'] = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))  # Connections kept per host
+app.config['HTTP_CONNECT_TIMEOUT'] = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+app.config['HTTP_READ_TIMEOUT'] = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+
+SCRAPE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Response status and message for each kind of remembered failure
+SCRAPE_FAILURES = {
+    'not_found': (404, 'Product page not found'),
+    'timeout': (500, 'Product page could not be fetched'),
+    'parse_miss': (404, 'Brand name and price not found'),
+}
+
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+}
+
+# Enhanced selectors for brand name
+BRAND_SELECTORS = [
+    # Designer/brand specific links
+    'a[href*="/designers/"], a[href*="/brands/"]',
+    'a[href*="brand="], a[href*="designer="]',
+    # Breadcrumb navigation
+    'nav.breadcrumb a, nav.breadcrumbs a, .breadcrumb a, .breadcrumbs a',
+    # Schema.org metadata
+    '[itemprop="brand"], [itemprop="manufacturer"]',
+    # Common brand containers
+    '.brand-name, .product-brand, .designer-name',
+    # Product title with brand
+    'h1.product-title, h1.title, .product-name h1',
+    # Meta tags
+    'meta[property="og:brand"]',
+    'meta[name="brand"]'
+]
+
+# Enhanced selectors for price
+PRICE_SELECTORS = [
+    # Specific class you mentioned
+    '.PriceContainer-slashedPrice',
+    # Common price containers
+    '.price, .product-price, .current-price',
+    '[itemprop="price"]',
+    '.price-container span',
+    '.price__current, .price-current',
+    # Sale prices
+    '.sale-price, .special-price',
+    # Main prices
+    '.main-price, .regular-price',
+    # Schema.org metadata
+    '[data-price], [data-product-price]',
+    # Specific price spans
+    'span.PriceContainer-price, span[class*="price"]'
+]
+
+# Compiled once; soup.select() would re-parse each selector on every page
+COMPILED_BRAND_SELECTORS = [(selector, sv.compile(selector)) for selector in BRAND_SELECTORS]
+COMPILED_PRICE_SELECTORS = [(selector, sv.compile(selector)) for selector in PRICE_SELECTORS]
+
+JSON_LD_RE = re.compile(r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.I | re.S)
+META_TAG_RE = re.compile(r'<meta\s[^>]*>', re.I)
+TAG_ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+PRICE_BLOCK_RE = re.compile(r'class\s*=\s*["\'][^"\']*\bPriceContainer-', re.I)
+SLASHED_PRICE_RE = re.compile(r'<[^>]*class\s*=\s*["\'][^"\']*\bPriceContainer-slashedPrice\b[^"\']*["\'][^>]*>([^<]+)<', re.I)
+NEXT_DATA_RE = re.compile(r'<script[^>]*id\s*=\s*["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.I | re.S)
+STATE_ASSIGN_RE = re.compile(r'window\.(?:__INITIAL_STATE__|__PRELOADED_STATE__|__STATE__)\s*=\s*')
+
+META_BRAND_KEYS = ('og:brand', 'product:brand', 'brand')
+META_PRICE_KEYS = ('product:price:amount', 'og:price:amount', 'price')
+STATE_BRAND_KEYS = ('designerName', 'brandName', 'designer', 'brand')
+STATE_PRICE_KEYS = ('originalPrice', 'price')
+STATE_MAX_NODES = 50000
+
+def format_scraped_price(value):
+    """Render a structured-data price the way the product page displays it."""
+    if isinstance(value, str):
+        value = value.replace(' AED', '').replace('AED', '').strip()
+        try:
+            value = float(value.replace(',', ''))
+        except ValueError:
+            return value or None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return '{:,.0f}'.format(value) if value == int(value) else '{:,.2f}'.format(value)
+
+def _valid_brand(value):
+    if isinstance(value, dict):
+        value = value.get('name')
+    if not isinstance(value, str):
+        return None
+    brand = clean_brand_name(html.unescape(value))
+    if brand and len(brand) > 1:  # Avoid single characters
+        return brand
+    return None
+
+def _json_ld_products(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _json_ld_products(item)
+    elif isinstance(node, dict):
+        types = node.get('@type')
+        types = types if isinstance(types, list) else [types]
+        if 'Product' in types or 'ProductGroup' in types:
+            yield node
+        if '@graph' in node:
+            yield from _json_ld_products(node['@graph'])
+
+def _json_ld_price(product):
+    offers = product.get('offers')
+    for offer in (offers if isinstance(offers, list) else [offers]):
+        if not isinstance(offer, dict):
+            continue
+        for key in ('price', 'lowPrice', 'highPrice'):
+            if offer.get(key) not in (None, ''):
+                return format_scraped_price(offer[key])
+    return None
+
+def _meta_tags(page):
+    tags = {}
+    for tag in META_TAG_RE.findall(page):
+        attrs = {name.lower(): html.unescape(dq or sq) for name, dq, sq in TAG_ATTR_RE.findall(tag)}
+        key = attrs.get('property') or attrs.get('name') or attrs.get('itemprop')
+        if key and 'content' in attrs:
+            tags.setdefault(key.lower(), attrs['content'])
+    return tags
+
+def _state_blobs(page):
+    match = NEXT_DATA_RE.search(page)
+    if match:
+        yield match.group(1)
+    decoder = json.JSONDecoder()
+    for match in STATE_ASSIGN_RE.finditer(page):
+        try:
+            blob, _ = decoder.raw_decode(page, match.end())
+        except ValueError:
+            continue
+        yield blob
+
+def _walk_state(state):
+    """Find the first object in embedded state JSON carrying a brand and a price."""
+    stack = [state]
+    seen = 0
+    while stack and seen < STATE_MAX_NODES:
+        node = stack.pop()
+        seen += 1
+        if isinstance(node, dict):
+            brand = next((_valid_brand(node[k]) for k in STATE_BRAND_KEYS if k in node), None)
+            price = next((node[k] for k in STATE_PRICE_KEYS if isinstance(node.get(k), (int, float, str))), None)
+            if brand and price is not None:
+                return brand, format_scraped_price(price)
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None, None
+
+def extract_product_fast(page):
+    """Pull brand and price out of structured data without building a DOM.
+
+    Looks at the PriceContainer slashed price, JSON-LD ``Product`` blocks,
+    ``og:``/``itemprop`` meta tags and embedded state JSON, in that order.
+    Returns ``{'brand', 'price', 'brand_source', 'price_source'}``.
+    """
+    result = {'brand': None, 'price': None, 'brand_source': None, 'price_source': None}
+
+    def found(field, value, source):
+        if value and not result[field]:
+            result[field] = value
+            result[f'{field}_source'] = source
+
+    # The slashed (original) price is what the DOM selectors prefer first
+    match = SLASHED_PRICE_RE.search(page)
+    if match:
+        found('price', html.unescape(match.group(1)).replace(' AED', '').replace('AED', '').strip(),
+              '.PriceContainer-slashedPrice')
+
+    for block in JSON_LD_RE.findall(page):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for product in _json_ld_products(data):
+            found('brand', _valid_brand(product.get('brand')), 'json-ld')
+            found('price', _json_ld_price(product), 'json-ld')
+        if result['brand'] and result['price']:
+            return result
+
+    meta = _meta_tags(page)
+    for key in META_BRAND_KEYS:
+        found('brand', _valid_brand(meta.get(key)), f'meta:{key}')
+    for key in META_PRICE_KEYS:
+        if meta.get(key):
+            found('price', format_scraped_price(meta[key]), f'meta:{key}')
+    if result['brand'] and result['price']:
+        return result
+
+    for blob in _state_blobs(page):
+        try:
+            state = json.loads(blob) if isinstance(blob, str) else blob
+        except ValueError:
+            continue
+        brand, price = _walk_state(state)
+        found('brand', brand, 'state')
+        found('price', price, 'state')
+        if result['brand'] and result['price']:
+            break
+    return result
+
+def parse_product_html(page):
+    # Try parsing with lxml first, fall back to html.parser if it fails
+    try:
+        return BeautifulSoup(page, 'lxml')
+    except Exception as e:
+        logger.debug("Failed to parse with lxml: %s", e)
+        return BeautifulSoup(page, 'html.parser')
+
+def select_brand(soup, selectors=COMPILED_BRAND_SELECTORS):
+    """Return ``(brand, selector)`` for the first selector that yields a usable brand."""
+    for selector, compiled in selectors:
+        try:
+            for element in compiled.select(soup):
+                # Get text from meta tags differently
+                if element.name == 'meta':
+                    potential_brand = element.get('content', '')
                 else:
-                    print(f"Cache hit for {url}")
-                    return jsonify({
-                        'brand': brand,
-                        'price': cached_price,
-                        'cached': True
-                    })
+                    potential_brand = element.text.strip()
+
+                # Clean and validate the brand name
+                cleaned_brand = clean_brand_name(potential_brand)
+                if cleaned_brand and len(cleaned_brand) > 1:  # Avoid single characters
+                    return cleaned_brand, selector
+        except Exception as e:
+            logger.debug("Error with selector %r: %s", selector, e)
+    return None, None
+
+def select_price(soup, selectors=COMPILED_PRICE_SELECTORS):
+    """Return ``(price, selector)`` for the first selector that yields a price."""
+    for selector, compiled in selectors:
+        try:
+            for element in compiled.select(soup):
+                # Try data attributes first, then text
+                potential_price = element.get('data-price', element.get('content', element.text.strip()))
+
+                # Return the original price string without AED
+                if potential_price:
+                    return potential_price.replace(' AED', '').replace('AED', '').strip(), selector
+        except Exception as e:
+            logger.debug("Error with price selector %r: %s", selector, e)
+    return None, None
+
+def extract_product(page, host=None):
+    """Extract brand and price, building the full DOM only when the fast path falls short.
+
+    With a ``host``, DOM selectors are tried in that host's hit-rate order
+    and the winning sources are recorded.
+    """
+    result = extract_product_fast(page)
+    plan = plan_selector_order(host) if host else None
+    if not (result['brand'] and result['price']):
+        brand_selectors, price_selectors = (plan['brand'], plan['price']) if plan else (
+            COMPILED_BRAND_SELECTORS, COMPILED_PRICE_SELECTORS)
+        soup = parse_product_html(page)
+        if not result['brand']:
+            result['brand'], result['brand_source'] = select_brand(soup, brand_selectors)
+        if not result['price']:
+            result['price'], result['price_source'] = select_price(soup, price_selectors)
+    if plan:
+        record_selector_hits(host, result, plan)
+    return result
+
+def read_product_page(response):
+    """Read a streamed product page, stopping once its brand and price are in hand.
+
+    A brand and price found early only count once the PriceContainer block
+    has gone by, because its slashed price outranks JSON-LD; pages without
+    that block are read to the end. Nothing past SCRAPE_MAX_BYTES is read.
+    Returns ``(page, outcome)`` with outcome 'complete', 'early' or 'capped'.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts = []
+    received = 0
+    outcome = 'complete'
+    tail = ''
+    next_check = None  # byte count at which to try the fast extractor next
+    try:
+        for chunk in response.iter_content(app.config['SCRAPE_STREAM_CHUNK']):
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if received >= app.config['SCRAPE_MAX_BYTES']:
+                outcome = 'capped'
+                break
+            if next_check is None:
+                # Keep a little of the previous chunk so a split class attribute still matches
+                if PRICE_BLOCK_RE.search(tail + text):
+                    next_check = received
+                tail = text[-200:]
+            if next_check is not None and received >= next_check:
+                result = extract_product_fast(''.join(parts))
+                if result['brand'] and result['price']:
+                    outcome = 'early'
+                    break
+                next_check = received + app.config['SCRAPE_STREAM_CHECK_BYTES']
+        else:
+            parts.append(decoder.decode(b'', final=True))
+    finally:
+        response.close()
+    metrics.inc('bolt_scrape_download_bytes_total', {'result': outcome}, received)
+    return ''.join(parts), outcome
+
+_selector_stats = {}  # host -> {'loaded_at', 'pages', 'counts': {field: {selector: hits}}}
+_selector_stats_lock = threading.Lock()
+
+def _host_selector_stats(host):
+    """Selector hit counts for ``host``, reloaded from scrape_cache.db every SCRAPE_SELECTOR_STATS_TTL."""
+    with _selector_stats_lock:
+        stats = _selector_stats.get(host)
+        if stats and time.monotonic() - stats['loaded_at'] < app.config['SCRAPE_SELECTOR_STATS_TTL']:
+            return stats
+
+    counts = {'brand': {}, 'price': {}}
+    try:
+        with _scrape_db_lock:
+            rows = get_scrape_db().execute(
+                'SELECT field, selector, hits FROM scrape_selector_stats WHERE host = ?', (host,)
+            ).fetchall()
+        for field, selector, hits in rows:
+            counts.setdefault(field, {})[selector] = hits
+    except sqlite3.Error as e:
+        logger.warning("Selector stats lookup error: %s", e)
+
+    with _selector_stats_lock:
+        previous = _selector_stats.get(host)
+        stats = {
+            'loaded_at': time.monotonic(),
+            'pages': previous['pages'] if previous else 0,
+            'counts': counts
+        }
+        _selector_stats[host] = stats
+    return stats
+
+def plan_selector_order(host):
+    """Decide the selector order for the next page from ``host``.
+
+    Selectors are sorted by hit count, ties keeping their original order.
+    Every SCRAPE_SELECTOR_PROBE_INTERVAL pages the original order is used
+    instead, so a markup change that moves the winning selector is noticed.
+    """
+    stats = _host_selector_stats(host)
+    interval = app.config['SCRAPE_SELECTOR_PROBE_INTERVAL']
+    with _selector_stats_lock:
+        stats['pages'] += 1
+        probing = interval > 0 and stats['pages'] % interval == 0
+        counts = {field: dict(hits) for field, hits in stats['counts'].items()}
+
+    top = {field: max(hits, key=hits.get) if hits else None for field, hits in counts.items()}
+    if probing:
+        return {'brand': COMPILED_BRAND_SELECTORS, 'price': COMPILED_PRICE_SELECTORS, 'probing': True, 'top': top}
+    brand_hits = counts.get('brand', {})
+    price_hits = counts.get('price', {})
+    return {
+        'brand': sorted(COMPILED_BRAND_SELECTORS, key=lambda item: -brand_hits.get(item[0], 0)),
+        'price': sorted(COMPILED_PRICE_SELECTORS, key=lambda item: -price_hits.get(item[0], 0)),
+        'probing': False,
+        'top': top
+    }
+
+def record_selector_hits(host, result, plan):
+    """Count the sources that produced the accepted brand and price for ``host``.
+
+    When a probe picks a different winner than the current favourite, the
+    host's counts for that field are reset so the order is relearned.
+    """
+    now = datetime.now().strftime(SCRAPE_TIMESTAMP_FORMAT)
+    resets = []
+    hits = []
+    with _selector_stats_lock:
+        counts = _selector_stats.setdefault(
+            host, {'loaded_at': time.monotonic(), 'pages': 0, 'counts': {}}
+        )['counts']
+        for field in ('brand', 'price'):
+            source = result[f'{field}_source']
+            if not source:
+                continue
+            field_counts = counts.setdefault(field, {})
+            if plan['probing'] and plan['top'].get(field) not in (None, source):
+                logger.info("Selector change for %s %s: %s -> %s", host, field, plan['top'][field], source)
+                field_counts.clear()
+                resets.append(field)
+            field_counts[source] = field_counts.get(source, 0) + 1
+            hits.append((host, field, source, now))
+
+    if not hits:
+        return
+    try:
+        with _scrape_db_lock:
+            conn = get_scrape_db()
+            for field in resets:
+                conn.execute('DELETE FROM scrape_selector_stats WHERE host = ? AND field = ?', (host, field))
+            conn.executemany('''INSERT INTO scrape_selector_stats (host, field, selector, hits, last_hit)
+                                 VALUES (?, ?, ?, 1, ?)
+                                 ON CONFLICT(host, field, selector) DO UPDATE SET
+                                     hits = scrape_selector_stats.hits + 1,
+                                     last_hit = excluded.last_hit''', hits)
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Selector stats update error: %s", e)
+
+def selector_stats_report():
+    """Per-host selector hit counts and shares, as persisted in scrape_cache.db."""
+    with _scrape_db_lock:
+        rows = get_scrape_db().execute(
+            '''SELECT host, field, selector, hits, last_hit FROM scrape_selector_stats
+               ORDER BY host, field, hits DESC'''
+        ).fetchall()
+    report = {}
+    for host, field, selector, hits, last_hit in rows:
+        report.setdefault(host, {}).setdefault(field, []).append({
+            'selector': selector,
+            'hits': hits,
+            'last_hit': last_hit
+        })
+    for fields in report.values():
+        for entries in fields.values():
+            total = sum(entry['hits'] for entry in entries)
+            for entry in entries:
+                entry['share'] = round(entry['hits'] / total, 4) if total else 0
+    return report
+
+_http_connects = {}
+_http_connects_lock = threading.Lock()
+
+def _count_http_connect(scheme, host, port):
+    with _http_connects_lock:
+        key = (scheme, host, port)
+        _http_connects[key] = _http_connects.get(key, 0) + 1
+
+class CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_http_connect('http', self.host, self.port)
+        return super().connect()
+
+class CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_http_connect('https', self.host, self.port)
+        return super().connect()
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that records every TCP connect its pools make."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+_http_session = None
+_http_session_pid = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the outbound session shared by every request in this worker.
+
+    The session is created lazily and again after a fork, so gunicorn workers
+    never share sockets inherited from the master process.
+    """
+    global _http_session, _http_session_pid
+    pid = os.getpid()
+    if _http_session is None or _http_session_pid != pid:
+        with _http_session_lock:
+            if _http_session is None or _http_session_pid != pid:
+                session = requests.Session()
+                adapter = CountingHTTPAdapter(
+                    pool_connections=app.config['HTTP_POOL_CONNECTIONS'],
+                    pool_maxsize=app.config['HTTP_POOL_MAXSIZE']
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(SCRAPE_HEADERS)
+                with _http_connects_lock:
+                    _http_connects.clear()
+                _http_session = session
+                _http_session_pid = pid
+    return _http_session
+
+def http_get(url, **kwargs):
+    """GET through the pooled session with the configured connect/read timeouts."""
+    kwargs.setdefault('timeout', (app.config['HTTP_CONNECT_TIMEOUT'], app.config['HTTP_READ_TIMEOUT']))
+    host = urlparse(url).hostname or 'unknown'
+    status = 'error'
+    started = time.perf_counter()
+    try:
+        response = get_http_session().get(url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.observe('bolt_outbound_request_duration_seconds', time.perf_counter() - started, {'host': host})
+        metrics.inc('bolt_outbound_requests_total', {'host': host, 'status': status})
+
+def http_pool_stats():
+    """Per-host connection pool counters for this worker."""
+    adapter = get_http_session().get_adapter('https://')
+    pools = adapter.poolmanager.pools
+    hosts = []
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        with _http_connects_lock:
+            opened = _http_connects.get((pool.scheme, pool.host, pool.port), 0)
+        served = pool.num_requests
+        hosts.append({
+            'scheme': pool.scheme,
+            'host': pool.host,
+            'port': pool.port,
+            'requests': served,
+            'connections_opened': opened,
+            'connections_reused': max(served - opened, 0),
+            'idle_connections': pool.pool.qsize() if pool.pool else 0
+        })
+    return {
+        'pid': os.getpid(),
+        'pool_maxsize': app.config['HTTP_POOL_MAXSIZE'],
+        'connect_timeout': app.config['HTTP_CONNECT_TIMEOUT'],
+        'read_timeout': app.config['HTTP_READ_TIMEOUT'],
+        'hosts': hosts
+    }
+
+# Per-host politeness: a token bucket and an AIMD concurrency limit per origin,
+# kept in scrape_cache.db so every worker draws from the same budget
+app.config['SCRAPE_HOST_RATE'] = float(os.environ.get('SCRAPE_HOST_RATE', 5))  # requests per second, all workers
+app.config['SCRAPE_HOST_BURST'] = float(os.environ.get('SCRAPE_HOST_BURST', 10))
+app.config['SCRAPE_HOST_INITIAL_CONCURRENCY'] = float(os.environ.get('SCRAPE_HOST_INITIAL_CONCURRENCY', 4))
+app.config['SCRAPE_HOST_MIN_CONCURRENCY'] = float(os.environ.get('SCRAPE_HOST_MIN_CONCURRENCY', 1))
+app.config['SCRAPE_HOST_MAX_CONCURRENCY'] = float(os.environ.get('SCRAPE_HOST_MAX_CONCURRENCY', 16))
+app.config['SCRAPE_HOST_LATENCY_FACTOR'] = float(os.environ.get('SCRAPE_HOST_LATENCY_FACTOR', 2))  # x baseline
+app.config['SCRAPE_HOST_LATENCY_FLOOR'] = float(os.environ.get('SCRAPE_HOST_LATENCY_FLOOR', 0.5))  # seconds
+app.config['SCRAPE_HOST_MAX_WAIT'] = float(os.environ.get('SCRAPE_HOST_MAX_WAIT', 30))  # seconds to wait for a slot
+app.config['SCRAPE_HOST_MAX_RETRY_AFTER'] = int(os.environ.get('SCRAPE_HOST_MAX_RETRY_AFTER', 300))  # seconds
+app.config['SCRAPE_FETCH_ATTEMPTS'] = int(os.environ.get('SCRAPE_FETCH_ATTEMPTS', 3))
+
+SCRAPE_RETRY_STATUSES = {429, 502, 503, 504}
+
+class HostBudgetExhausted(Exception):
+    """No request slot for the host opened up within SCRAPE_HOST_MAX_WAIT."""
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), app.config['SCRAPE_HOST_MAX_RETRY_AFTER'])
+
+def load_host_budget(conn, host, now):
+    row = conn.execute('''SELECT tokens, refilled_at, concurrency, blocked_until, latency, baseline, decreased_at
+                          FROM scrape_host_budget WHERE host = ?''', (host,)).fetchone()
+    if row is None:
+        return {'tokens': app.config['SCRAPE_HOST_BURST'], 'refilled_at': now,
+                'concurrency': app.config['SCRAPE_HOST_INITIAL_CONCURRENCY'], 'blocked_until': 0,
+                'latency': None, 'baseline': None, 'decreased_at': 0}
+    budget = dict(zip(('tokens', 'refilled_at', 'concurrency', 'blocked_until', 'latency', 'baseline',
+                       'decreased_at'), row))
+    budget['tokens'] = min(app.config['SCRAPE_HOST_BURST'],
+                           budget['tokens'] + max(now - budget['refilled_at'], 0) * app.config['SCRAPE_HOST_RATE'])
+    budget['refilled_at'] = now
+    return budget
+
+def save_host_budget(conn, host, budget):
+    conn.execute('''INSERT INTO scrape_host_budget
+                        (host, tokens, refilled_at, concurrency, blocked_until, latency, baseline, decreased_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(host) DO UPDATE SET
+                        tokens = excluded.tokens, refilled_at = excluded.refilled_at,
+                        concurrency = excluded.concurrency, blocked_until = excluded.blocked_until,
+                        latency = excluded.latency, baseline = excluded.baseline,
+                        decreased_at = excluded.decreased_at''',
+                 (host, budget['tokens'], budget['refilled_at'], budget['concurrency'], budget['blocked_until'],
+                  budget['latency'], budget['baseline'], budget['decreased_at']))
+
+def acquire_host_slot(host):
+    """Wait for a token and a free concurrency slot for ``host``; returns the slot id.
+
+    Slots expire after SCRAPE_LEASE_TTL so a worker that dies mid-fetch does
+    not shrink the host's concurrency for good.
+    """
+    deadline = time.monotonic() + app.config['SCRAPE_HOST_MAX_WAIT']
+    while True:
+        now = time.time()
+        with _scrape_db_lock:
+            conn = get_scrape_db()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM scrape_host_slot WHERE host = ? AND expires_at < ?', (host, now))
+                in_flight = conn.execute('SELECT COUNT(*) FROM scrape_host_slot WHERE host = ?',
+                                         (host,)).fetchone()[0]
+                budget = load_host_budget(conn, host, now)
+                if budget['blocked_until'] > now:
+                    wait = budget['blocked_until'] - now
+                elif in_flight >= int(budget['concurrency']):
+                    wait = 0.05
+                elif budget['tokens'] < 1:
+                    wait = (1 - budget['tokens']) / app.config['SCRAPE_HOST_RATE']
+                else:
+                    wait = 0
+                    budget['tokens'] -= 1
+                    slot = uuid.uuid4().hex
+                    conn.execute('INSERT INTO scrape_host_slot (id, host, expires_at) VALUES (?, ?, ?)',
+                                 (slot, host, now + app.config['SCRAPE_LEASE_TTL']))
+                save_host_budget(conn, host, budget)
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.warning("Host budget error for %s: %s", host, e)
+                # Fetch unscheduled rather than not at all
+                return None
+        if not wait:
+            return slot
+        if time.monotonic() + wait > deadline:
+            raise HostBudgetExhausted(f'No request slot for {host} within {app.config["SCRAPE_HOST_MAX_WAIT"]:g}s')
+        time.sleep(min(wait, 0.5))
+
+def release_host_slot(host, slot, status, latency, retry_after=None):
+    """Return a slot and adapt the host's concurrency to how the request went.
+
+    Successes grow the limit by about one per window of requests; a 429,
+    5xx, network failure or latency well above the host's baseline halves
+    it, at most once per round trip.
+    """
+    now = time.time()
+    with _scrape_db_lock:
+        conn = get_scrape_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if slot:
+                conn.execute('DELETE FROM scrape_host_slot WHERE id = ?', (slot,))
+            budget = load_host_budget(conn, host, now)
+            if status is not None:
+                budget['latency'] = latency if budget['latency'] is None else 0.8 * budget['latency'] + 0.2 * latency
+                baseline = budget['baseline']
+                # Falls immediately, rises slowly, so a slow origin does not become the new normal
+                budget['baseline'] = (budget['latency'] if baseline is None or budget['latency'] < baseline
+                                      else baseline + 0.01 * (budget['latency'] - baseline))
+            slow = (budget['baseline'] is not None
+                    and budget['latency'] > app.config['SCRAPE_HOST_LATENCY_FLOOR']
+                    and budget['latency'] > app.config['SCRAPE_HOST_LATENCY_FACTOR'] * budget['baseline'])
+            congested = status is None or status == 429 or status >= 500 or slow
+            if congested:
+                if now - budget['decreased_at'] > max(budget['latency'] or 0, 1.0):
+                    budget['concurrency'] = max(app.config['SCRAPE_HOST_MIN_CONCURRENCY'], budget['concurrency'] / 2)
+                    budget['decreased_at'] = now
+            else:
+                budget['concurrency'] = min(app.config['SCRAPE_HOST_MAX_CONCURRENCY'],
+                                            budget['concurrency'] + 1 / budget['concurrency'])
+            wait = parse_retry_after(retry_after) if status in SCRAPE_RETRY_STATUSES else None
+            if wait:
+                budget['blocked_until'] = max(budget['blocked_until'], now + wait)
+            save_host_budget(conn, host, budget)
+            conn.commit()
         except sqlite3.Error as e:
-            print(f"Cache lookup error: {e}")
+            conn.rollback()
+            logger.warning("Host budget error for %s: %s", host, e)
+
+def scheduled_get(url, **kwargs):
+    """GET ``url`` within its host's budget, retrying 429/5xx after any Retry-After.
+
+    Network errors are not retried; they already cost a full timeout.
+    """
+    host = urlparse(url).hostname or 'unknown'
+    for attempt in range(app.config['SCRAPE_FETCH_ATTEMPTS']):
+        slot = acquire_host_slot(host)
+        status = retry_after = None
+        started = time.perf_counter()
+        try:
+            response = http_get(url, **kwargs)
+            status = response.status_code
+            retry_after = response.headers.get('Retry-After')
+        finally:
+            release_host_slot(host, slot, status, time.perf_counter() - started, retry_after)
+        if status not in SCRAPE_RETRY_STATUSES or attempt == app.config['SCRAPE_FETCH_ATTEMPTS'] - 1:
+            return response
+        logger.debug("Got %s from %s, retrying (attempt %d)", status, host, attempt + 1)
+        response.close()
+
+def host_budget_stats():
+    now = time.time()
+    with _scrape_db_lock:
+        conn = get_scrape_db()
+        hosts = [row[0] for row in conn.execute('SELECT host FROM scrape_host_budget ORDER BY host')]
+        stats = []
+        for host in hosts:
+            budget = load_host_budget(conn, host, now)
+            in_flight = conn.execute('SELECT COUNT(*) FROM scrape_host_slot WHERE host = ? AND expires_at >= ?',
+                                     (host, now)).fetchone()[0]
+            stats.append({
+                'host': host,
+                'tokens': round(budget['tokens'], 2),
+                'concurrency': round(budget['concurrency'], 2),
+                'in_flight': in_flight,
+                'blocked_for': round(max(budget['blocked_until'] - now, 0), 2),
+                'latency': round(budget['latency'], 3) if budget['latency'] is not None else None,
+                'baseline': round(budget['baseline'], 3) if budget['baseline'] is not None else None
+            })
+    return {'rate': app.config['SCRAPE_HOST_RATE'], 'burst': app.config['SCRAPE_HOST_BURST'], 'hosts': stats}
+
+# In-memory tier in front of the shared scrape_cache table, per worker
+scrape_memory_cache = TTLCache(
+    maxsize=app.config['SCRAPE_MEMORY_CACHE_SIZE'],
+    ttl=app.config['SCRAPE_MEMORY_CACHE_TTL']
+)
+
+_scrape_db = None
+_scrape_db_pid = None
+_scrape_db_lock = threading.RLock()
+
+def get_scrape_db():
+    """Return this worker's long-lived scrape_cache.db connection.
+
+    Callers must hold ``_scrape_db_lock`` while using it.
+    """
+    global _scrape_db, _scrape_db_pid
+    pid = os.getpid()
+    with _scrape_db_lock:
+        if _scrape_db is None or _scrape_db_pid != pid:
+            conn = sqlite3.connect(app.config['SCRAPE_CACHE_PATH'], timeout=10, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            _scrape_db = conn
+            _scrape_db_pid = pid
+        return _scrape_db
+
+def scrape_cache_engine():
+    """The main database engine, for scrape_cache access from threads without an app context."""
+    with app.app_context():
+        return db.engine
+
+def scrape_cache_insert(conn):
+    return upsert_insert(ScrapeCache.__table__, conn)
+
+def scrape_price_value(price):
+    """The numeric value of a scraped price string such as '1,250', or None."""
+    try:
+        return round(float(price.replace(',', '')), 2) if price else None
+    except ValueError:
+        return None
+
+def upsert_scrape_rows(conn, rows):
+    """Insert or update scraped results in bulk, newest ``timestamp`` winning.
+
+    Each row carries url, brand, price, timestamp, brand_timestamp, etag and
+    last_modified. A row without a brand keeps the stored brand and its age,
+    and any tombstone on the URL is cleared.
+    """
+    table = ScrapeCache.__table__
+    insert = scrape_cache_insert(conn)
+    excluded = insert.excluded
+    statement = insert.on_conflict_do_update(
+        index_elements=[table.c.url],
+        set_={
+            'brand': db.func.coalesce(excluded.brand, table.c.brand),
+            'brand_timestamp': db.case(
+                (excluded.brand.isnot(None), excluded.brand_timestamp),
+                else_=db.func.coalesce(table.c.brand_timestamp, table.c.timestamp)
+            ),
+            'price': excluded.price,
+            'price_value': excluded.price_value,
+            'timestamp': excluded.timestamp,
+            'etag': excluded.etag,
+            'last_modified': excluded.last_modified,
+            'failure': None,
+            'failure_count': 0,
+            'failure_until': None,
+            'failed_at': None
+        },
+        where=db.or_(table.c.timestamp.is_(None), table.c.timestamp <= excluded.timestamp)
+    )
+    # Stay well below SQLite's bound parameter limit
+    for start in range(0, len(rows), 500):
+        conn.execute(statement, [dict(row, price_value=scrape_price_value(row['price']), failure_count=0)
+                                 for row in rows[start:start + 500]])
+
+def import_legacy_scrape_cache(local):
+    """Copy results from the old scrape_cache table in ``local`` into the shared table.
+
+    The old table is left as it is. Returns False if the shared table could
+    not be written, so that the import is tried again on the next start.
+    """
+    if not local.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scrape_cache'").fetchone():
+        return True
+    columns = {row[1] for row in local.execute('PRAGMA table_info(scrape_cache)')}
+    optional = [column if column in columns else 'NULL'
+                for column in ('brand_timestamp', 'etag', 'last_modified')]
+    rows = []
+    for url, brand, price, timestamp, brand_timestamp, etag, last_modified in local.execute(
+            f'''SELECT url, brand, price, timestamp, {', '.join(optional)}
+                FROM scrape_cache WHERE price IS NOT NULL AND timestamp IS NOT NULL'''):
+        try:
+            rows.append({
+                'url': url,
+                'brand': brand,
+                'price': price,
+                'timestamp': datetime.strptime(timestamp, SCRAPE_TIMESTAMP_FORMAT),
+                'brand_timestamp': (datetime.strptime(brand_timestamp, SCRAPE_TIMESTAMP_FORMAT)
+                                    if brand_timestamp else None),
+                'etag': etag,
+                'last_modified': last_modified
+            })
+        except ValueError:
+            continue
+    try:
+        with scrape_cache_engine().begin() as conn:
+            upsert_scrape_rows(conn, rows)
+    except SQLAlchemyError as e:
+        logger.warning("Could not import the local scrape cache: %s", e)
+        return False
+    logger.info("Imported %d scrape cache entries into the main database", len(rows))
+    return True
+
+LEGACY_SCRAPE_CACHE_PATHS = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_cache.db'),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scrape_cache.db')
+]
+
+def import_legacy_scrape_caches(conn):
+    """Import each old scrape_cache table once, recording the files done in ``conn``.
+
+    Besides SCRAPE_CACHE_PATH itself, older versions left the file in the
+    working directory: the backend directory or the repository root,
+    depending on how the app was started. Those files are only read.
+    """
+    target = os.path.abspath(app.config['SCRAPE_CACHE_PATH'])
+    imported = {row[0] for row in conn.execute('SELECT path FROM scrape_cache_import')}
+    for path in dict.fromkeys([target] + LEGACY_SCRAPE_CACHE_PATHS):
+        if path in imported or not os.path.exists(path):
+            continue
+        if path == target:
+            done = import_legacy_scrape_cache(conn)
+        else:
+            legacy = sqlite3.connect(f'file:{quote(path)}?mode=ro', uri=True, timeout=10)
+            try:
+                done = import_legacy_scrape_cache(legacy)
+            except sqlite3.Error as e:
+                logger.warning("Could not read %s: %s", path, e)
+                done = False
+            finally:
+                legacy.close()
+        if done:
+            conn.execute('INSERT OR REPLACE INTO scrape_cache_import (path, imported_at) VALUES (?, ?)',
+                         (path, time.time()))
+            conn.commit()
+
+def init_scrape_cache():
+    with _scrape_db_lock:
+        conn = get_scrape_db()
+        # Old scrape_cache files already copied into the shared table
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_cache_import
+                        (path TEXT PRIMARY KEY, imported_at REAL NOT NULL)''')
+        conn.commit()
+        if app.config['SCRAPE_CACHE_IMPORT_LEGACY']:
+            import_legacy_scrape_caches(conn)
+        # One row per URL currently being fetched by some worker
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_lease
+                        (url TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)''')
+        # Which selector produced the accepted brand/price, per host
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_selector_stats
+                        (host TEXT NOT NULL, field TEXT NOT NULL, selector TEXT NOT NULL,
+                         hits INTEGER NOT NULL DEFAULT 0, last_hit TEXT,
+                         PRIMARY KEY (host, field, selector))''')
+        # Shared request budget per origin, and the requests currently holding a slot
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_host_budget
+                        (host TEXT PRIMARY KEY, tokens REAL NOT NULL, refilled_at REAL NOT NULL,
+                         concurrency REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0,
+                         latency REAL, baseline REAL, decreased_at REAL NOT NULL DEFAULT 0)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_host_slot
+                        (id TEXT PRIMARY KEY, host TEXT NOT NULL, expires_at REAL NOT NULL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS scrape_host_slot_host ON scrape_host_slot (host, expires_at)')
+        conn.commit()
+
+def scrape_freshness(fetched_at, ttl_seconds, now):
+    """Classify a cached field as 'fresh', 'stale' (servable while refreshing) or 'expired'."""
+    age = (now - fetched_at).total_seconds()
+    if age < ttl_seconds:
+        return 'fresh'
+    if app.config['SCRAPE_STALE_WHILE_REVALIDATE'] and age < ttl_seconds + app.config['SCRAPE_STALE_GRACE']:
+        return 'stale'
+    return 'expired'
+
+def scrape_entry_deadline(entry):
+    """Moment after which a cache entry can no longer be served, even stale."""
+    grace = app.config['SCRAPE_STALE_GRACE'] if app.config['SCRAPE_STALE_WHILE_REVALIDATE'] else 0
+    return entry['price_fetched_at'] + timedelta(seconds=app.config['SCRAPE_PRICE_TTL'] + grace)
+
+def scrape_entry_brand(entry, now):
+    """Return the cached brand and its freshness; an expired brand is reported as None."""
+    state = scrape_freshness(entry['brand_fetched_at'], app.config['SCRAPE_BRAND_TTL'], now)
+    return (entry['brand'] if state != 'expired' else None), state
+
+SCRAPE_ENTRY_COLUMNS = [ScrapeCache.brand, ScrapeCache.price, ScrapeCache.price_value,
+                        ScrapeCache.timestamp, ScrapeCache.brand_timestamp]
+SCRAPE_TOMBSTONE_COLUMNS = [ScrapeCache.failure, ScrapeCache.failure_count, ScrapeCache.failure_until]
+
+def parse_scrape_row(row):
+    """Turn a scrape_cache row (see SCRAPE_ENTRY_COLUMNS) into a cache entry, or None if it is unusable."""
+    # Reject the row if the price is missing, unreasonably low (less than 10)
+    # or did not parse as a number
+    if row.timestamp is None or row.price_value is None or row.price_value < 10:
+        return None
+    return {
+        'brand': row.brand,
+        # Remove AED from cached price
+        'price': row.price.replace(' AED', '').replace('AED', '').strip(),
+        'price_fetched_at': row.timestamp,
+        'brand_fetched_at': row.brand_timestamp or row.timestamp
+    }
+
+def scrape_entry_payload(entry, now=None):
+    """Build the response payload for a cache entry, or None once its price has expired."""
+    now = now or datetime.now()
+    price_state = scrape_freshness(entry['price_fetched_at'], app.config['SCRAPE_PRICE_TTL'], now)
+    if price_state == 'expired':
+        return None
+    brand, brand_state = scrape_entry_brand(entry, now)
+    return {
+        'brand': brand,
+        'price': entry['price'],
+        'cached': True,
+        'stale': 'stale' in (price_state, brand_state)
+    }
+
+def remember_scrape_entry(url, entry):
+    ttl = (scrape_entry_deadline(entry) - datetime.now()).total_seconds()
+    scrape_memory_cache.set(url, entry, ttl=ttl)
+
+def scrape_tombstone_key(url):
+    return ('tombstone', url)
+
+def parse_scrape_tombstone(row):
+    """Turn a row's failure columns into a tombstone, or None if there is no active one."""
+    if row.failure not in SCRAPE_FAILURES or not row.failure_until or row.failure_until <= time.time():
+        return None
+    return {'failure': row.failure, 'failure_count': row.failure_count, 'failure_until': row.failure_until}
+
+def remember_scrape_tombstone(url, tombstone):
+    scrape_memory_cache.set(scrape_tombstone_key(url), tombstone, ttl=tombstone['failure_until'] - time.time())
+
+def active_scrape_tombstone(url):
+    tombstone = scrape_memory_cache.get(scrape_tombstone_key(url))
+    if tombstone and tombstone['failure_until'] > time.time():
+        return tombstone
+    return None
+
+def scrape_tombstone_payload(tombstone, cached=True):
+    return {
+        'error': SCRAPE_FAILURES[tombstone['failure']][1],
+        'failure': tombstone['failure'],
+        'missing': True,
+        'retry_at': datetime.fromtimestamp(tombstone['failure_until']).isoformat(),
+        'cached': cached,
+        'stale': False
+    }
+
+def scrape_payload_status(payload):
+    """HTTP status for a payload: 200 for data, the failure's status for a tombstone."""
+    failure = payload.get('failure')
+    return SCRAPE_FAILURES[failure][0] if failure in SCRAPE_FAILURES else 200
+
+def record_scrape_failure(url, failure):
+    """Tombstone ``url`` after a failed scrape and return the failure payload.
+
+    The tombstone lasts the failure kind's TTL, doubled for each failure in a
+    row, up to SCRAPE_TOMBSTONE_MAX_TTL. Cached brand and price data are kept.
+    """
+    now = time.time()
+    tombstone = None
+    try:
+        with scrape_cache_engine().begin() as conn:
+            previous = conn.execute(
+                db.select(ScrapeCache.failure_count)
+                .where(ScrapeCache.url == url, ScrapeCache.failure.isnot(None))
+            ).scalar()
+            count = (previous or 0) + 1
+            ttl = min(app.config['SCRAPE_TOMBSTONE_TTL'][failure] * 2 ** min(count - 1, 16),
+                      app.config['SCRAPE_TOMBSTONE_MAX_TTL'])
+            values = {'failure': failure, 'failure_count': count, 'failure_until': now + ttl,
+                      'failed_at': datetime.now()}
+            conn.execute(scrape_cache_insert(conn).values(url=url, **values)
+                         .on_conflict_do_update(index_elements=['url'], set_=values))
+        tombstone = {'failure': failure, 'failure_count': count, 'failure_until': now + ttl}
+        remember_scrape_tombstone(url, tombstone)
+        logger.debug("Tombstoned %s (%s, %d in a row) for %ds", url, failure, count, ttl)
+    except SQLAlchemyError as e:
+        logger.warning("Tombstone update error: %s", e)
+    return scrape_tombstone_payload(tombstone or {'failure': failure, 'failure_until': now}, cached=False)
+
+def lookup_scrape_cache(urls, revalidate=True):
+    """Look up several URLs, memory first, then the scrape_cache table in one query per chunk.
+
+    Returns a dict of url -> payload for the entries that can still be served.
+    Stale entries are marked ``stale: True`` and, when ``revalidate`` is set,
+    queued for a background refresh. URLs with no servable data but an
+    active tombstone get its failure payload (see ``scrape_payload_status``).
+    """
+    now = datetime.now()
+    hits = {}
+    misses = []
+    for url in urls:
+        entry = scrape_memory_cache.get(url)
+        payload = scrape_entry_payload(entry, now) if entry else None
+        if payload:
+            hits[url] = payload
+            metrics.inc('bolt_scrape_cache_lookups_total',
+                        {'tier': 'memory', 'result': 'stale' if payload['stale'] else 'hit'})
+            continue
+        tombstone = active_scrape_tombstone(url)
+        if tombstone:
+            hits[url] = scrape_tombstone_payload(tombstone)
+            metrics.inc('bolt_scrape_cache_lookups_total', {'tier': 'memory', 'result': 'tombstone'})
+        else:
+            misses.append(url)
+
+    rows = []
+    if misses:
+        try:
+            with scrape_cache_engine().connect() as conn:
+                # Stay well below SQLite's bound parameter limit
+                for start in range(0, len(misses), 500):
+                    rows.extend(conn.execute(
+                        db.select(ScrapeCache.url, *SCRAPE_ENTRY_COLUMNS, *SCRAPE_TOMBSTONE_COLUMNS)
+                        .where(ScrapeCache.url.in_(misses[start:start + 500]))
+                    ).all())
+        except SQLAlchemyError as e:
+            logger.warning("Cache lookup error: %s", e)
             # Continue without cache if there's an error
 
-        # Make the request to the URL with a timeout and retry mechanism
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=10, verify=False)  # Added verify=False for testing
-            response.raise_for_status()
-            print(f"Successfully fetched URL: {url}")
-            print(f"Response status code: {response.status_code}")
-            print(f"Response headers: {response.headers}")
-        except requests.RequestException as e:
-            print(f"Request failed for {url}: {str(e)}")
-            return jsonify({'error': f'Failed to fetch URL: {str(e)}'}), 500
-        
-        # Try parsing with lxml first, fall back to html.parser if it fails
-        try:
-            soup = BeautifulSoup(response.text, 'lxml')
-            print("Successfully parsed HTML with lxml")
-        except Exception as e:
-            print(f"Failed to parse with lxml: {str(e)}")
+    for row in rows:
+        url = row.url
+        entry = parse_scrape_row(row)
+        payload = scrape_entry_payload(entry, now) if entry else None
+        tombstone = parse_scrape_tombstone(row)
+        if tombstone:
+            remember_scrape_tombstone(url, tombstone)
+        if payload:
+            remember_scrape_entry(url, entry)
+            hits[url] = payload
+            metrics.inc('bolt_scrape_cache_lookups_total',
+                        {'tier': 'disk', 'result': 'stale' if payload['stale'] else 'hit'})
+        elif tombstone:
+            hits[url] = scrape_tombstone_payload(tombstone)
+            metrics.inc('bolt_scrape_cache_lookups_total', {'tier': 'disk', 'result': 'tombstone'})
+        else:
+            logger.debug("Cache invalidated for %s", url)
+    missed = len(misses) - sum(1 for url in misses if url in hits)
+    if missed:
+        metrics.inc('bolt_scrape_cache_lookups_total', {'tier': 'none', 'result': 'miss'}, missed)
+
+    if revalidate:
+        for url, payload in hits.items():
+            # A tombstoned URL keeps serving its stale data until the tombstone lapses
+            if payload['stale'] and not active_scrape_tombstone(url):
+                schedule_scrape_refresh(url)
+    return hits
+
+def store_scrape_result(url, brand_name, price, etag=None, last_modified=None):
+    timestamp = datetime.now()
+    row = None
+    try:
+        with scrape_cache_engine().begin() as conn:
+            # Update cache with full price string and brand. A brand we failed
+            # to find this time keeps its previous value and age.
+            upsert_scrape_rows(conn, [{
+                'url': url,
+                'brand': brand_name,
+                'price': price,
+                'timestamp': timestamp,
+                'brand_timestamp': timestamp if brand_name else None,
+                'etag': etag,
+                'last_modified': last_modified
+            }])
+            row = conn.execute(db.select(*SCRAPE_ENTRY_COLUMNS).where(ScrapeCache.url == url)).first()
+        logger.debug("Successfully cached data for %s", url)
+    except SQLAlchemyError as e:
+        logger.warning("Cache update error: %s", e)
+        # Continue without caching if there's an error
+
+    return _remember_stored_scrape_row(url, row)
+
+def extend_scrape_result(url):
+    """Treat the cached entry for ``url`` as just fetched, after a 304 Not Modified.
+
+    The brand's age is reset too when it came from the same fetch as the price.
+    """
+    timestamp = datetime.now()
+    row = None
+    try:
+        with scrape_cache_engine().begin() as conn:
+            conn.execute(
+                db.update(ScrapeCache)
+                .where(ScrapeCache.url == url)
+                .values(
+                    brand_timestamp=db.case((ScrapeCache.brand_timestamp == ScrapeCache.timestamp, timestamp),
+                                            else_=ScrapeCache.brand_timestamp),
+                    timestamp=timestamp,
+                    failure=None,
+                    failure_count=0,
+                    failure_until=None,
+                    failed_at=None
+                )
+            )
+            row = conn.execute(db.select(*SCRAPE_ENTRY_COLUMNS).where(ScrapeCache.url == url)).first()
+    except SQLAlchemyError as e:
+        logger.warning("Cache update error: %s", e)
+
+    return _remember_stored_scrape_row(url, row)
+
+def _remember_stored_scrape_row(url, row):
+    scrape_memory_cache.pop(scrape_tombstone_key(url))
+    entry = parse_scrape_row(row) if row else None
+    if entry:
+        remember_scrape_entry(url, entry)
+    else:
+        scrape_memory_cache.pop(url)
+    return entry
+
+_scrape_refresh_executor = None
+_scrape_refresh_pid = None
+_scrape_refreshing = set()
+_scrape_refresh_lock = threading.Lock()
+
+def schedule_scrape_refresh(url):
+    """Refresh a stale entry on this worker's background pool, once per URL at a time."""
+    global _scrape_refresh_executor, _scrape_refresh_pid
+    pid = os.getpid()
+    with _scrape_refresh_lock:
+        if _scrape_refresh_executor is None or _scrape_refresh_pid != pid:
+            _scrape_refresh_executor = ThreadPoolExecutor(
+                max_workers=app.config['SCRAPE_REFRESH_WORKERS'],
+                thread_name_prefix='scrape-refresh'
+            )
+            _scrape_refresh_pid = pid
+            _scrape_refreshing.clear()
+        if url in _scrape_refreshing:
+            return
+        _scrape_refreshing.add(url)
+        executor = _scrape_refresh_executor
+    executor.submit(_refresh_scrape_entry, url)
+
+def _refresh_scrape_entry(url):
+    try:
+        payload, status = scrape_product_page_once(url)
+        if status != 200:
+            logger.debug("Background refresh failed for %s: %s", url, payload.get('error'))
+    except Exception as e:
+        logger.warning("Background refresh error for %s: %s", url, e)
+    finally:
+        with _scrape_refresh_lock:
+            _scrape_refreshing.discard(url)
+
+def load_scrape_validators(url):
+    """Conditional request headers for ``url``, if its cached entry can be served again on a 304."""
+    try:
+        with scrape_cache_engine().connect() as conn:
+            row = conn.execute(
+                db.select(*SCRAPE_ENTRY_COLUMNS, ScrapeCache.etag, ScrapeCache.last_modified)
+                .where(ScrapeCache.url == url)
+            ).first()
+    except SQLAlchemyError as e:
+        logger.warning("Cache lookup error for %s: %s", url, e)
+        return {}
+    if not row or not parse_scrape_row(row):
+        return {}
+    headers = {}
+    if row.etag:
+        headers['If-None-Match'] = row.etag
+    if row.last_modified:
+        headers['If-Modified-Since'] = row.last_modified
+    return headers
+
+def scrape_product_page(url, conditional=True):
+    """Fetch a product page and extract its brand and price.
+
+    Returns a ``(payload, status_code)`` tuple in the shape served by
+    ``/api/scrape-brand``. Successful results are written to scrape_cache.
+    A cached entry with validators is revalidated, and a 304 just extends it.
+    """
+    validators = load_scrape_validators(url) if conditional else {}
+    try:
+        response = scheduled_get(url, verify=False, stream=True, headers=validators)  # Added verify=False for testing
+        if response.status_code == 304 and validators:
+            response.close()
+            page = None
+        elif response.status_code in (404, 410):
+            response.close()
+            logger.debug("No product page at %s", url)
+            return record_scrape_failure(url, 'not_found'), 404
+        else:
+            if not response.ok:
+                response.close()
+                response.raise_for_status()
+            logger.debug("Fetched %s: %s", url, response.status_code)
+            page, outcome = read_product_page(response)
+            logger.debug("Read %d characters of %s (%s)", len(page), url, outcome)
+    except HostBudgetExhausted as e:
+        logger.debug("Not fetching %s: %s", url, e)
+        return {'error': str(e)}, 503
+    except (requests.Timeout, requests.ConnectionError) as e:
+        logger.debug("Request failed for %s: %s", url, e)
+        return dict(record_scrape_failure(url, 'timeout'), error=f'Failed to fetch URL: {str(e)}'), 500
+    except requests.RequestException as e:
+        logger.debug("Request failed for %s: %s", url, e)
+        return {'error': f'Failed to fetch URL: {str(e)}'}, 500
+
+    if validators:
+        metrics.inc('bolt_scrape_revalidations_total', {'result': 'not_modified' if page is None else 'modified'})
+    if page is None:
+        entry = extend_scrape_result(url)
+        if not entry:
+            # The entry went away under us; nothing to extend, so fetch it in full
+            return scrape_product_page(url, conditional=False)
+        logger.debug("%s not modified", url)
+        return {
+            'brand': scrape_entry_brand(entry, datetime.now())[0],
+            'price': entry['price'],
+            'cached': False,
+            'stale': False
+        }, 200
+
+    try:
+        extracted = extract_product(page, urlparse(url).hostname)
+    except Exception as e:
+        logger.warning("Error during scraping %s: %s", url, e)
+        return {'error': f'Scraping error: {str(e)}'}, 500
+
+    brand_name = extracted['brand']
+    price = extracted['price']
+    logger.debug("Brand from %s, price from %s", extracted['brand_source'], extracted['price_source'])
+
+    if brand_name or price:
+        entry = store_scrape_result(url, brand_name, price, response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified'))
+        if entry and not brand_name:
+            # Keep serving the brand we already know while it is within its TTL
+            brand_name, _ = scrape_entry_brand(entry, datetime.now())
+        logger.debug("Scraped %s - Brand: %s, Price: %s", url, brand_name, price)
+        return {
+            'brand': brand_name,
+            'price': price,
+            'cached': False,
+            'stale': False
+        }, 200
+
+    logger.debug("Brand name and price not found for %s", url)
+    return record_scrape_failure(url, 'parse_miss'), 404
+
+def acquire_scrape_lease(url, owner):
+    """Claim the right to fetch ``url`` across workers. Returns False if someone else holds it."""
+    now = time.time()
+    try:
+        with _scrape_db_lock:
+            conn = get_scrape_db()
+            cursor = conn.execute('''INSERT INTO scrape_lease (url, owner, expires_at) VALUES (?, ?, ?)
+                                     ON CONFLICT(url) DO UPDATE SET
+                                         owner = excluded.owner,
+                                         expires_at = excluded.expires_at
+                                     WHERE scrape_lease.expires_at < ?''',
+                                  (url, owner, now + app.config['SCRAPE_LEASE_TTL'], now))
+            conn.commit()
+            return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        logger.warning("Lease error for %s: %s", url, e)
+        # Fetch without a lease rather than not at all
+        return True
+
+def release_scrape_lease(url, owner):
+    try:
+        with _scrape_db_lock:
+            conn = get_scrape_db()
+            conn.execute('DELETE FROM scrape_lease WHERE url = ? AND owner = ?', (url, owner))
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Lease release error for %s: %s", url, e)
+
+def scrape_lease_held(url):
+    with _scrape_db_lock:
+        row = get_scrape_db().execute('SELECT expires_at FROM scrape_lease WHERE url = ?', (url,)).fetchone()
+    return row is not None and row[0] >= time.time()
+
+def load_fresh_scrape_payload(url):
+    """Read ``url`` straight from the scrape_cache table, returning a payload only if it is fresh.
+
+    A failure the other worker just recorded comes back as its tombstone payload.
+    """
+    with scrape_cache_engine().connect() as conn:
+        row = conn.execute(
+            db.select(*SCRAPE_ENTRY_COLUMNS, *SCRAPE_TOMBSTONE_COLUMNS).where(ScrapeCache.url == url)
+        ).first()
+    if not row:
+        return None
+    entry = parse_scrape_row(row)
+    payload = scrape_entry_payload(entry) if entry else None
+    if payload and not payload['stale']:
+        remember_scrape_entry(url, entry)
+        return payload
+    tombstone = parse_scrape_tombstone(row)
+    if tombstone:
+        remember_scrape_tombstone(url, tombstone)
+        return scrape_tombstone_payload(tombstone)
+    return None
+
+def wait_for_scrape_lease(url):
+    """Wait for another worker's fetch of ``url`` and return its cached result, if any."""
+    deadline = time.monotonic() + app.config['SCRAPE_LEASE_WAIT']
+    delay = 0.05
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        try:
+            if not scrape_lease_held(url):
+                return load_fresh_scrape_payload(url)
+        except (sqlite3.Error, SQLAlchemyError) as e:
+            logger.warning("Lease wait error for %s: %s", url, e)
+            return None
+    return None
+
+_scrape_inflight = {}
+_scrape_inflight_lock = threading.Lock()
+
+def scrape_product_page_once(url):
+    """Scrape ``url`` with single-flight deduplication.
+
+    Concurrent callers in this worker share one in-flight fetch. Across
+    workers a row in scrape_lease marks the URL as being fetched, and other
+    workers wait for that result instead of fetching it again.
+    """
+    with _scrape_inflight_lock:
+        future = _scrape_inflight.get(url)
+        leader = future is None
+        if leader:
+            future = Future()
+            _scrape_inflight[url] = future
+    if not leader:
+        return future.result()
+
+    try:
+        result = _scrape_with_lease(url)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _scrape_inflight_lock:
+            _scrape_inflight.pop(url, None)
+
+def _scrape_with_lease(url):
+    owner = f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    if not acquire_scrape_lease(url, owner):
+        payload = wait_for_scrape_lease(url)
+        if payload:
+            return payload, scrape_payload_status(payload)
+        # The other worker failed or took too long; fetch it ourselves
+        logger.debug("No shared result for %s, fetching directly", url)
+        return scrape_product_page(url)
+
+    try:
+        return scrape_product_page(url)
+    finally:
+        release_scrape_lease(url, owner)
+
+def resolve_scrape_url(item):
+    """Turn a SKU or product URL into the URL we scrape and cache under."""
+    item = str(item).strip()
+    if not item:
+        return None
+    if item.startswith(('http://', 'https://')):
+        return item
+    return app.config['SCRAPE_PRODUCT_URL'].format(sku=item)
+
+def is_product_url(url):
+    """True if ``url`` points at the product site configured in SCRAPE_PRODUCT_URL."""
+    product_host = urlparse(app.config['SCRAPE_PRODUCT_URL']).hostname
+    host = urlparse(url).hostname or ''
+    return host == product_host or host.endswith('.' + product_host)
+
+def parse_scrape_items(data):
+    """The items of a batch request: ``items``, or ``skus`` followed by ``urls``.
+
+    Returns None unless every field given is a list.
+    """
+    if not isinstance(data, dict):
+        return None
+    if 'items' in data:
+        items = data['items']
+        return items if isinstance(items, list) else None
+    skus = data.get('skus') or []
+    urls = data.get('urls') or []
+    if not isinstance(skus, list) or not isinstance(urls, list):
+        return None
+    return skus + urls
+
+def invalid_scrape_items(items):
+    """Indexes of items that are not a non-empty SKU or URL string (or a numeric SKU)."""
+    return [index for index, item in enumerate(items)
+            if isinstance(item, bool) or not isinstance(item, (str, int))
+            or (isinstance(item, str) and not item.strip())]
+
+def resolve_scrape_targets(items):
+    """Map product URL -> item in request order, plus the items on other hosts."""
+    targets = {}
+    rejected = []
+    for item in items:
+        url = resolve_scrape_url(item)
+        if not url:
+            continue
+        if not is_product_url(url):
+            rejected.append(item)
+        elif url not in targets:
+            targets[url] = item
+    return targets, rejected
+
+@app.route('/api/scrape-brand', methods=['POST'])
+def scrape_brand():
+    try:
+        url = request.json.get('url')
+        logger.debug("Starting brand scraping for URL: %s", url)
+
+        if not url:
+            return jsonify({'error': 'URL is required'}), 400
+
+        # Check cache first
+        cache_result = lookup_scrape_cache([url]).get(url)
+        if cache_result:
+            logger.debug("Cache hit for %s", url)
+            return jsonify(classify_scrape_payloads([cache_result])[0]), scrape_payload_status(cache_result)
+
+        payload, status = scrape_product_page_once(url)
+        return jsonify(classify_scrape_payloads([payload])[0]), status
+
+    except Exception as e:
+        logger.exception("Unexpected error in scrape_brand: %s", e)
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+
+@app.route('/api/scrape-brand/batch', methods=['POST'])
+@token_required
+def scrape_brand_batch(current_user):
+    items = parse_scrape_items(request.get_json(silent=True))
+    if not items:
+        return jsonify({'error': 'A non-empty list of items is required'}), 400
+    invalid = invalid_scrape_items(items)
+    if invalid:
+        return jsonify({'error': 'Items must be non-empty SKU or URL strings', 'invalid': invalid}), 400
+
+    # Deduplicate while keeping the order the caller sent
+    targets, rejected = resolve_scrape_targets(items)
+    if rejected:
+        return jsonify({'error': 'Only product page URLs can be scraped', 'rejected': rejected}), 400
+
+    max_items = app.config['SCRAPE_BATCH_MAX_ITEMS']
+    if len(targets) > max_items:
+        return jsonify({'error': f'At most {max_items} unique items per batch; '
+                                 'queue larger lists with /api/scrape-jobs'}), 400
+
+    logger.debug("Starting batch scrape for %d unique URLs", len(targets))
+    results = {}
+    for url, payload in lookup_scrape_cache(targets).items():
+        results[url] = (payload, scrape_payload_status(payload))
+
+    misses = [url for url in targets if url not in results]
+    if misses:
+        workers = max(1, min(app.config['SCRAPE_BATCH_WORKERS'], len(misses)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(scrape_product_page_once, url): url for url in misses}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    logger.error("Unexpected error scraping %s: %s", url, e)
+                    results[url] = ({'error': f'An unexpected error occurred: {str(e)}'}, 500)
+
+    payloads = classify_scrape_payloads([
+        dict(results[url][0], item=item, url=url, status=results[url][1])
+        for url, item in targets.items()
+    ])
+    return jsonify({
+        'results': payloads,
+        'total': len(targets),
+        'cache_hits': len(targets) - len(misses),
+        'fetched': len(misses)
+    })
+
+@app.route('/api/scrape-brand/pool-stats', methods=['GET'])
+@token_required
+def scrape_pool_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify(http_pool_stats())
+
+@app.route('/api/scrape-brand/cache-stats', methods=['GET'])
+@token_required
+def scrape_cache_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify({
+        'pid': os.getpid(),
+        'memory': scrape_memory_cache.stats()
+    })
+
+@app.route('/api/scrape-brand/selector-stats', methods=['GET'])
+@token_required
+def scrape_selector_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    try:
+        return jsonify(selector_stats_report())
+    except sqlite3.Error as e:
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+
+@app.route('/api/scrape-brand/tombstones', methods=['GET'])
+@token_required
+def list_scrape_tombstones(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    failure = request.args.get('failure')
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    conditions = [ScrapeCache.failure.isnot(None), ScrapeCache.failure_until > time.time()]
+    if failure:
+        conditions.append(ScrapeCache.failure == failure)
+
+    try:
+        with scrape_cache_engine().connect() as conn:
+            total = conn.execute(db.select(db.func.count()).select_from(ScrapeCache).where(*conditions)).scalar()
+            rows = conn.execute(
+                db.select(ScrapeCache.url, ScrapeCache.failure, ScrapeCache.failure_count,
+                          ScrapeCache.failure_until, ScrapeCache.failed_at, ScrapeCache.price.isnot(None))
+                .where(*conditions)
+                .order_by(ScrapeCache.failure_until.desc())
+                .limit(limit).offset(offset)
+            ).all()
+    except SQLAlchemyError as e:
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+
+    return jsonify({
+        'total': total,
+        'tombstones': [{
+            'url': url,
+            'failure': failure,
+            'failure_count': count,
+            'retry_at': datetime.fromtimestamp(until).isoformat(),
+            'failed_at': failed_at.isoformat() if failed_at else None,
+            'has_data': bool(has_data)
+        } for url, failure, count, until, failed_at, has_data in rows]
+    })
+
+@app.route('/api/scrape-brand/tombstones', methods=['DELETE'])
+@token_required
+def purge_scrape_tombstones(current_user):
+    """Clear tombstones for the given ``urls``, one ``failure`` kind, or all of them.
+
+    Other workers may keep answering from their in-memory copy for up to
+    SCRAPE_MEMORY_CACHE_TTL seconds.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    failure = data.get('failure')
+    if urls is not None and not isinstance(urls, list):
+        return jsonify({'message': 'urls must be a list'}), 400
+
+    conditions = [ScrapeCache.failure.isnot(None)]
+    if failure:
+        conditions.append(ScrapeCache.failure == failure)
+    try:
+        with scrape_cache_engine().begin() as conn:
+            purged_urls = []
+            chunks = [urls[i:i + 500] for i in range(0, len(urls), 500)] if urls is not None else [None]
+            for chunk in chunks:
+                chunk_conditions = list(conditions)
+                if chunk is not None:
+                    chunk_conditions.append(ScrapeCache.url.in_(chunk))
+                purged_urls.extend(conn.execute(db.select(ScrapeCache.url).where(*chunk_conditions)).scalars())
+            for start in range(0, len(purged_urls), 500):
+                chunk = ScrapeCache.url.in_(purged_urls[start:start + 500])
+                # Rows that only ever held a tombstone go; rows with data just lose it
+                conn.execute(db.delete(ScrapeCache).where(chunk, ScrapeCache.price.is_(None)))
+                conn.execute(
+                    db.update(ScrapeCache).where(chunk)
+                    .values(failure=None, failure_count=0, failure_until=None, failed_at=None)
+                )
+    except SQLAlchemyError as e:
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+
+    # Only the purged tombstones; cached product data stays
+    for url in purged_urls:
+        scrape_memory_cache.pop(scrape_tombstone_key(url))
+    purged = len(purged_urls)
+    logger.info("%s purged %d scrape tombstones", current_user.username, purged)
+    return jsonify({'purged': purged})
+
+@app.route('/api/scrape-brand/host-stats', methods=['GET'])
+@token_required
+def scrape_host_stats(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    try:
+        return jsonify(host_budget_stats())
+    except sqlite3.Error as e:
+        return jsonify({'message': f'Database error: {str(e)}'}), 500
+
+# Background scrape jobs, queued in a local SQLite file shared by all workers.
+# They run in scrape_worker.py, which gunicorn.conf.py (or ``python app.py``)
+# keeps running next to the web workers, so web workers only queue jobs and
+# report their progress.
+app.config['SCRAPE_JOBS_PATH'] = os.environ.get(
+    'SCRAPE_JOBS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scrape_jobs.db'))
+app.config['SCRAPE_JOB_WORKERS'] = int(os.environ.get('SCRAPE_JOB_WORKERS', 2))  # threads in the job process; 0 disables
+app.config['SCRAPE_JOB_MAX_ITEMS'] = int(os.environ.get('SCRAPE_JOB_MAX_ITEMS', 5000))
+app.config['SCRAPE_JOB_CLAIM_SIZE'] = int(os.environ.get('SCRAPE_JOB_CLAIM_SIZE', 5))
+app.config['SCRAPE_JOB_CLAIM_TTL'] = int(os.environ.get('SCRAPE_JOB_CLAIM_TTL', 120))  # seconds
+app.config['SCRAPE_JOB_POLL_INTERVAL'] = float(os.environ.get('SCRAPE_JOB_POLL_INTERVAL', 1))  # seconds
+app.config['SCRAPE_JOB_HEARTBEAT'] = int(os.environ.get('SCRAPE_JOB_HEARTBEAT', 10))  # seconds
+app.config['SCRAPE_JOB_STALL_AFTER'] = int(os.environ.get('SCRAPE_JOB_STALL_AFTER', 60))  # seconds without a heartbeat
+app.config['SCRAPE_JOB_STREAM_TIMEOUT'] = int(os.environ.get('SCRAPE_JOB_STREAM_TIMEOUT', 55))  # seconds
+app.config['SCRAPE_JOB_STREAM_KEEPALIVE'] = int(os.environ.get('SCRAPE_JOB_STREAM_KEEPALIVE', 15))  # seconds
+app.config['SCRAPE_JOB_RETENTION'] = int(os.environ.get('SCRAPE_JOB_RETENTION', 7 * 24 * 3600))  # seconds
+
+metrics.counter('bolt_scrape_job_items_total', 'Scrape job items processed, by result')
+
+SCRAPE_JOB_FINISHED = ('done', 'cancelled')
+SCRAPE_JOB_ACTIVE = ('queued', 'running')
+
+_scrape_jobs_db = None
+_scrape_jobs_db_pid = None
+_scrape_jobs_db_lock = threading.RLock()
+
+def get_scrape_jobs_db():
+    """Return this worker's scrape_jobs.db connection. Callers must hold ``_scrape_jobs_db_lock``."""
+    global _scrape_jobs_db, _scrape_jobs_db_pid
+    pid = os.getpid()
+    with _scrape_jobs_db_lock:
+        if _scrape_jobs_db is None or _scrape_jobs_db_pid != pid:
+            conn = sqlite3.connect(app.config['SCRAPE_JOBS_PATH'], timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            _scrape_jobs_db = conn
+            _scrape_jobs_db_pid = pid
+        return _scrape_jobs_db
+
+def init_scrape_jobs():
+    with _scrape_jobs_db_lock:
+        conn = get_scrape_jobs_db()
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_job
+                        (id TEXT PRIMARY KEY, user_id INTEGER, status TEXT NOT NULL,
+                         total INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0,
+                         failed INTEGER NOT NULL DEFAULT 0, seq INTEGER NOT NULL DEFAULT 0,
+                         created_at REAL NOT NULL, finished_at REAL)''')
+        # ``seq`` orders finished items within a job so event streams can resume
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_job_item
+                        (job_id TEXT NOT NULL, position INTEGER NOT NULL, item TEXT NOT NULL,
+                         url TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', result TEXT,
+                         seq INTEGER, claimed_by TEXT, claimed_until REAL,
+                         PRIMARY KEY (job_id, position))''')
+        conn.execute('CREATE INDEX IF NOT EXISTS scrape_job_item_status ON scrape_job_item (status, claimed_until)')
+        conn.execute('CREATE INDEX IF NOT EXISTS scrape_job_item_seq ON scrape_job_item (job_id, seq)')
+        # One row, refreshed by whichever job process is alive
+        conn.execute('''CREATE TABLE IF NOT EXISTS scrape_job_heartbeat
+                        (id INTEGER PRIMARY KEY CHECK (id = 1), pid INTEGER NOT NULL, beat_at REAL NOT NULL)''')
+        conn.commit()
+
+_scrape_job_beat_at = 0
+
+def beat_scrape_job_worker(force=False):
+    """Record that this job process is alive, at most every SCRAPE_JOB_HEARTBEAT seconds."""
+    global _scrape_job_beat_at
+    now = time.time()
+    if not force and now - _scrape_job_beat_at < app.config['SCRAPE_JOB_HEARTBEAT']:
+        return
+    _scrape_job_beat_at = now
+    with _scrape_jobs_db_lock:
+        conn = get_scrape_jobs_db()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO scrape_job_heartbeat (id, pid, beat_at) VALUES (1, ?, ?)',
+                         (os.getpid(), now))
+
+def scrape_job_worker_alive():
+    """Whether a job process has sent a heartbeat within SCRAPE_JOB_STALL_AFTER seconds."""
+    with _scrape_jobs_db_lock:
+        row = get_scrape_jobs_db().execute('SELECT beat_at FROM scrape_job_heartbeat WHERE id = 1').fetchone()
+    return row is not None and time.time() - row['beat_at'] <= app.config['SCRAPE_JOB_STALL_AFTER']
+
+def create_scrape_job(user_id, targets):
+    """Queue ``targets`` (url -> original item) as a new job and return its id."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _scrape_jobs_db_lock:
+        conn = get_scrape_jobs_db()
+        with conn:
+            # Drop finished jobs past retention while we hold the write lock anyway
+            expired = now - app.config['SCRAPE_JOB_RETENTION']
+            conn.execute('''DELETE FROM scrape_job_item WHERE job_id IN
+                            (SELECT id FROM scrape_job WHERE finished_at < ?)''', (expired,))
+            conn.execute('DELETE FROM scrape_job WHERE finished_at < ?', (expired,))
+            conn.execute('INSERT INTO scrape_job (id, user_id, status, total, created_at) VALUES (?, ?, ?, ?, ?)',
+                         (job_id, user_id, 'queued', len(targets), now))
+            conn.executemany('INSERT INTO scrape_job_item (job_id, position, item, url) VALUES (?, ?, ?, ?)',
+                             [(job_id, position, str(item), url)
+                              for position, (url, item) in enumerate(targets.items())])
+    _scrape_job_wakeup.set()
+    return job_id
+
+def claim_scrape_job_items(limit):
+    """Claim up to ``limit`` queued items, including ones whose previous claim expired.
+
+    Returns ``(claim, rows)``. A claim that outlives SCRAPE_JOB_CLAIM_TTL
+    (say its worker was restarted) is picked up again by another worker.
+    """
+    claim = uuid.uuid4().hex
+    now = time.time()
+    with _scrape_jobs_db_lock:
+        conn = get_scrape_jobs_db()
+        with conn:
+            conn.execute('''UPDATE scrape_job_item SET status = 'running', claimed_by = ?, claimed_until = ?
+                            WHERE rowid IN (SELECT rowid FROM scrape_job_item
+                                            WHERE status = 'pending'
+                                               OR (status = 'running' AND claimed_until < ?)
+                                            ORDER BY rowid LIMIT ?)''',
+                         (claim, now + app.config['SCRAPE_JOB_CLAIM_TTL'], now, limit))
+            rows = conn.execute('SELECT job_id, position, url FROM scrape_job_item WHERE claimed_by = ?',
+                                (claim,)).fetchall()
+            if rows:
+                conn.execute(f'''UPDATE scrape_job SET status = 'running'
+                                 WHERE status = 'queued' AND id IN ({','.join('?' * len(rows))})''',
+                             [row['job_id'] for row in rows])
+    return claim, rows
+
+def complete_scrape_job_item(claim, job_id, position, payload, status):
+    """Record an item's result and advance its job's counters in one transaction."""
+    failed = status != 200
+    with _scrape_jobs_db_lock:
+        conn = get_scrape_jobs_db()
+        with conn:
+            job = conn.execute('SELECT seq, total, done, failed, status FROM scrape_job WHERE id = ?',
+                               (job_id,)).fetchone()
+            if job is None or job['status'] == 'cancelled':
+                return
+            seq = job['seq'] + 1
+            updated = conn.execute('''UPDATE scrape_job_item SET status = ?, result = ?, seq = ?, claimed_by = NULL
+                                      WHERE job_id = ? AND position = ? AND claimed_by = ?''',
+                                   ('error' if failed else 'done', json.dumps(dict(payload, status=status)),
+                                    seq, job_id, position, claim)).rowcount
+            if not updated:
+                # Our claim expired and another worker took the item over
+                return
+            finished = job['done'] + job['failed'] + 1 >= job['total']
+            conn.execute('''UPDATE scrape_job SET seq = ?, done = done + ?, failed = failed + ?,
+                                status = ?, finished_at = ? WHERE id = ?''',
+                         (seq, 0 if failed else 1, 1 if failed else 0,
+                          'done' if finished else 'running', time.time() if finished else None, job_id))
+    beat_scrape_job_worker()
+    metrics.inc('bolt_scrape_job_items_total', {'result': 'error' if failed else 'done'})
+
+def process_scrape_job_items(claim, rows):
+    urls = [row['url'] for row in rows]
+    results = {url: (payload, scrape_payload_status(payload)) for url, payload in lookup_scrape_cache(urls).items()}
+    for row in rows:
+        url = row['url']
+        if url not in results:
             try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                print("Successfully parsed HTML with html.parser")
+                results[url] = scrape_product_page_once(url)
             except Exception as e:
-                print(f"Failed to parse with html.parser: {str(e)}")
-                return jsonify({'error': f'Failed to parse HTML: {str(e)}'}), 500
+                logger.error("Unexpected error scraping %s: %s", url, e)
+                results[url] = ({'error': f'An unexpected error occurred: {str(e)}'}, 500)
+        payload, status = results[url]
+        payload = classify_scrape_payloads([payload])[0]
+        complete_scrape_job_item(claim, row['job_id'], row['position'], payload, status)
 
-        # Print the first 1000 characters of the response for debugging
-        print(f"First 1000 chars of response: {response.text[:1000]}")
-        
-        brand_name = None
-        price = None
-        
+def run_scrape_job_worker():
+    while True:
         try:
-            # Enhanced selectors for brand name
-            brand_selectors = [
-                # Designer/brand specific links
-                'a[href*="/designers/"], a[href*="/brands/"]',
-                'a[href*="brand="], a[href*="designer="]',
-                # Breadcrumb navigation
-                'nav.breadcrumb a, nav.breadcrumbs a, .breadcrumb a, .breadcrumbs a',
-                # Schema.org metadata
-                '[itemprop="brand"], [itemprop="manufacturer"]',
-                # Common brand containers
-                '.brand-name, .product-brand, .designer-name',
-                # Product title with brand
-                'h1.product-title, h1.title, .product-name h1',
-                # Meta tags
-                'meta[property="og:brand"]',
-                'meta[name="brand"]'
-            ]
-            
-            # Try to find brand name
-            for selector in brand_selectors:
-                try:
-                    elements = soup.select(selector)
-                    print(f"Trying selector '{selector}': found {len(elements)} elements")
-                    if elements:
-                        for element in elements:
-                            # Get text from meta tags differently
-                            if element.name == 'meta':
-                                potential_brand = element.get('content', '')
-                            else:
-                                potential_brand = element.text.strip()
-                            
-                            # Clean and validate the brand name
-                            cleaned_brand = clean_brand_name(potential_brand)
-                            if cleaned_brand and len(cleaned_brand) > 1:  # Avoid single characters
-                                brand_name = cleaned_brand
-                                print(f"Found brand name '{brand_name}' using selector '{selector}'")
-                                break
-                        if brand_name:
-                            break
-                except Exception as e:
-                    print(f"Error with selector '{selector}': {str(e)}")
+            with app.app_context():
+                beat_scrape_job_worker()
+                claim, rows = claim_scrape_job_items(app.config['SCRAPE_JOB_CLAIM_SIZE'])
+                if rows:
+                    process_scrape_job_items(claim, rows)
                     continue
+        except Exception as e:
+            logger.error("Scrape job worker error: %s", e)
+        _scrape_job_wakeup.wait(app.config['SCRAPE_JOB_POLL_INTERVAL'])
+        _scrape_job_wakeup.clear()
 
-            # Enhanced selectors for price
-            price_selectors = [
-                # Specific class you mentioned
-                '.PriceContainer-slashedPrice',
-                # Common price containers
-                '.price, .product-price, .current-price',
-                '[itemprop="price"]',
-                '.price-container span',
-                '.price__current, .price-current',
-                # Sale prices
-                '.sale-price, .special-price',
-                # Main prices
-                '.main-price, .regular-price',
-                # Schema.org metadata
-                '[data-price], [data-product-price]',
-                # Specific price spans
-                'span.PriceContainer-price, span[class*="price"]'
-            ]
-            
-            # Try to find price
-            for selector in price_selectors:
-                try:
-                    elements = soup.select(selector)
-                    print(f"Trying price selector '{selector}': found {len(elements)} elements")
-                    if elements:
-                        for element in elements:
-                            # Try data attributes first, then text
-                            potential_price = element.get('data-price', element.get('content', element.text.strip()))
-                            print(f"Found potential price: {potential_price}")
-                            
-                            # Return the original price string without AED
-                            if potential_price:
-                                price = potential_price.replace(' AED', '').replace('AED', '').strip()
-                                print(f"Found price '{price}' using selector '{selector}'")
-                                break
-                        if price:
-                            break
-                except Exception as e:
-                    print(f"Error with price selector '{selector}': {str(e)}")
-                    continue
+_scrape_job_wakeup = threading.Event()
+_scrape_job_workers_pid = None
+_scrape_job_workers_lock = threading.Lock()
+
+def ensure_scrape_job_workers():
+    """Start this process's job worker threads once; returns the threads started."""
+    global _scrape_job_workers_pid
+    if not app.config['SCRAPE_JOB_WORKERS'] or _scrape_job_workers_pid == os.getpid():
+        return []
+    with _scrape_job_workers_lock:
+        if _scrape_job_workers_pid == os.getpid():
+            return []
+        _scrape_job_workers_pid = os.getpid()
+        threads = [threading.Thread(target=run_scrape_job_worker, name=f'scrape-job-{i}', daemon=True)
+                   for i in range(app.config['SCRAPE_JOB_WORKERS'])]
+        for thread in threads:
+            thread.start()
+        return threads
+
+def run_scrape_job_workers():
+    """Process queued scrape jobs until the process is stopped (see scrape_worker.py)."""
+    threads = ensure_scrape_job_workers()
+    if not threads:
+        logger.info("SCRAPE_JOB_WORKERS is 0, not running scrape jobs")
+        return
+    ensure_metrics_flusher()
+    beat_scrape_job_worker(force=True)
+    logger.info("Running scrape jobs with %d threads", len(threads))
+    for thread in threads:
+        thread.join()
+
+def load_scrape_job(job_id):
+    with _scrape_jobs_db_lock:
+        row = get_scrape_jobs_db().execute('SELECT * FROM scrape_job WHERE id = ?', (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def load_scrape_job_results(job_id, since):
+    with _scrape_jobs_db_lock:
+        rows = get_scrape_jobs_db().execute(
+            '''SELECT position, item, url, status, result, seq FROM scrape_job_item
+               WHERE job_id = ? AND seq > ? ORDER BY seq''',
+            (job_id, since)
+        ).fetchall()
+    return [dict(json.loads(row['result']), position=row['position'], item=row['item'],
+                 url=row['url'], seq=row['seq'])
+            for row in rows]
+
+def scrape_job_summary(job):
+    status = job['status']
+    if status in SCRAPE_JOB_ACTIVE and not scrape_job_worker_alive():
+        # Nothing is processing the queue; the job resumes once a job process is back
+        status = 'stalled'
+    return {
+        'id': job['id'],
+        'status': status,
+        'total': job['total'],
+        'done': job['done'],
+        'failed': job['failed'],
+        'seq': job['seq'],
+        'created_at': datetime.utcfromtimestamp(job['created_at']).isoformat(),
+        'finished_at': datetime.utcfromtimestamp(job['finished_at']).isoformat() if job['finished_at'] else None
+    }
+
+def get_owned_scrape_job(current_user, job_id):
+    job = load_scrape_job(job_id)
+    if job is None or (job['user_id'] != current_user.id and current_user.role != 'admin'):
+        return None
+    return job
+
+@app.route('/api/scrape-jobs', methods=['POST'])
+@token_required
+def create_scrape_job_route(current_user):
+    items = parse_scrape_items(request.get_json(silent=True))
+    if not items:
+        return jsonify({'error': 'A non-empty list of items is required'}), 400
+    invalid = invalid_scrape_items(items)
+    if invalid:
+        return jsonify({'error': 'Items must be non-empty SKU or URL strings', 'invalid': invalid}), 400
+
+    targets, rejected = resolve_scrape_targets(items)
+    if rejected:
+        return jsonify({'error': 'Only product page URLs can be scraped', 'rejected': rejected}), 400
+
+    max_items = app.config['SCRAPE_JOB_MAX_ITEMS']
+    if len(targets) > max_items:
+        return jsonify({'error': f'At most {max_items} unique items per job'}), 400
+
+    try:
+        job_id = create_scrape_job(current_user.id, targets)
+    except sqlite3.Error as e:
+        logger.error("Could not queue scrape job: %s", e)
+        return jsonify({'error': 'Could not queue the job'}), 500
+
+    logger.info("Queued scrape job %s with %d items for %s", job_id, len(targets), current_user.username)
+    return jsonify(scrape_job_summary(load_scrape_job(job_id))), 202
+
+@app.route('/api/scrape-jobs/<job_id>', methods=['GET'])
+@token_required
+def get_scrape_job(current_user, job_id):
+    job = get_owned_scrape_job(current_user, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    summary = scrape_job_summary(job)
+    summary['results'] = load_scrape_job_results(job_id, request.args.get('since', 0, type=int))
+    return jsonify(summary)
+
+@app.route('/api/scrape-jobs/<job_id>', methods=['DELETE'])
+@token_required
+def cancel_scrape_job(current_user, job_id):
+    job = get_owned_scrape_job(current_user, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job['status'] not in SCRAPE_JOB_FINISHED:
+        with _scrape_jobs_db_lock:
+            conn = get_scrape_jobs_db()
+            with conn:
+                conn.execute('''UPDATE scrape_job SET status = 'cancelled', finished_at = ? WHERE id = ?''',
+                             (time.time(), job_id))
+                conn.execute('''UPDATE scrape_job_item SET status = 'cancelled', claimed_by = NULL
+                                WHERE job_id = ? AND status IN ('pending', 'running')''', (job_id,))
+    return jsonify(scrape_job_summary(load_scrape_job(job_id)))
+
+@app.route('/api/scrape-jobs/<job_id>/events', methods=['GET'])
+@token_required
+def stream_scrape_job(current_user, job_id):
+    """Stream a job's finished items and progress as Server-Sent Events.
+
+    Each stream ends after SCRAPE_JOB_STREAM_TIMEOUT seconds, sending a
+    keep-alive comment every SCRAPE_JOB_STREAM_KEEPALIVE seconds while nothing
+    happens. Clients reconnect with ``Last-Event-ID`` (or ``?since=``) and
+    continue where they left off.
+    """
+    if get_owned_scrape_job(current_user, job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+
+    def events(last_seq):
+        deadline = time.monotonic() + app.config['SCRAPE_JOB_STREAM_TIMEOUT']
+        last_sent = time.monotonic()
+        last_summary = None
+        yield 'retry: 1000\n\n'
+        while True:
+            for result in load_scrape_job_results(job_id, last_seq):
+                last_seq = result['seq']
+                last_sent = time.monotonic()
+                yield f"id: {last_seq}\nevent: item\ndata: {json.dumps(result)}\n\n"
+            job = load_scrape_job(job_id)
+            if job is None:
+                return
+            summary = scrape_job_summary(job)
+            if summary != last_summary:
+                last_summary = summary
+                last_sent = time.monotonic()
+                yield f"id: {last_seq}\nevent: progress\ndata: {json.dumps(summary)}\n\n"
+            if job['status'] in SCRAPE_JOB_FINISHED and last_seq >= job['seq']:
+                yield f"id: {last_seq}\nevent: end\ndata: {json.dumps(summary)}\n\n"
+                return
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now - last_sent >= app.config['SCRAPE_JOB_STREAM_KEEPALIVE']:
+                last_sent = now
+                yield ': keep-alive\n\n'
+            time.sleep(0.5)
+
+    return Response(events(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@metrics.collector
+def http_pool_metrics():
+    if _http_session is None or _http_session_pid != os.getpid():
+        return []
+    gauges = []
+    for pool in http_pool_stats()['hosts']:
+        labels = {'host': pool['host']}
+        gauges.append(('bolt_outbound_connections_opened', labels, pool['connections_opened']))
+        gauges.append(('bolt_outbound_connections_reused', labels, pool['connections_reused']))
+    return gauges
+
+metrics.gauge('bolt_outbound_connections_opened', 'TCP connections opened by the outbound pool, by host')
+metrics.gauge('bolt_outbound_connections_reused', 'Requests served on a reused pooled connection, by host')
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'message': 'Unauthorized'}), 401
+
+    return Response(metrics.render(collect_metrics_snapshots()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Google Sheets
+app.config['GOOGLE_SHEETS_API_KEY'] = os.environ.get('GOOGLE_SHEETS_API_KEY', os.environ.get('REACT_APP_API_KEY'))
+app.config['QC_SHEET_ID'] = os.environ.get('QC_SHEET_ID', '19C-B-FiTNl1dirDg0H_5udNveCnlNPbF6LYyTp7M2L4')
+app.config['CASES_SHEET_ID'] = os.environ.get('CASES_SHEET_ID', '1M51SF6H9GaM7NlnpoDSUXCqC1ar4eMPljwUa59VcwAo')
+app.config['SHEETS_ALLOWED_IDS'] = set(filter(None, os.environ.get('SHEETS_ALLOWED_IDS', '').split(','))) | {
+    app.config['QC_SHEET_ID'], app.config['CASES_SHEET_ID']}
+app.config['SHEETS_FIXTURE_PATH'] = os.environ.get('SHEETS_FIXTURE_PATH')  # JSON file that replaces the Sheets API
+app.config['QC_RANGE'] = os.environ.get('QC_RANGE', 'Final view!A1:E')
+# Ranges the proxy serves besides QC_RANGE, BRANDS_RANGE and CASES_RANGE
+app.config['SHEETS_ALLOWED_RANGES'] = set(filter(None, os.environ.get('SHEETS_ALLOWED_RANGES', '').split(',')))
+app.config['EXCEPTION_LIMIT_RANGE'] = os.environ.get('EXCEPTION_LIMIT_RANGE', 'ExceptionLimit!A2:B')
+app.config['EXCEPTION_LIMIT_REFRESH'] = int(os.environ.get('EXCEPTION_LIMIT_REFRESH', 60))  # seconds between appends
+app.config['EXCEPTION_LIMIT_FULL_REFRESH'] = int(os.environ.get('EXCEPTION_LIMIT_FULL_REFRESH', 1800))  # seconds
+app.config['EXCEPTION_LIMIT_BATCH_MAX'] = int(os.environ.get('EXCEPTION_LIMIT_BATCH_MAX', 500))
+
+A1_RANGE_RE = re.compile(r'^(?P<sheet>[^!]+)!(?P<start_col>[A-Z]+)(?P<start_row>\d*):(?P<end_col>[A-Z]+)(?P<end_row>\d*)$')
+SHEET_NUMBER_RE = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+
+def parse_a1_range(range_):
+    """Split an A1 range like ``Sheet!A2:B`` into its parts, or None if it has another shape."""
+    match = A1_RANGE_RE.match(range_)
+    if not match:
+        return None
+    parts = match.groupdict()
+    parts['start_row'] = int(parts['start_row'] or 1)
+    parts['end_row'] = int(parts['end_row']) if parts['end_row'] else None
+    return parts
+
+def parse_sheet_number(value):
+    """Read a cell the way the frontend's parseFloat did: leading number or 0."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = SHEET_NUMBER_RE.match(str(value or ''))
+    return float(match.group(1)) if match else 0.0
+
+class GoogleSheetsUpstream:
+    """Reads ranges from the Sheets v4 API through the pooled outbound session."""
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def get_values(self, sheet_id, range_):
+        if not self.api_key:
+            raise RuntimeError('GOOGLE_SHEETS_API_KEY is not configured')
+        url = f'https://sheets.googleapis.com/v4/spreadsheets/{sheet_id}/values/{requests.utils.quote(range_)}'
+        response = http_get(url, params={'key': self.api_key})
+        response.raise_for_status()
+        return response.json().get('values', [])
+
+class FileSheetsUpstream:
+    """Serves ranges from a local JSON file, for tests and offline development.
+
+    The file maps ranges (optionally prefixed with ``<sheet_id>/``) to rows,
+    e.g. ``{"ExceptionLimit!A2:B": [["a@b.com", "120"]]}``. A request for a
+    later start row of a listed range gets the matching tail of its rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_values(self, sheet_id, range_):
+        with open(self.path) as f:
+            fixture = json.load(f)
+        for key in (f'{sheet_id}/{range_}', range_):
+            if key in fixture:
+                return fixture[key]
+        wanted = parse_a1_range(range_)
+        if wanted:
+            for key, rows in fixture.items():
+                listed = parse_a1_range(key.split('/', 1)[-1])
+                if (listed and listed['sheet'] == wanted['sheet']
+                        and listed['start_col'] == wanted['start_col']
+                        and listed['end_col'] == wanted['end_col']
+                        and listed['start_row'] <= wanted['start_row']):
+                    return rows[wanted['start_row'] - listed['start_row']:]
+        return []
+
+def get_sheets_upstream():
+    if app.config['SHEETS_FIXTURE_PATH']:
+        return FileSheetsUpstream(app.config['SHEETS_FIXTURE_PATH'])
+    return GoogleSheetsUpstream(app.config['GOOGLE_SHEETS_API_KEY'])
+
+def normalize_email(email):
+    # Case-sensitive, like the sheet lookup it replaces; only stray whitespace is ignored
+    return (email or '').strip()
+
+class ExceptionLimitIndex:
+    """Per-email exception count and summed value from the ExceptionLimit sheet.
+
+    The sheet is an append-only log, so a regular refresh fetches only the
+    rows after the ones already indexed. A full rebuild every
+    EXCEPTION_LIMIT_FULL_REFRESH seconds picks up edits and deletions.
+    """
+
+    def __init__(self, sheet_id, range_):
+        self.sheet_id = sheet_id
+        self.range = range_
+        self.counts = {}
+        self.values = {}
+        self.rows_indexed = 0
+        self.refreshed_at = None
+        self._checked_at = 0
+        self._rebuilt_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+
+    def _add_rows(self, rows, counts, values):
+        for row in rows:
+            email = normalize_email(row[0]) if row else ''
+            if email:
+                counts[email] = counts.get(email, 0) + 1
+                values[email] = values.get(email, 0.0) + parse_sheet_number(row[1] if len(row) > 1 else 0)
+
+    def refresh(self, full=False):
+        upstream = get_sheets_upstream()
+        parts = parse_a1_range(self.range)
+        if full or not self.rows_indexed or parts is None or parts['end_row'] is not None:
+            rows = upstream.get_values(self.sheet_id, self.range)
+            counts, values = {}, {}
+            self._add_rows(rows, counts, values)
+            with self._lock:
+                self.counts, self.values, self.rows_indexed = counts, values, len(rows)
+                self._rebuilt_at = time.monotonic()
+        else:
+            start_row = parts['start_row'] + self.rows_indexed
+            tail = f"{parts['sheet']}!{parts['start_col']}{start_row}:{parts['end_col']}"
+            rows = upstream.get_values(self.sheet_id, tail)
+            if rows:
+                with self._lock:
+                    # Copy so readers never see a half-applied append
+                    counts, values = dict(self.counts), dict(self.values)
+                    self._add_rows(rows, counts, values)
+                    self.counts, self.values = counts, values
+                    self.rows_indexed += len(rows)
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self.refreshed_at = datetime.utcnow()
+        logger.debug("Exception limit index has %d rows for %d emails", self.rows_indexed, len(self.counts))
+
+    def ensure_fresh(self):
+        """Load on first use; afterwards refresh in the background once the data is due."""
+        now = time.monotonic()
+        if self.refreshed_at is None:
+            with self._refreshing:
+                if self.refreshed_at is None:
+                    self.refresh(full=True)
+            return
+        if now - self._checked_at < app.config['EXCEPTION_LIMIT_REFRESH']:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        full = now - self._rebuilt_at >= app.config['EXCEPTION_LIMIT_FULL_REFRESH']
+
+        def run():
+            try:
+                self.refresh(full=full)
+            except Exception as e:
+                logger.warning("Exception limit refresh failed: %s", e)
+                with self._lock:
+                    self._checked_at = time.monotonic()
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name='exception-limit-refresh', daemon=True).start()
+
+    def lookup(self, email):
+        key = normalize_email(email)
+        with self._lock:
+            count = self.counts.get(key, 0)
+            total = self.values.get(key, 0.0)
+        return {
+            'email': email,
+            'match': count > 0,
+            'count': count,
+            'total_value': total
+        }
+
+exception_limit_index = ExceptionLimitIndex(app.config['QC_SHEET_ID'], app.config['EXCEPTION_LIMIT_RANGE'])
+
+@app.route('/api/exception-limit/<path:email>', methods=['GET'])
+@token_required
+def get_exception_limit(current_user, email):
+    try:
+        exception_limit_index.ensure_fresh()
+    except Exception as e:
+        logger.error("Exception limit load failed: %s", e)
+        return jsonify({'message': 'Exception limit data is unavailable'}), 503
+
+    result = exception_limit_index.lookup(email)
+    result['refreshed_at'] = exception_limit_index.refreshed_at.isoformat()
+    return jsonify(result)
 
+@app.route('/api/exception-limit/batch', methods=['POST'])
+@token_required
+def get_exception_limits(current_user):
+    data = request.get_json(silent=True) or {}
+    emails = data.get('emails')
+    if not isinstance(emails, list):
+        return jsonify({'message': 'A list of emails is required'}), 400
+    if len(emails) > app.config['EXCEPTION_LIMIT_BATCH_MAX']:
+        return jsonify({'message': f"At most {app.config['EXCEPTION_LIMIT_BATCH_MAX']} emails per request"}), 400
+
+    try:
+        exception_limit_index.ensure_fresh()
+    except Exception as e:
+        logger.error("Exception limit load failed: %s", e)
+        return jsonify({'message': 'Exception limit data is unavailable'}), 503
+
+    return jsonify({
+        'results': [exception_limit_index.lookup(email) for email in emails],
+        'refreshed_at': exception_limit_index.refreshed_at.isoformat()
+    })
+
+# Shared Google Sheets proxy
+app.config['SHEETS_REFRESH_INTERVAL'] = int(os.environ.get('SHEETS_REFRESH_INTERVAL', 60))  # seconds
+app.config['SHEETS_LOCAL_TTL'] = float(os.environ.get('SHEETS_LOCAL_TTL', 5))  # seconds between shared-copy checks
+app.config['SHEETS_LEASE_TTL'] = int(os.environ.get('SHEETS_LEASE_TTL', 30))  # seconds
+
+metrics.counter('bolt_sheets_requests_total', 'Sheets proxy responses by kind')
+metrics.counter('bolt_sheets_upstream_fetches_total', 'Sheets API fetches by result')
+
+def resolve_sheet_id(name):
+    """Map a sheet alias or ID to an allowed spreadsheet ID, or None."""
+    aliases = {'qc': app.config['QC_SHEET_ID'], 'cases': app.config['CASES_SHEET_ID']}
+    sheet_id = aliases.get(name or 'qc', name)
+    return sheet_id if sheet_id in app.config['SHEETS_ALLOWED_IDS'] else None
+
+def sheet_range_allowed(range_):
+    """Only the ranges the app reads get a shared snapshot and an upstream fetch."""
+    return range_ in app.config['SHEETS_ALLOWED_RANGES'] or range_ in {
+        app.config['QC_RANGE'], app.config['BRANDS_RANGE'], app.config['CASES_RANGE']}
+
+def sheet_values_version(rows):
+    payload = json.dumps(rows, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class CachedSheet:
+    """A worker's copy of one range, with memoized prefix versions for deltas."""
+
+    def __init__(self, values, version, fetched_at):
+        self.values = values
+        self.version = version
+        self.fetched_at = fetched_at
+        self.checked_at = time.monotonic()
+        self._prefix_versions = {}
+
+    def prefix_version(self, rows):
+        if rows not in self._prefix_versions:
+            if len(self._prefix_versions) >= 16:
+                self._prefix_versions.clear()
+            self._prefix_versions[rows] = sheet_values_version(self.values[:rows])
+        return self._prefix_versions[rows]
+
+_sheet_cache = {}
+_sheet_cache_lock = threading.Lock()
+_sheet_inflight = {}
+_sheet_refreshing = set()
+
+def sheet_refresh_owner():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+def acquire_sheet_lease(sheet_id, range_, owner):
+    """Claim the refresh of an existing snapshot across workers."""
+    now = time.time()
+    claimed = SheetSnapshot.query.filter(
+        SheetSnapshot.sheet_id == sheet_id,
+        SheetSnapshot.range == range_,
+        db.or_(SheetSnapshot.refresh_until.is_(None), SheetSnapshot.refresh_until < now)
+    ).update({'refresh_owner': owner, 'refresh_until': now + app.config['SHEETS_LEASE_TTL']},
+             synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def fetch_sheet_snapshot(sheet_id, range_):
+    """Fetch a range from upstream and store it as the shared snapshot.
+
+    Writes only the fetch time when the content has not changed, so other
+    workers can keep their parsed copy.
+    """
+    try:
+        values = get_sheets_upstream().get_values(sheet_id, range_)
+    except Exception:
+        metrics.inc('bolt_sheets_upstream_fetches_total', {'result': 'error'})
+        raise
+    version = sheet_values_version(values)
+    now = datetime.utcnow()
+
+    snapshot = SheetSnapshot.query.get((sheet_id, range_))
+    changed = snapshot is None or snapshot.version != version
+    if snapshot is None:
+        db.session.add(SheetSnapshot(sheet_id=sheet_id, range=range_, version=version,
+                                     row_count=len(values), values=json.dumps(values), fetched_at=now))
+    elif snapshot.version != version:
+        snapshot.version = version
+        snapshot.row_count = len(values)
+        snapshot.values = json.dumps(values)
+    if snapshot is not None:
+        snapshot.fetched_at = now
+        snapshot.refresh_owner = None
+        snapshot.refresh_until = None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker stored the first copy at the same time; theirs is as good as ours
+        db.session.rollback()
+    metrics.inc('bolt_sheets_upstream_fetches_total', {'result': 'changed' if changed else 'unchanged'})
+
+    cached = CachedSheet(values, version, now)
+    with _sheet_cache_lock:
+        _sheet_cache[(sheet_id, range_)] = cached
+    return cached
+
+def fetch_sheet_snapshot_once(sheet_id, range_):
+    """Fetch with single-flight deduplication inside this worker."""
+    key = (sheet_id, range_)
+    with _sheet_cache_lock:
+        future = _sheet_inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _sheet_inflight[key] = future
+    if not leader:
+        return future.result()
+
+    try:
+        cached = fetch_sheet_snapshot(sheet_id, range_)
+        future.set_result(cached)
+        return cached
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _sheet_cache_lock:
+            _sheet_inflight.pop(key, None)
+
+def schedule_sheet_refresh(sheet_id, range_):
+    """Refresh a due snapshot in the background if no other worker is already on it."""
+    key = (sheet_id, range_)
+    with _sheet_cache_lock:
+        if key in _sheet_refreshing:
+            return
+        _sheet_refreshing.add(key)
+
+    def run():
+        try:
+            with app.app_context():
+                if acquire_sheet_lease(sheet_id, range_, sheet_refresh_owner()):
+                    fetch_sheet_snapshot_once(sheet_id, range_)
         except Exception as e:
-            print(f"Error during scraping: {str(e)}")
-            return jsonify({'error': f'Scraping error: {str(e)}'}), 500
+            logger.warning("Sheet refresh failed for %s: %s", range_, e)
+        finally:
+            with _sheet_cache_lock:
+                _sheet_refreshing.discard(key)
+
+    threading.Thread(target=run, name='sheet-refresh', daemon=True).start()
+
+def get_sheet_snapshot(sheet_id, range_):
+    """Return this worker's copy of a range, syncing with the shared snapshot.
+
+    The local copy is trusted for SHEETS_LOCAL_TTL seconds. After that the
+    shared row's version is checked and the values are only re-parsed when
+    another worker stored new content. Snapshots older than
+    SHEETS_REFRESH_INTERVAL are served while one worker refreshes them.
+    """
+    key = (sheet_id, range_)
+    with _sheet_cache_lock:
+        cached = _sheet_cache.get(key)
+    if cached and time.monotonic() - cached.checked_at < app.config['SHEETS_LOCAL_TTL']:
+        return cached
+
+    row = db.session.query(SheetSnapshot.version, SheetSnapshot.fetched_at).filter_by(
+        sheet_id=sheet_id, range=range_).first()
+    if row is None:
+        return fetch_sheet_snapshot_once(sheet_id, range_)
+
+    if cached and cached.version == row.version:
+        cached.fetched_at = row.fetched_at
+        cached.checked_at = time.monotonic()
+    else:
+        values = db.session.query(SheetSnapshot.values).filter_by(sheet_id=sheet_id, range=range_).scalar()
+        cached = CachedSheet(json.loads(values), row.version, row.fetched_at)
+        with _sheet_cache_lock:
+            _sheet_cache[key] = cached
+
+    if datetime.utcnow() - row.fetched_at > timedelta(seconds=app.config['SHEETS_REFRESH_INTERVAL']):
+        schedule_sheet_refresh(sheet_id, range_)
+    return cached
+
+@app.route('/api/sheets/<path:range_>', methods=['GET'])
+@token_required
+def get_sheet_range(current_user, range_):
+    """Serve a sheet range from the shared cache.
+
+    Clients that send the ``ETag`` they hold as ``If-None-Match`` get a 304
+    when nothing changed. Adding ``known_rows`` asks for only the rows
+    appended since, when the rows they hold are still an unchanged prefix.
+    """
+    sheet_id = resolve_sheet_id(request.args.get('sheet'))
+    if sheet_id is None:
+        return jsonify({'message': 'Unknown sheet'}), 404
+    if not sheet_range_allowed(range_):
+        return jsonify({'message': 'Unknown range'}), 404
+
+    try:
+        cached = get_sheet_snapshot(sheet_id, range_)
+    except Exception as e:
+        logger.error("Sheet fetch failed for %s: %s", range_, e)
+        return jsonify({'message': 'Sheet data is unavailable'}), 503
+
+    etag = f'"{cached.version}"'
+    client_etag = (request.headers.get('If-None-Match') or '').strip()
+    if client_etag == etag:
+        metrics.inc('bolt_sheets_requests_total', {'kind': 'not_modified'})
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    start = 0
+    known_rows = request.args.get('known_rows', type=int)
+    if (client_etag and known_rows and 0 < known_rows <= len(cached.values)
+            and client_etag == f'"{cached.prefix_version(known_rows)}"'):
+        start = known_rows
+    metrics.inc('bolt_sheets_requests_total', {'kind': 'delta' if start else 'full'})
 
-        if brand_name or price:
+    response = jsonify({
+        'range': range_,
+        'version': cached.version,
+        'fetched_at': cached.fetched_at.isoformat(),
+        'delta': bool(start),
+        'start': start,
+        'values': cached.values[start:]
+    })
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Case overview
+app.config['CASES_RANGE'] = os.environ.get('CASES_RANGE', 'Unassigned Cases!A1:M')
+app.config['CASES_PAGE_SIZE'] = int(os.environ.get('CASES_PAGE_SIZE', 50))
+app.config['CASES_PAGE_SIZE_MAX'] = int(os.environ.get('CASES_PAGE_SIZE_MAX', 200))
+
+CASE_OTHER_QUEUES = {
+    'LM Riyadh', 'WareHouse_Al_Quoz', 'WareHouse - DIP', 'Courier DPT Special',
+    'Last Mile UAE Internal', 'Courier DPT', 'KSA ECOM PROCESSING', 'Digital Operations',
+    'Last Mile UAE', 'KSA ECOM RETURN', 'WareHouse - Riyadh', 'LM Jeddah', 'LM Dammam'
+}
+CASE_PRIORITIES = {'3 Hour', 'Same day', '2 Hour'}
+CASE_UNASSIGNED_OWNER = 'Internal Queue'
+CASE_DATE_FORMATS = ['%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+CASE_COMMENTATOR_RE = re.compile(r'Name=([^}]+)')
+
+def parse_case_date(value):
+    """Parse a sheet date into naive local time, or None when it is not a date."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        for fmt in CASE_DATE_FORMATS:
             try:
-                # Update cache with full price string and brand
-                c.execute('''INSERT OR REPLACE INTO scrape_cache (url, brand, price, timestamp)
-                            VALUES (?, ?, ?, ?)''', (url, brand_name, price, datetime.now()))
-                conn.commit()
-                print(f"Successfully cached data for {url}")
-            except sqlite3.Error as e:
-                print(f"Cache update error: {e}")
-                # Continue without caching if there's an error
-            
-            print(f"Successfully scraped data - Brand: {brand_name}, Price: {price}")
-            return jsonify({
-                'brand': brand_name,
-                'price': price,
-                'cached': False
-            })
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+class CaseIndex:
+    """Cases grouped from the case sheet, with lookups for the overview filters.
+
+    Built once per sheet version. Rows sharing a case number become one case
+    whose comments are sorted newest first. Positions into ``cases`` are
+    indexed by order number, owner, order status and priority, and
+    ``duplicate_groups`` lists the orders with more than one case.
+    """
+
+    def __init__(self, values, version):
+        self.version = version
+        self.cases = []
+        self.created = []
+        self.comment_dates = []
+        self.by_order = {}
+        self.by_owner = {}
+        self.by_status = {}
+        self.by_priority = {}
+
+        positions = {}
+        for row in values[1:]:
+            row = list(row) + [''] * (13 - len(row))
+            case_number = row[1]
+            position = positions.get(case_number)
+            if position is None:
+                position = positions[case_number] = len(self.cases)
+                self.cases.append({
+                    'orderNumber': row[0],
+                    'caseNumber': case_number,
+                    'description': row[2],
+                    'orderStatus': row[3],
+                    'createdDate': row[4],
+                    'ownerName': row[5],
+                    'subCategory': row[6],
+                    'priority': row[7],
+                    'feedbackType': row[8],
+                    'id': row[9],
+                    'comments': []
+                })
+            if row[10]:
+                match = CASE_COMMENTATOR_RE.search(row[12]) if row[12] else None
+                self.cases[position]['comments'].append({
+                    'text': row[10],
+                    'date': row[11],
+                    'by': match.group(1).strip() if match else ''
+                })
+
+        for position, case in enumerate(self.cases):
+            dated = [(parse_case_date(c['date']), c) for c in case['comments']]
+            dated.sort(key=lambda item: item[0] or datetime.min, reverse=True)
+            case['comments'] = [c for _, c in dated]
+            self.comment_dates.append([(c['by'], date) for date, c in dated])
+            self.created.append(parse_case_date(case['createdDate']))
+
+            self.by_owner.setdefault(case['ownerName'], []).append(position)
+            self.by_status.setdefault((case['orderStatus'] or '').lower(), []).append(position)
+            self.by_priority.setdefault(case['priority'], []).append(position)
+            if case['orderNumber']:
+                self.by_order.setdefault(case['orderNumber'], []).append(position)
+
+        self.duplicate_groups = [group for group in self.by_order.values() if len(group) > 1]
+
+    def positions_for(self, index, keys):
+        found = set()
+        for key in keys:
+            found.update(index.get(key, ()))
+        return sorted(found)
+
+    def group_duplicates(self, positions):
+        """Order positions into duplicate-order groups, dropping orders seen once."""
+        if len(positions) == len(self.cases):
+            groups = self.duplicate_groups
         else:
-            print("Brand name and price not found")
-            return jsonify({'error': 'Brand name and price not found'}), 404
+            by_order = {}
+            for position in positions:
+                order = self.cases[position]['orderNumber']
+                if order:
+                    by_order.setdefault(order, []).append(position)
+            groups = [group for group in by_order.values() if len(group) > 1]
+        markers = {}
+        flat = []
+        for group in groups:
+            for i, position in enumerate(group):
+                markers[position] = {
+                    'isGroupStart': i == 0,
+                    'isGroupEnd': i == len(group) - 1,
+                    'groupSize': len(group)
+                }
+                flat.append(position)
+        return flat, markers
+
+    def case_status_matches(self, position, status, team, tier2, day_ago):
+        created = self.created[position]
+        is_new = created is not None and created >= day_ago
+        comments = self.comment_dates[position]
+        if status == 'untouched':
+            return not any(by in team for by, _ in comments) and not is_new
+        if status == 'new':
+            return is_new and not any(by in tier2 for by, _ in comments)
+        if status == 'pending':
+            return (any(by in team for by, _ in comments)
+                    and not any(by in team and date and date >= day_ago for by, date in comments))
+        if status == 'active':
+            return any(by in tier2 and date and date >= day_ago for by, date in comments)
+        if status == 'priority':
+            return self.cases[position]['priority'] in CASE_PRIORITIES
+        return True
 
+_case_index = None
+_case_index_lock = threading.Lock()
+
+def get_case_index():
+    global _case_index
+    cached = get_sheet_snapshot(app.config['CASES_SHEET_ID'], app.config['CASES_RANGE'])
+    index = _case_index
+    if index is not None and index.version == cached.version:
+        return index, cached
+    with _case_index_lock:
+        if _case_index is None or _case_index.version != cached.version:
+            started = time.perf_counter()
+            _case_index = CaseIndex(cached.values, cached.version)
+            logger.debug("Built case index with %d cases in %.3fs", len(_case_index.cases), time.perf_counter() - started)
+        return _case_index, cached
+
+def case_team_members():
+    """Usernames in the Tier 2 team and in the Support team or department."""
+    tier2, support = set(), set()
+    teams = Team.query.options(db.selectinload(Team.members)).filter(
+        Team.name.in_(['Tier 2', 'Support', 'Support Department']))
+    for team in teams:
+        if team.name == 'Tier 2':
+            tier2.update(member.username for member in team.members)
+        elif team.name == 'Support' or team.is_department:
+            if team.is_department and team.manual_members:
+                support.update(name.strip() for name in team.manual_members.split(','))
+            else:
+                support.update(member.username for member in team.members)
+    return tier2, support
+
+@app.route('/api/cases', methods=['GET'])
+@token_required
+def get_cases(current_user):
+    """Filter and paginate the case overview server-side.
+
+    Filters mirror the CaseOverview page and are applied in its order:
+    ``owner`` (assigned, unassigned, other_queues or mine), ``high_priority``,
+    ``duplicates``, ``agent``, ``q`` over the fields in ``search_in``,
+    ``commenter``, ``status`` and ``order_status``. ``all=1`` returns every
+    matching case on one page, for selecting all of them.
+    """
+    try:
+        index, cached = get_case_index()
     except Exception as e:
-        print(f"Unexpected error in scrape_brand: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        logger.error("Case sheet load failed: %s", e)
+        return jsonify({'message': 'Case data is unavailable'}), 503
+
+    args = request.args
+    owner = args.get('owner')
+    agent = args.get('agent') or None
+    status = args.get('status', 'all')
+    page = max(args.get('page', 1, type=int), 1)
+    page_size = min(max(args.get('page_size', app.config['CASES_PAGE_SIZE'], type=int), 1),
+                    app.config['CASES_PAGE_SIZE_MAX'])
+
+    tier2 = support = set()
+    if owner == 'assigned' or status in ('untouched', 'new', 'pending', 'active'):
+        tier2, support = case_team_members()
+    team = tier2 | support
+
+    if owner == 'assigned':
+        positions = index.positions_for(index.by_owner, [agent] if agent else team)
+    elif owner == 'unassigned':
+        positions = index.by_owner.get(CASE_UNASSIGNED_OWNER, [])
+    elif owner == 'other_queues':
+        positions = index.positions_for(index.by_owner, CASE_OTHER_QUEUES)
+    elif owner == 'mine':
+        positions = index.by_owner.get(current_user.username, [])
+    else:
+        positions = range(len(index.cases))
+
+    if args.get('high_priority') in ('1', 'true'):
+        priority = set(index.positions_for(index.by_priority, CASE_PRIORITIES))
+        positions = [p for p in positions if p in priority and index.cases[p]['feedbackType'] == 'Internal']
+
+    markers = {}
+    if args.get('duplicates') in ('1', 'true'):
+        positions, markers = index.group_duplicates(list(positions))
+        if agent:
+            positions = [p for p in positions if index.cases[p]['ownerName'] == agent]
+
+    query = (args.get('q') or '').lower()
+    if query:
+        fields = set((args.get('search_in') or 'comments,description,subcategory').split(','))
+
+        def matches(case):
+            return (('subcategory' in fields and query in (case['subCategory'] or '').lower())
+                    or ('description' in fields and query in (case['description'] or '').lower())
+                    or ('comments' in fields and any(query in c['text'].lower() or query in c['by'].lower()
+                                                     for c in case['comments'])))
+        positions = [p for p in positions if matches(index.cases[p])]
+
+    commenter = args.get('commenter')
+    if commenter:
+        positions = [p for p in positions if any(by == commenter for by, _ in index.comment_dates[p])]
+
+    if status != 'all':
+        day_ago = datetime.now() - timedelta(hours=24)
+        positions = [p for p in positions if index.case_status_matches(p, status, team, tier2, day_ago)]
+
+    order_status = args.get('order_status', 'all')
+    if order_status != 'all':
+        wanted = set(index.by_status.get(order_status.lower(), ()))
+        positions = [p for p in positions if p in wanted]
+
+    positions = list(positions)
+    if args.get('all') in ('1', 'true'):
+        page, page_size = 1, max(len(positions), 1)
+    start = (page - 1) * page_size
+    results = []
+    for position in positions[start:start + page_size]:
+        case = index.cases[position]
+        if position in markers:
+            case = {**case, **markers[position]}
+        results.append(case)
+
+    return jsonify({
+        'cases': results,
+        'total': len(positions),
+        'page': page,
+        'page_size': page_size,
+        'version': cached.version,
+        'fetched_at': cached.fetched_at.isoformat()
+    })
+
+# Luxury brand classification
+app.config['BRANDS_RANGE'] = os.environ.get('BRANDS_RANGE', 'Brands!C2:C')
+app.config['BRANDS_CLASSIFY_MAX'] = int(os.environ.get('BRANDS_CLASSIFY_MAX', 1000))
+app.config['BRANDS_INDEX_REFRESH'] = float(os.environ.get('BRANDS_INDEX_REFRESH', 30))  # seconds between checks
+app.config['BRANDS_INDEX_MAX_BACKOFF'] = float(os.environ.get('BRANDS_INDEX_MAX_BACKOFF', 600))  # seconds
+app.config['BRANDS_INDEX_WAIT'] = float(os.environ.get('BRANDS_INDEX_WAIT', 15))  # seconds /api/brands/classify waits for a first build
+
+BRAND_PARENTHESES_RE = re.compile(r'\s*\([^)]*\)')
+BRAND_SPACES_RE = re.compile(r'\s+')
+BRAND_PUNCTUATION_RE = re.compile(r'[^\w\s]', re.ASCII)
+
+def normalize_brand_key(brand):
+    """Normalize a brand for matching: the frontend's normalizeBrandName after clean_brand_name."""
+    brand = clean_brand_name(brand)
+    if not brand:
+        return ''
+    brand = BRAND_PARENTHESES_RE.sub('', brand.strip().lower())
+    brand = BRAND_SPACES_RE.sub(' ', brand)
+    return BRAND_PUNCTUATION_RE.sub('', brand).strip()
+
+class BrandIndex:
+    """Normalized marketplace (luxury) brands from the Brands sheet, built once per version."""
+
+    def __init__(self, values, version):
+        self.version = version
+        self.brands = frozenset(filter(None, (normalize_brand_key(cell) for row in values for cell in row)))
+
+    def classify(self, brand):
+        key = normalize_brand_key(brand)
+        luxury = bool(key) and key in self.brands
+        return {
+            'brand': brand,
+            'normalized': key,
+            'luxury': luxury,
+            'item_type': 'marketplace' if luxury else 'own'
+        }
+
+_brand_index = None
+_brand_index_pid = None
+_brand_index_lock = threading.Lock()
+_brand_index_attempted = threading.Event()
+
+def refresh_brand_index():
+    """Rebuild this worker's brand index if the Brands sheet changed."""
+    global _brand_index
+    cached = get_sheet_snapshot(app.config['QC_SHEET_ID'], app.config['BRANDS_RANGE'])
+    if _brand_index is None or _brand_index.version != cached.version:
+        _brand_index = BrandIndex(cached.values, cached.version)
+        logger.debug("Built brand index with %d brands", len(_brand_index.brands))
+
+def ensure_brand_index_refresher():
+    """Keep the brand index fresh from a background thread, one per worker.
+
+    Requests only ever read the last good index. After a failed refresh the
+    next attempt backs off exponentially up to BRANDS_INDEX_MAX_BACKOFF.
+    """
+    global _brand_index_pid
+    if _brand_index_pid == os.getpid():
+        return
+    with _brand_index_lock:
+        if _brand_index_pid == os.getpid():
+            return
+        _brand_index_pid = os.getpid()
+        _brand_index_attempted.clear()
+
+        def run():
+            failures = 0
+            while True:
+                try:
+                    with app.app_context():
+                        refresh_brand_index()
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    logger.warning("Brand index refresh failed (%d in a row): %s", failures, e)
+                finally:
+                    _brand_index_attempted.set()
+                delay = app.config['BRANDS_INDEX_REFRESH']
+                if failures:
+                    delay = min(delay * 2 ** failures, app.config['BRANDS_INDEX_MAX_BACKOFF'])
+                time.sleep(delay)
+
+        threading.Thread(target=run, name='brand-index', daemon=True).start()
+
+def get_brand_index(wait=0):
+    """This worker's last good brand index, or None if none was built yet.
+
+    ``wait`` is how long to block for the first build attempt; the scrape
+    endpoints pass 0 so they never wait on the Brands sheet.
+    """
+    ensure_brand_index_refresher()
+    if _brand_index is None and wait:
+        _brand_index_attempted.wait(wait)
+    return _brand_index
+
+def classify_scrape_payloads(payloads):
+    """Add the luxury/item type classification to scraped payloads that have a brand.
+
+    Classification is left out, not failed, while no brand index is available.
+    """
+    index = get_brand_index()
+    if index is None:
+        return payloads
+    classified = []
+    for payload in payloads:
+        if payload.get('brand'):
+            result = index.classify(payload['brand'])
+            payload = dict(payload, luxury=result['luxury'], item_type=result['item_type'])
+        classified.append(payload)
+    return classified
+
+@app.route('/api/brands/classify', methods=['POST'])
+@token_required
+def classify_brands(current_user):
+    data = request.get_json(silent=True) or {}
+    brands = data.get('brands')
+    if not isinstance(brands, list):
+        return jsonify({'message': 'A list of brands is required'}), 400
+    if len(brands) > app.config['BRANDS_CLASSIFY_MAX']:
+        return jsonify({'message': f"At most {app.config['BRANDS_CLASSIFY_MAX']} brands per request"}), 400
+
+    index = get_brand_index(wait=app.config['BRANDS_INDEX_WAIT'])
+    if index is None:
+        return jsonify({'message': 'Brand data is unavailable'}), 503
+
+    return jsonify({
+        'results': [index.classify(brand if isinstance(brand, str) else '') for brand in brands],
+        'version': index.version
+    })
 
 # Health check endpoint
 @app.route('/api/health')
 def health_check():
     return jsonify({"status": "healthy", "message": "Backend is running"}), 200
 
+# Initialize the database
+with app.app_context():
+    try:
+        logger.info("Starting application initialization...")
+        init_db()
+        init_scrape_cache()
+        init_scrape_jobs()
+        logger.info("Application initialization completed successfully")
+    except Exception as e:
+        logger.error("Error during application initialization: %s", e)
+        raise e
+
 if __name__ == '__main__':
+    # Without gunicorn.conf.py nothing else starts the job process, so keep it
+    # running from here: in the reloader's child, which serves the requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from scrape_worker import ScrapeWorkerSupervisor
+        atexit.register(ScrapeWorkerSupervisor().start().stop)
     app.run(debug=True, host='0.0.0.0', port=5000)
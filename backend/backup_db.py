@@ -1,5 +1,5 @@
 import os
-import shutil
+import sqlite3
 from datetime import datetime
 import logging
 
@@ -17,8 +17,9 @@ def backup_database():
     # Get current timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # List of databases to backup
-    databases = ['dashboard.db', 'scrape_cache.db']
+    # List of databases to backup. Scraped results live in dashboard.db;
+    # scrape_cache.db only holds worker coordination state.
+    databases = ['dashboard.db']
     
     for db_name in databases:
         try:
@@ -34,8 +35,14 @@ def backup_database():
             backup_filename = f"{db_name[:-3]}_{timestamp}.db"
             backup_path = os.path.join(backup_dir, backup_filename)
             
-            # Create backup
-            shutil.copy2(source_path, backup_path)
+            # Create backup through SQLite so pages still in the WAL are included
+            source = sqlite3.connect(source_path)
+            target = sqlite3.connect(backup_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
             logging.info(f"Successfully created backup of {db_name} at {backup_path}")
             
             # Clean up old backups (keep last 5 for each database)
@@ -0,0 +1,341 @@
+"""Offline benchmark for the product scraping pipeline.
+
+Serves a corpus of product pages from a local HTTP server and runs them
+through the same helpers scrape_brand uses, timing each stage. Nothing
+touches ounass.ae unless --record is given.
+
+    python bench_scraper.py                       # generated corpus from SKUs.txt
+    python bench_scraper.py --corpus pages/       # saved *.html pages
+    python bench_scraper.py --record pages/ --pages 50
+    python bench_scraper.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ['fetch', 'fast_path', 'parse', 'brand_selectors', 'price_selectors', 'cache_write']
+
+BRANDS = ['Gucci', 'Saint Laurent', 'Valentino Garavani', 'Loewe', 'Bottega Veneta', 'Balenciaga',
+          'Jimmy Choo', 'Christian Louboutin', 'Off-White', 'Dolce & Gabbana', 'Max Mara', 'Mango']
+SUFFIXES = ['', ' NEW SEASON', ' NEW TO SALE', ' NEW']
+
+def load_skus():
+    path = os.path.join(BASE_DIR, '..', 'SKUs.txt')
+    try:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError:
+        return [str(217000000 + i) for i in range(200)]
+
+def _nav(links):
+    # Mega-menu markup: lots of brand links ahead of the product block
+    return '<nav class="mega-menu">' + ''.join(
+        f'<a href="/brands/{b.lower().replace(" ", "-")}-{i}">{b}</a>' for i, b in enumerate(links)
+    ) + '</nav>'
+
+def build_page(sku, variant, rng):
+    brand = rng.choice(BRANDS)
+    price = rng.randrange(150, 25000)
+    display = '{:,}'.format(price)
+    head = f'<title>{brand} product {sku} | Ounass UAE</title>'
+    body = ''
+    if variant == 'json_ld':
+        product = {
+            '@context': 'https://schema.org',
+            '@type': 'Product',
+            'sku': sku,
+            'name': f'{brand} item {sku}',
+            'brand': {'@type': 'Brand', 'name': brand},
+            'offers': {'@type': 'Offer', 'price': f'{price}.00', 'priceCurrency': 'AED'}
+        }
+        head += f'<script type="application/ld+json">{json.dumps(product)}</script>'
+    elif variant == 'meta':
+        head += (f'<meta property="og:brand" content="{brand}">'
+                 f'<meta property="product:price:amount" content="{price}">')
+    elif variant == 'state':
+        state = {'pdp': {'product': {'sku': sku, 'designerName': brand + rng.choice(SUFFIXES), 'price': price}}}
+        body += f'<script>window.__INITIAL_STATE__ = {json.dumps(state)};</script>'
+    # Every variant carries the visible product block the DOM selectors read;
+    # 'dom' pages have nothing else, which forces the full DOM fallback
+    body += _nav(rng.sample(BRANDS, 8))
+    body += (f'<div class="PDP"><nav class="breadcrumb"><a href="/">Home</a><a href="/women">Women</a></nav>'
+             f'<a href="/designers/{brand.lower().replace(" ", "-")}">{brand}{rng.choice(SUFFIXES)}</a>'
+             f'<h1 class="product-title">{brand} item {sku}</h1>'
+             f'<span class="PriceContainer-price">{display} AED</span></div>')
+    return f'<!DOCTYPE html><html><head>{head}</head><body>{body}</body></html>'
+
+def build_pathological_page(sku, kind, rng):
+    brand = rng.choice(BRANDS)
+    if kind == 'huge_nav':
+        # ~2MB of menu links and price-like spans before the product block
+        filler = _nav(BRANDS * 2000) + ''.join(
+            f'<span class="price-badge-{i}">{i}</span>' for i in range(20000))
+    else:
+        # Deeply nested wrappers, the kind of markup some page builders emit
+        filler = '<div class="wrapper">' * 2000 + '<span class="price-hint">x</span>' + '</div>' * 2000
+    return (f'<!DOCTYPE html><html><head><title>{sku}</title></head><body>{filler}'
+            f'<a href="/designers/{brand.lower()}">{brand}</a>'
+            f'<span class="PriceContainer-price">1,999 AED</span></body></html>')
+
+def generated_corpus(count, seed):
+    rng = random.Random(seed)
+    variants = ['json_ld', 'meta', 'state', 'dom']
+    corpus = {}
+    for i, sku in enumerate(load_skus()[:count]):
+        variant = variants[i % len(variants)]
+        corpus[f'{sku}.html'] = (variant, build_page(sku, variant, rng).encode())
+    corpus['large-nav.html'] = ('large', build_pathological_page('large-nav', 'huge_nav', rng).encode())
+    corpus['deep-nesting.html'] = ('large', build_pathological_page('deep-nesting', 'deep', rng).encode())
+    return corpus
+
+def directory_corpus(path):
+    corpus = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.html'):
+            with open(os.path.join(path, name), 'rb') as f:
+                corpus[name] = ('recorded', f.read())
+    return corpus
+
+def record_corpus(path, count, app_module):
+    """Save live product pages for the first ``count`` SKUs into ``path``."""
+    os.makedirs(path, exist_ok=True)
+    for sku in load_skus()[:count]:
+        url = app_module.resolve_scrape_url(sku)
+        try:
+            response = app_module.http_get(url)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Skipping {sku}: {e}", file=sys.stderr)
+            continue
+        with open(os.path.join(path, f'{sku}.html'), 'wb') as f:
+            f.write(response.content)
+        print(f"Recorded {url}", file=sys.stderr)
+
+def serve_corpus(corpus):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            page = corpus.get(self.path.lstrip('/'))
+            if page is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page[1])))
+            self.end_headers()
+            self.wfile.write(page[1])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def summarize(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 4),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'total_ms': round(sum(ordered) * 1000, 4)
+    }
+
+def run_pipeline(app_module, base_url, corpus, repeat, trace_memory=False):
+    timings = {stage: [] for stage in STAGES}
+    by_variant = {}
+    found = {'brand': 0, 'price': 0}
+    downloads = {}
+    brands = []
+    prices = []
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for name, (variant, _) in corpus.items():
+            url = f'{base_url}/{name}'
+            page_started = time.perf_counter()
+
+            # Streamed and read the way scrape_product_page reads it, so early
+            # stops and the byte cap show up in the fetch numbers
+            t = time.perf_counter()
+            response = app_module.http_get(url, stream=True)
+            page, outcome = app_module.read_product_page(response)
+            timings['fetch'].append(time.perf_counter() - t)
+            downloads[outcome] = downloads.get(outcome, 0) + 1
+
+            t = time.perf_counter()
+            result = app_module.extract_product_fast(page)
+            timings['fast_path'].append(time.perf_counter() - t)
+
+            if not (result['brand'] and result['price']):
+                t = time.perf_counter()
+                soup = app_module.parse_product_html(page)
+                timings['parse'].append(time.perf_counter() - t)
+                if not result['brand']:
+                    t = time.perf_counter()
+                    result['brand'], _ = app_module.select_brand(soup)
+                    timings['brand_selectors'].append(time.perf_counter() - t)
+                if not result['price']:
+                    t = time.perf_counter()
+                    result['price'], _ = app_module.select_price(soup)
+                    timings['price_selectors'].append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            app_module.store_scrape_result(url, result['brand'], result['price'])
+            timings['cache_write'].append(time.perf_counter() - t)
+
+            by_variant.setdefault(variant, []).append(time.perf_counter() - page_started)
+            for field in found:
+                if result[field]:
+                    found[field] += 1
+            if result['brand']:
+                brands.append(result['brand'])
+            if result['price']:
+                prices.append(result['price'])
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    pages = len(corpus) * repeat
+    return {
+        'pages': pages,
+        'elapsed_s': round(elapsed, 4),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else None,
+        'found': found,
+        'downloads': downloads,
+        'stages': {stage: summarize(samples) for stage, samples in timings.items()},
+        'per_variant': {variant: summarize(samples) for variant, samples in sorted(by_variant.items())},
+        'peak_traced_mb': round(peak / (1024 * 1024), 2) if peak is not None else None,
+        'micro': run_micro(app_module, brands, prices)
+    }
+
+def run_micro(app_module, brands, prices, rounds=20):
+    """Throughput of clean_brand_name and normalize_price over the values the corpus produced."""
+    results = {}
+    for name, func, values in (('clean_brand_name', app_module.clean_brand_name, [b + ' NEW SEASON' for b in brands]),
+                               ('normalize_price', app_module.normalize_price, prices)):
+        if not values:
+            continue
+        t = time.perf_counter()
+        for _ in range(rounds):
+            for value in values:
+                func(value)
+        elapsed = time.perf_counter() - t
+        results[name] = {'calls': rounds * len(values),
+                         'calls_per_sec': round(rounds * len(values) / elapsed, 1) if elapsed else None}
+    return results
+
+def compare(current, previous):
+    lines = [f"{'metric':<32}{'before':>14}{'after':>14}{'change':>10}"]
+
+    def row(label, before, after, higher_is_better=False):
+        if before in (None, 0) or after is None:
+            return
+        change = (after - before) / before * 100
+        if higher_is_better:
+            change = -change
+        lines.append(f"{label:<32}{before:>14}{after:>14}{change:>+9.1f}%")
+
+    row('pages_per_sec', previous.get('pages_per_sec'), current.get('pages_per_sec'), higher_is_better=True)
+    row('peak_traced_mb', previous.get('peak_traced_mb'), current.get('peak_traced_mb'))
+    for stage in STAGES:
+        row(f'{stage}.p50_ms', previous['stages'].get(stage, {}).get('p50_ms'),
+            current['stages'].get(stage, {}).get('p50_ms'))
+        row(f'{stage}.p95_ms', previous['stages'].get(stage, {}).get('p95_ms'),
+            current['stages'].get(stage, {}).get('p95_ms'))
+    return '\n'.join(lines) + '\n(change: negative is better)'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of saved *.html product pages (default: generated)')
+    parser.add_argument('--record', metavar='DIR', help='save live pages for SKUs.txt into DIR and exit')
+    parser.add_argument('--pages', type=int, default=200, help='SKUs to generate or record (default: 200)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus (default: 3)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='earlier JSON report to diff against')
+    args = parser.parse_args()
+
+    # Keep the app away from the real dashboard and cache databases
+    workdir = tempfile.mkdtemp(prefix='bolt-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'dashboard.db')}"
+    os.environ['SCRAPE_CACHE_PATH'] = os.path.join(workdir, 'scrape_cache.db')
+    os.environ['SCRAPE_JOBS_PATH'] = os.path.join(workdir, 'scrape_jobs.db')
+    os.environ['METRICS_DIR'] = os.path.join(workdir, 'metrics')
+    # Do not copy the real scrape_cache.db next to this file into the throwaway database
+    os.environ['SCRAPE_CACHE_IMPORT_LEGACY'] = 'false'
+    sys.path.insert(0, BASE_DIR)
+    try:
+        run_benchmark(args, parser)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_benchmark(args, parser):
+    # The app prints progress to stdout; keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        import app as app_module
+
+        if args.record:
+            record_corpus(args.record, args.pages, app_module)
+            return
+
+        corpus = directory_corpus(args.corpus) if args.corpus else generated_corpus(args.pages, args.seed)
+        if not corpus:
+            parser.error('the corpus is empty')
+        server = serve_corpus(corpus)
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        # One untimed pass so connection setup and imports do not skew the numbers
+        run_pipeline(app_module, base_url, dict(list(corpus.items())[:5]), 1)
+        report = run_pipeline(app_module, base_url, corpus, args.repeat)
+        # tracemalloc slows allocation-heavy parsing a lot, so measure memory in its own pass
+        memory = run_pipeline(app_module, base_url, corpus, 1, trace_memory=True)
+        report['peak_traced_mb'] = memory['peak_traced_mb']
+        server.shutdown()
+
+    report['corpus'] = {
+        'source': args.corpus or 'generated',
+        'documents': len(corpus),
+        'bytes': sum(len(body) for _, body in corpus.values())
+    }
+    report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    report['python'] = sys.version.split()[0]
+    report['created_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scrape_worker import ScrapeWorkerSupervisor
+
 workers = 4
+# Threads let a worker hold scrape job event streams open without blocking
+# other requests; each stream ends after SCRAPE_JOB_STREAM_TIMEOUT seconds
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 bind = "0.0.0.0:$PORT"
 timeout = 120
 accesslog = "-"
 errorlog = "-"
+
+def when_ready(server):
+    # Scrape jobs run in a separate process so the web workers stay free for requests
+    server.scrape_worker = ScrapeWorkerSupervisor().start()
+
+def on_exit(server):
+    scrape_worker = getattr(server, 'scrape_worker', None)
+    if scrape_worker is not None:
+        scrape_worker.stop()
@@ -0,0 +1,98 @@
+"""Run queued scrape jobs in their own process.
+
+gunicorn.conf.py (or ``python app.py``) keeps this running next to the web
+server through ScrapeWorkerSupervisor, so that scraping never ties up a web
+worker. It can also be run by hand:
+
+    python scrape_worker.py
+"""
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger('scrape_worker')
+
+class ScrapeWorkerSupervisor:
+    """Keep one scrape_worker.py process running, restarting it when it dies.
+
+    Restarts back off from ``restart_delay`` up to ``max_restart_delay``
+    seconds while the process keeps failing. Exit codes are not trusted:
+    gunicorn's arbiter reaps every child of the master, so ours may already
+    be gone by the time we wait for it. Nothing starts when
+    SCRAPE_JOB_WORKERS is 0.
+    """
+
+    def __init__(self, restart_delay=1, max_restart_delay=60):
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.process = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if int(os.environ.get('SCRAPE_JOB_WORKERS', 2)) == 0:
+            return self
+        threading.Thread(target=self._run, name='scrape-worker-supervisor', daemon=True).start()
+        return self
+
+    def _spawn(self):
+        with self._lock:
+            if self._stopping.is_set():
+                return None
+            self.process = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'scrape_worker.py')])
+            return self.process
+
+    def _run(self):
+        delay = self.restart_delay
+        while True:
+            started = time.monotonic()
+            process = self._spawn()
+            if process is None:
+                return
+            code = process.wait()
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - started >= self.max_restart_delay:
+                # It ran for a while before failing, so start over from the short delay
+                delay = self.restart_delay
+            logger.warning("Scrape worker exited with %s, restarting in %ss", code, delay)
+            if self._stopping.wait(delay):
+                return
+            delay = min(delay * 2, self.max_restart_delay)
+
+    def stop(self, timeout=10):
+        with self._lock:
+            self._stopping.set()
+            process = self.process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def exit_with_parent(interval=5):
+    """Exit once the supervising process is gone, instead of running on as an orphan."""
+    parent = os.getppid()
+
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(interval)
+        # Claimed items are picked up again once their claim expires
+        os._exit(0)
+
+    threading.Thread(target=watch, name='scrape-worker-parent', daemon=True).start()
+
+if __name__ == '__main__':
+    sys.path.insert(0, BACKEND_DIR)
+
+    from app import run_scrape_job_workers
+
+    exit_with_parent()
+    run_scrape_job_workers()
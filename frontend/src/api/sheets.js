@@ -0,0 +1,62 @@
+import { sheetsProxyUrl } from '../config';
+
+const MAX_RETRIES = 3;
+const INITIAL_RETRY_DELAY = 1000; // 1 second
+
+// The rows we already hold for a range, with the ETag the proxy gave them
+const storageKey = (range, sheet) => `sheetValues:${sheet}:${range}`;
+
+const loadHeld = (key) => {
+  try {
+    const held = JSON.parse(localStorage.getItem(key));
+    return held && held.etag && Array.isArray(held.values) ? held : null;
+  } catch (error) {
+    return null;
+  }
+};
+
+// Read a range through the backend proxy. When we hold an earlier copy the
+// proxy answers 304 if nothing changed, or sends only the appended rows.
+export const fetchSheetValues = async (range, sheet = 'qc', retryCount = 0) => {
+  const key = storageKey(range, sheet);
+  const held = loadHeld(key);
+  const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
+  let url = sheetsProxyUrl(range, sheet);
+  if (held) {
+    headers['If-None-Match'] = held.etag;
+    url += `&known_rows=${held.values.length}`;
+  }
+
+  let response;
+  try {
+    response = await fetch(url, { headers });
+  } catch (error) {
+    response = null;
+  }
+  if (response && response.status === 304 && held) {
+    return held.values;
+  }
+  if (!response || response.status === 503) {
+    if (retryCount >= MAX_RETRIES) {
+      throw new Error('Sheet data is unavailable');
+    }
+    const delay = INITIAL_RETRY_DELAY * Math.pow(2, retryCount);
+    await new Promise(resolve => setTimeout(resolve, delay));
+    return fetchSheetValues(range, sheet, retryCount + 1);
+  }
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const data = await response.json();
+  const values = data.delta && held
+    ? held.values.slice(0, data.start).concat(data.values)
+    : data.values;
+  try {
+    localStorage.setItem(key, JSON.stringify({ etag: response.headers.get('ETag'), values }));
+  } catch (error) {
+    // Out of storage: the next request simply fetches the full range again
+    localStorage.removeItem(key);
+  }
+  return values;
+};
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo, useCallback } from 'react';
+import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { utils, writeFile } from 'xlsx';
 
@@ -7,6 +7,7 @@ const API_URL = process.env.REACT_APP_API_URL;
 const CaseOverview = ({ initialFilter }) => {
     const [cases, setCases] = useState([]);
     const [searchQuery, setSearchQuery] = useState('');
+    const [debouncedSearchQuery, setDebouncedSearchQuery] = useState('');
     const [searchOptions, setSearchOptions] = useState({
         comments: true,
         description: true,
@@ -35,26 +36,13 @@ const CaseOverview = ({ initialFilter }) => {
     const [supportMembers, setSupportMembers] = useState([]);
     const [lastUpdate, setLastUpdate] = useState(null);
     const [selectedAgent, setSelectedAgent] = useState('');
+    const [totalCases, setTotalCases] = useState(0);
+    const seenCases = useRef(new Map());
     const POLLING_INTERVAL = 30000; // Poll every 30 seconds
-
-    const sheetId = process.env.REACT_APP_SHEET_ID;
-    const apiKey = process.env.REACT_APP_API_KEY;
-    const range = 'Unassigned Cases!A1:M';
-
-    useEffect(() => {
-        // Log all environment variables to see what's available
-        console.log('All environment variables:', {
-            API_URL,
-            sheetId,
-            apiKey,
-            range,
-            NODE_ENV: process.env.NODE_ENV
-        });
-    }, []);
+    const SEARCH_DEBOUNCE = 300; // ms after the last keystroke before searching
 
     const fetchTeams = async () => {
         try {
-            console.log('Fetching teams from:', `${API_URL}/api/teams`);
             const response = await axios.get(`${API_URL}/api/teams`, {
                 headers: {
                     'Authorization': `Bearer ${localStorage.getItem('token')}`
@@ -66,47 +54,69 @@ const CaseOverview = ({ initialFilter }) => {
         }
     };
 
+    // Search once typing pauses rather than on every keystroke
+    useEffect(() => {
+        const timeoutId = setTimeout(() => setDebouncedSearchQuery(searchQuery), SEARCH_DEBOUNCE);
+        return () => clearTimeout(timeoutId);
+    }, [searchQuery]);
+
+    // Filters and paging are applied by the backend, which returns one page at a time
+    const filterQuery = useMemo(() => {
+        const params = new URLSearchParams({
+            page_size: pageSize,
+            status: statusFilter,
+            order_status: orderStatusFilter
+        });
+        if (filters.assigned) {
+            params.set('owner', 'assigned');
+        } else if (filters.unassigned) {
+            params.set('owner', 'unassigned');
+        } else if (filters.otherQueues) {
+            params.set('owner', 'other_queues');
+        } else if (filters.myOpenCases && currentUser) {
+            params.set('owner', 'mine');
+        }
+        if (filters.highPriority) params.set('high_priority', '1');
+        if (filters.duplicates) params.set('duplicates', '1');
+        if (selectedAgent) params.set('agent', selectedAgent);
+        if (debouncedSearchQuery) {
+            params.set('q', debouncedSearchQuery);
+            params.set('search_in', Object.keys(searchOptions).filter(key => searchOptions[key]).join(',') || 'none');
+        }
+        if (selectedTier2Agent) params.set('commenter', selectedTier2Agent);
+        return params.toString();
+    }, [pageSize, statusFilter, orderStatusFilter, filters, currentUser, selectedAgent, debouncedSearchQuery, searchOptions, selectedTier2Agent]);
+
+    // New filters can shrink the result set, so start again from the first page.
+    // This runs during render so the old page is never fetched with the new filters.
+    const [pagedFilterQuery, setPagedFilterQuery] = useState(filterQuery);
+    if (pagedFilterQuery !== filterQuery) {
+        setPagedFilterQuery(filterQuery);
+        setCurrentPage(1);
+    }
+
+    const caseQuery = `${filterQuery}&page=${currentPage}`;
+
     const fetchData = async (isBackgroundUpdate = false) => {
         if (!isBackgroundUpdate) {
             setIsLoading(true);
         }
 
         try {
-            if (!sheetId || !apiKey) {
-                console.error('Missing environment variables:', {
-                    sheetId,
-                    apiKey,
-                    range
-                });
-                throw new Error('Missing required environment variables');
-            }
+            const response = await axios.get(`${API_URL}/api/cases?${caseQuery}`, {
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('token')}`
+                }
+            });
 
-            const sheetsAxios = axios.create();
-            const url = `https://sheets.googleapis.com/v4/spreadsheets/${sheetId}/values/${range}?key=${apiKey}`;
-            console.log('Fetching from URL:', url);
-            
-            const response = await sheetsAxios.get(url);
-            console.log('Google Sheets Response:', response.data);
-            
-            // Process the new data
-            const processedCases = processData(response.data);
-            
-            // Update the state with new data
-            setCases(processedCases);
-            setLastUpdate(new Date().toLocaleString());
+            // Remember every case we have shown so exports can span pages
+            response.data.cases.forEach(caseItem => seenCases.current.set(caseItem.caseNumber, caseItem));
 
-            // Cache the processed data
-            localStorage.setItem('caseOverviewData', JSON.stringify(processedCases));
-            localStorage.setItem('caseOverviewTimestamp', Date.now().toString());
+            setCases(response.data.cases);
+            setTotalCases(response.data.total);
+            setLastUpdate(new Date().toLocaleString());
         } catch (error) {
             console.error('Error fetching data:', error);
-            if (!isBackgroundUpdate) {
-                // Only use cache if this is not a background update and the fetch failed
-                const cachedData = localStorage.getItem('caseOverviewData');
-                if (cachedData) {
-                    setCases(JSON.parse(cachedData));
-                }
-            }
         } finally {
             if (!isBackgroundUpdate) {
                 setIsLoading(false);
@@ -175,7 +185,6 @@ const CaseOverview = ({ initialFilter }) => {
     }, [initialFilter]);
 
     useEffect(() => {
-        fetchData();
         fetchTeams();
     }, []);
 
@@ -199,80 +208,44 @@ const CaseOverview = ({ initialFilter }) => {
         return null;
     };
 
-    // Fetch team members
+    // Derive team members from the teams fetched on mount
     useEffect(() => {
-        const fetchTeamMembers = async () => {
-            try {
-                const response = await axios.get(`${API_URL}/api/teams`, {
-                    headers: {
-                        'Authorization': `Bearer ${localStorage.getItem('token')}`
-                    }
-                });
-                
-                // Find Tier 2 team
-                const tier2Team = response.data.find(team => team.name === 'Tier 2');
-                if (tier2Team) {
-                    const tier2Usernames = tier2Team.members.map(member => member.username);
-                    setTier2Members(tier2Usernames);
-                }
+        // Find Tier 2 team
+        const tier2Team = teams.find(team => team.name === 'Tier 2');
+        if (tier2Team) {
+            const tier2Usernames = tier2Team.members.map(member => member.username);
+            setTier2Members(tier2Usernames);
+        }
 
-                // Find Support team (could be a department)
-                const supportTeam = response.data.find(team => 
-                    team.name === 'Support' || 
-                    (team.name === 'Support Department' && team.is_department)
-                );
-                
-                if (supportTeam) {
-                    let supportUsernames = [];
-                    if (supportTeam.is_department && supportTeam.manual_members) {
-                        // For departments, get usernames from manual_members
-                        supportUsernames = supportTeam.manual_members.split(',').map(name => name.trim());
-                    } else {
-                        // For regular teams, get usernames from members array
-                        supportUsernames = supportTeam.members.map(member => member.username);
-                    }
-                    setSupportMembers(supportUsernames);
-                }
-            } catch (error) {
-                console.error('Error fetching team members');
+        // Find Support team (could be a department)
+        const supportTeam = teams.find(team => 
+            team.name === 'Support' || 
+            (team.name === 'Support Department' && team.is_department)
+        );
+        
+        if (supportTeam) {
+            let supportUsernames = [];
+            if (supportTeam.is_department && supportTeam.manual_members) {
+                // For departments, get usernames from manual_members
+                supportUsernames = supportTeam.manual_members.split(',').map(name => name.trim());
+            } else {
+                // For regular teams, get usernames from members array
+                supportUsernames = supportTeam.members.map(member => member.username);
             }
-        };
-
-        fetchTeamMembers();
-    }, []);
+            setSupportMembers(supportUsernames);
+        }
+    }, [teams]);
 
     useEffect(() => {
-        const loadInitialData = async () => {
-            // Always fetch fresh data first
-            await fetchData();
-            
-            // Set up polling for updates
-            const intervalId = setInterval(async () => {
-                await fetchData(true); // true flag for background update
-            }, POLLING_INTERVAL);
+        fetchData();
 
-            // Cleanup interval on unmount
-            return () => clearInterval(intervalId);
-        };
+        // Poll for updates with the current filters
+        const intervalId = setInterval(() => {
+            fetchData(true); // true flag for background update
+        }, POLLING_INTERVAL);
 
-        loadInitialData();
-    }, []);
-
-    useEffect(() => {
-        // Load cached data on mount
-        const cachedData = localStorage.getItem('caseOverviewData');
-        const cachedTimestamp = localStorage.getItem('caseOverviewTimestamp');
-        
-        if (cachedData && cachedTimestamp) {
-            const timestamp = parseInt(cachedTimestamp);
-            const now = Date.now();
-            // Use cached data if it's less than 5 minutes old
-            if (now - timestamp < 5 * 60 * 1000) {
-                setCases(JSON.parse(cachedData));
-                setIsLoading(false);
-            }
-        }
-    }, []);
+        return () => clearInterval(intervalId);
+    }, [caseQuery]);
 
     useEffect(() => {
         if (!filters.duplicates && !filters.assigned) {
@@ -327,69 +300,6 @@ const CaseOverview = ({ initialFilter }) => {
         }
     };
 
-    const processData = (data) => {
-        if (!data.values || data.values.length <= 1) return [];
-        
-        const headers = data.values[0];
-        const rows = data.values.slice(1);
-        
-        // Create a map to group cases and their comments
-        const casesMap = new Map();
-        
-        // Pre-compile regex for better performance
-        const nameRegex = /Name=([^}]+)/;
-        
-        rows.forEach(row => {
-            // Extract name from the commentator object more efficiently
-            let commentatorName = '';
-            const commentator = row[12];
-            
-            if (commentator) {
-                if (typeof commentator === 'string') {
-                    const match = commentator.match(nameRegex);
-                    commentatorName = match ? match[1].trim() : '';
-                } else if (commentator.Name) {
-                    commentatorName = commentator.Name;
-                }
-            }
-
-            const caseNumber = row[1];
-            
-            if (!casesMap.has(caseNumber)) {
-                casesMap.set(caseNumber, {
-                    orderNumber: row[0],
-                    caseNumber,
-                    description: row[2],
-                    orderStatus: row[3],
-                    createdDate: row[4],
-                    ownerName: row[5],
-                    subCategory: row[6],
-                    priority: row[7],
-                    feedbackType: row[8],
-                    id: row[9],
-                    comments: []
-                });
-            }
-
-            if (row[10]) { // If there's a comment
-                const existingCase = casesMap.get(caseNumber);
-                existingCase.comments.push({
-                    text: row[10],
-                    date: row[11],
-                    by: commentatorName
-                });
-            }
-        });
-
-        // Sort comments for each case by date (newest to oldest)
-        const processedCases = Array.from(casesMap.values());
-        processedCases.forEach(caseData => {
-            caseData.comments.sort((a, b) => new Date(b.date) - new Date(a.date));
-        });
-
-        return processedCases;
-    };
-
     const shouldShowCase = useCallback((caseItem, cases) => {
         if (!selectedAgent) return true;
         
@@ -405,170 +315,22 @@ const CaseOverview = ({ initialFilter }) => {
         return true;
     }, [selectedAgent, filters.duplicates, filters.assigned]);
 
-    const groupDuplicateCases = (cases) => {
-        const orderGroups = new Map();
-        cases.forEach(caseItem => {
-            if (caseItem.orderNumber) {
-                if (!orderGroups.has(caseItem.orderNumber)) {
-                    orderGroups.set(caseItem.orderNumber, []);
-                }
-                orderGroups.get(caseItem.orderNumber).push({
-                    ...caseItem,
-                    isGroupStart: false,
-                    isGroupEnd: false,
-                    groupSize: 0
-                });
-            }
-        });
-        
-        // Filter out groups with only one case and add group markers
-        const duplicateGroups = Array.from(orderGroups.values())
-            .filter(group => group.length > 1)
-            .map(group => {
-                return group.map((caseItem, index) => ({
-                    ...caseItem,
-                    isGroupStart: index === 0,
-                    isGroupEnd: index === group.length - 1,
-                    groupSize: group.length
-                }));
-            });
-            
-        // Flatten the groups while maintaining order
-        return duplicateGroups.flat();
-    };
-
-    const filterCases = useMemo(() => {
-        let filteredCases = [...cases];
-
-        // Apply owner filters first
-        if (filters.assigned) {
-            filteredCases = filteredCases.filter(caseItem => {
-                if (selectedAgent) {
-                    return caseItem.ownerName === selectedAgent;
-                }
-                return [...tier2Members, ...supportMembers].includes(caseItem.ownerName);
-            });
-        } else if (filters.unassigned) {
-            filteredCases = filteredCases.filter(caseItem => 
-                caseItem.ownerName === 'Internal Queue'
-            );
-        } else if (filters.otherQueues) {
-            filteredCases = filteredCases.filter(caseItem => 
-                otherQueuesList.includes(caseItem.ownerName)
-            );
-        } else if (filters.myOpenCases && currentUser) {
-            filteredCases = filteredCases.filter(caseItem => 
-                caseItem.ownerName === currentUser.username
-            );
-        }
-
-        // Apply priority filter
-        if (filters.highPriority) {
-            filteredCases = filteredCases.filter(caseItem => {
-                const isInternal = caseItem.feedbackType === 'Internal';
-                return isInternal && priorityList.includes(caseItem.priority);
-            });
-        }
-
-        // Apply duplicates filter
-        if (filters.duplicates) {
-            filteredCases = groupDuplicateCases(filteredCases);
-            if (selectedAgent) {
-                filteredCases = filteredCases.filter(caseItem => 
-                    caseItem.ownerName === selectedAgent
-                );
-            }
+    // Select every case matching the filters, not just the page on screen
+    const handleSelectAll = async (event) => {
+        if (!event.target.checked) {
+            setSelectedCases(new Set());
+            return;
         }
-
-        // Apply search filter
-        if (searchQuery) {
-            const searchLower = searchQuery.toLowerCase();
-            filteredCases = filteredCases.filter(caseItem => {
-                const matchesSubcategory = searchOptions.subcategory && 
-                    caseItem.subCategory?.toLowerCase().includes(searchLower);
-                const matchesDescription = searchOptions.description && 
-                    caseItem.description?.toLowerCase().includes(searchLower);
-                const matchesComments = searchOptions.comments && 
-                    caseItem.comments?.some(comment => 
-                        comment.text.toLowerCase().includes(searchLower) ||
-                        comment.by.toLowerCase().includes(searchLower)
-                    );
-                
-                return matchesSubcategory || matchesDescription || matchesComments;
+        try {
+            const response = await axios.get(`${API_URL}/api/cases?${caseQuery}&all=1`, {
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('token')}`
+                }
             });
-        }
-
-        // Apply Tier 2 comment filter
-        if (selectedTier2Agent) {
-            filteredCases = filteredCases.filter(caseItem =>
-                caseItem.comments?.some(comment => comment.by === selectedTier2Agent)
-            );
-        }
-
-        // Apply status filter
-        switch (statusFilter) {
-            case 'untouched':
-                filteredCases = filteredCases.filter(caseItem =>
-                    // No comments from Tier 2 or support agents AND created more than 24 hours ago
-                    !caseItem.comments?.some(comment => 
-                        [...tier2Members, ...supportMembers].includes(comment.by)
-                    ) &&
-                    !isWithinLast24Hours(caseItem.createdDate)
-                );
-                break;
-            case 'new':
-                filteredCases = filteredCases.filter(caseItem =>
-                    isWithinLast24Hours(caseItem.createdDate) && !hasTier2Comments(caseItem.comments || [])
-                );
-                break;
-            case 'pending':
-                filteredCases = filteredCases.filter(caseItem => {
-                    // Has comments from Tier 2 or support agents BUT none in the last 24 hours
-                    const hasTeamComments = caseItem.comments?.some(comment =>
-                        [...tier2Members, ...supportMembers].includes(comment.by)
-                    );
-                    const hasNoRecentTeamComments = !caseItem.comments?.some(comment =>
-                        [...tier2Members, ...supportMembers].includes(comment.by) &&
-                        isWithinLast24Hours(comment.date)
-                    );
-                    return hasTeamComments && hasNoRecentTeamComments;
-                });
-                break;
-            case 'active':
-                filteredCases = filteredCases.filter(caseItem =>
-                    hasRecentTier2Comments(caseItem.comments || [])
-                );
-                break;
-            case 'priority':
-                filteredCases = filteredCases.filter(caseItem =>
-                    priorityList.includes(caseItem.priority)
-                );
-                break;
-            default:
-                break;
-        }
-
-        // Apply order status filter
-        if (orderStatusFilter !== 'all') {
-            filteredCases = filteredCases.filter(caseItem =>
-                caseItem.orderStatus?.toLowerCase() === orderStatusFilter.toLowerCase()
-            );
-        }
-
-        return filteredCases;
-    }, [cases, searchQuery, searchOptions, filters, selectedAgent, statusFilter, orderStatusFilter, currentUser, otherQueuesList, priorityList, tier2Members, supportMembers, selectedTier2Agent]);
-
-    const getPaginatedCases = (cases) => {
-        const startIndex = (currentPage - 1) * pageSize;
-        return cases.slice(startIndex, startIndex + pageSize);
-    };
-
-    const handleSelectAll = (event) => {
-        if (event.target.checked) {
-            const allCaseIds = filterCases.map(caseItem => caseItem.caseNumber);
-            setSelectedCases(new Set(allCaseIds));
-        } else {
-            setSelectedCases(new Set());
+            response.data.cases.forEach(caseItem => seenCases.current.set(caseItem.caseNumber, caseItem));
+            setSelectedCases(new Set(response.data.cases.map(caseItem => caseItem.caseNumber)));
+        } catch (error) {
+            console.error('Error selecting all cases:', error);
         }
     };
 
@@ -590,7 +352,7 @@ const CaseOverview = ({ initialFilter }) => {
         
         // Transform the selected cases into the desired format
         const exportData = Array.from(selectedCases).map(caseId => {
-            const caseItem = cases.find(c => c.caseNumber === caseId);
+            const caseItem = seenCases.current.get(caseId);
             return {
                 'Case Number': caseItem.caseNumber || '',
                 'Subcategory': caseItem.subCategory || '',
@@ -634,7 +396,7 @@ const CaseOverview = ({ initialFilter }) => {
         };
     }, [tier2Members, supportMembers]);
 
-    const paginatedCases = getPaginatedCases(filterCases);
+    const paginatedCases = cases;
 
     const getCaseCategory = (caseItem) => {
         if (isWithinLast24Hours(caseItem.createdDate) && !hasTier2Comments(caseItem.comments || [])) {
@@ -783,7 +545,7 @@ const CaseOverview = ({ initialFilter }) => {
                         <div className="flex items-center">
                             <h1 className="text-2xl font-semibold text-gray-900">Case Overview</h1>
                             <span className="ml-3 inline-flex items-center justify-center h-6 px-3 text-sm font-medium rounded-full bg-blue-100 text-blue-800 translate-y-[1px]">
-                                {filterCases.length} {filterCases.length === 1 ? 'case' : 'cases'}
+                                {totalCases} {totalCases === 1 ? 'case' : 'cases'}
                             </span>
                         </div>
                         <div className="space-x-2">
@@ -1048,7 +810,7 @@ const CaseOverview = ({ initialFilter }) => {
                                 <div className="flex items-center gap-2">
                                     <input
                                         type="checkbox"
-                                        checked={selectedCases.size > 0 && selectedCases.size === filterCases.length}
+                                        checked={selectedCases.size > 0 && selectedCases.size === totalCases}
                                         onChange={handleSelectAll}
                                         className="h-4 w-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-500"
                                     />
@@ -1111,7 +873,7 @@ const CaseOverview = ({ initialFilter }) => {
                                                 Loading...
                                             </td>
                                         </tr>
-                                    ) : filterCases.length === 0 ? (
+                                    ) : cases.length === 0 ? (
                                         <tr>
                                             <td colSpan="5" className="px-3 py-2 text-center text-sm text-gray-500">
                                                 No cases found
@@ -1313,7 +1075,7 @@ const CaseOverview = ({ initialFilter }) => {
                     </div>
 
                     {/* Pagination Controls */}
-                    {filterCases.length > pageSize && (
+                    {totalCases > pageSize && (
                         <div className="mt-4 flex justify-center space-x-2">
                             <button
                                 onClick={() => setCurrentPage(prev => Math.max(1, prev - 1))}
@@ -1323,11 +1085,11 @@ const CaseOverview = ({ initialFilter }) => {
                                 Previous
                             </button>
                             <span className="px-4 py-2 text-sm font-medium text-gray-700">
-                                Page {currentPage} of {Math.ceil(filterCases.length / pageSize)}
+                                Page {currentPage} of {Math.ceil(totalCases / pageSize)}
                             </span>
                             <button
-                                onClick={() => setCurrentPage(prev => Math.min(Math.ceil(filterCases.length / pageSize), prev + 1))}
-                                disabled={currentPage >= Math.ceil(filterCases.length / pageSize)}
+                                onClick={() => setCurrentPage(prev => Math.min(Math.ceil(totalCases / pageSize), prev + 1))}
+                                disabled={currentPage >= Math.ceil(totalCases / pageSize)}
                                 className="px-4 py-2 text-sm font-medium text-gray-700 bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
                             >
                                 Next
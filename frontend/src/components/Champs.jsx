@@ -27,7 +27,7 @@ const Champs = () => {
   });
   const [memberFormData, setMemberFormData] = useState({
     teamId: '',
-    userId: ''
+    userIds: []
   });
 
   useEffect(() => {
@@ -116,13 +116,13 @@ const Champs = () => {
     e.preventDefault();
     setLoading(true);
     try {
-      await axios.post(
-        `/api/teams/${memberFormData.teamId}/members`,
-        { userId: memberFormData.userId }
+      const response = await axios.post(
+        `/api/teams/${memberFormData.teamId}/members/bulk`,
+        { userIds: memberFormData.userIds.map(Number) }
       );
-      setSuccess('Member added successfully');
+      setSuccess(`${response.data.added} member(s) added successfully`);
       setIsMemberModalOpen(false);
-      setMemberFormData({ teamId: '', userId: '' });
+      setMemberFormData({ teamId: '', userIds: [] });
       fetchTeams();
     } catch (error) {
       console.error('Error adding member:', error.message);
@@ -177,10 +177,10 @@ const Champs = () => {
     if (team) {
       setMemberFormData({
         teamId: team.id.toString(),
-        userId: ''
+        userIds: []
       });
     } else {
-      setMemberFormData({ teamId: '', userId: '' });
+      setMemberFormData({ teamId: '', userIds: [] });
     }
     setIsMemberModalOpen(true);
   };
@@ -642,18 +642,22 @@ const Champs = () => {
 
                     <div className="sm:col-span-6">
                       <label htmlFor="userId" className="block text-sm font-medium text-gray-700">
-                        Select User
+                        Select Users
                       </label>
                       <div className="mt-1">
                         <select
                           id="userId"
                           name="userId"
-                          value={memberFormData.userId}
-                          onChange={(e) => setMemberFormData({ ...memberFormData, userId: e.target.value })}
+                          multiple
+                          size={8}
+                          value={memberFormData.userIds}
+                          onChange={(e) => setMemberFormData({
+                            ...memberFormData,
+                            userIds: Array.from(e.target.selectedOptions, (option) => option.value)
+                          })}
                           className="mt-1 block w-full rounded-md border border-gray-200 px-3 py-2 text-sm focus:outline-none focus:ring-1 focus:ring-indigo-500 focus:border-indigo-500 disabled:bg-gray-50 disabled:text-gray-500"
                           required
                         >
-                          <option value="">Select a user</option>
                           {users.map((user) => (
                             <option key={user.id} value={user.id}>
                               {user.username}
@@ -670,7 +674,7 @@ const Champs = () => {
                       className="w-full inline-flex justify-center rounded-md border border-transparent shadow-sm px-4 py-2 bg-indigo-600 text-base font-medium text-white hover:bg-indigo-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 sm:col-start-2 sm:text-sm"
                       disabled={loading}
                     >
-                      {loading ? 'Adding...' : 'Add Member'}
+                      {loading ? 'Adding...' : 'Add Members'}
                     </button>
                     <button
                       type="button"
@@ -17,6 +17,8 @@ import EligibilityChecker from './EligibilityChecker'; // Import the new Eligibi
 
 const Dashboard = () => {
   const [activities, setActivities] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [user, setUser] = useState(JSON.parse(localStorage.getItem('user')));
   const [activeTab, setActiveTab] = useState('dashboard');
   const navigate = useNavigate();
@@ -44,7 +46,8 @@ const Dashboard = () => {
         }
 
         const response = await axios.get('/api/activities');
-        setActivities(response.data);
+        setActivities(response.data.activities);
+        setNextCursor(response.data.next_cursor);
       } catch (error) {
         if (error.response?.status === 403) {
           // User doesn't have permission - silently fail
@@ -59,6 +62,20 @@ const Dashboard = () => {
     }
   }, [isAuthenticated, navigate]);
 
+  const loadMoreActivities = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get('/api/activities', { params: { cursor: nextCursor } });
+      setActivities(prev => [...prev, ...response.data.activities]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching activities');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLogout = async () => {
     try {
       await axios.post('/api/logout');
@@ -151,6 +168,17 @@ const Dashboard = () => {
                   ))}
                 </ul>
               )}
+              {nextCursor && (
+                <div className="px-4 py-4 text-center border-t border-gray-200">
+                  <button
+                    onClick={loadMoreActivities}
+                    disabled={loadingMore}
+                    className="text-sm font-medium text-indigo-600 hover:text-indigo-500 disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load older activities'}
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         ) : <AccessDenied />;
@@ -2,7 +2,8 @@ import React, { useState, useEffect, Fragment } from 'react';
 import { DocumentDuplicateIcon, ExclamationTriangleIcon, DocumentTextIcon } from '@heroicons/react/24/outline';
 import { Listbox, Transition } from '@headlessui/react';
 import { CheckIcon, ChevronUpDownIcon, ClipboardDocumentIcon } from '@heroicons/react/20/solid';
-import { GOOGLE_SHEETS_CONFIG } from '../config';
+import { API_URL, GOOGLE_SHEETS_CONFIG } from '../config';
+import { fetchSheetValues } from '../api/sheets';
 
 const EligibilityChecker = () => {
   const itemTypeOptions = [
@@ -64,13 +65,11 @@ const EligibilityChecker = () => {
         }
       }
 
-      const url = `https://sheets.googleapis.com/v4/spreadsheets/${GOOGLE_SHEETS_CONFIG.QC_SHEET_ID}/values/${GOOGLE_SHEETS_CONFIG.BRANDS_RANGE}?key=${GOOGLE_SHEETS_CONFIG.API_KEY}`;
-      const response = await fetch(url);
-      const data = await response.json();
+      const values = await fetchSheetValues(GOOGLE_SHEETS_CONFIG.BRANDS_RANGE);
 
-      if (data.values) {
+      if (values) {
         const brands = new Set();
-        data.values.forEach(row => {
+        values.forEach(row => {
           // Using only the first (and only) column for Marketplace brands
           if (row[0]) brands.add(normalizeBrandName(row[0]));
         });
@@ -108,11 +107,8 @@ const EligibilityChecker = () => {
 
   const isLuxuryBrand = (brandName) => {
     if (!brandName) return false;
-    const normalizedInput = normalizeBrandName(brandName);
-    // Convert Set to Array, normalize each brand name, and check if any match
-    return [...luxuryBrands].some(brand => 
-      normalizeBrandName(brand) === normalizedInput
-    );
+    // luxuryBrands already holds normalized names
+    return luxuryBrands.has(normalizeBrandName(brandName));
   };
 
   useEffect(() => {
@@ -481,7 +477,7 @@ Requires COGS Coverage: ${result.requiresCogsCoverage}
   const handleSkuChange = async (sku) => {
     setLoading(true);
     try {
-      const response = await fetch('http://localhost:5000/api/scrape-brand', {
+      const response = await fetch(`${API_URL}/api/scrape-brand`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -510,7 +506,8 @@ Requires COGS Coverage: ${result.requiresCogsCoverage}
           ...prev,
           brandName: data.brand,
           originalPrice: data.price || prev.originalPrice,
-          itemType: isLuxuryBrand(data.brand) ? 'marketplace' : 'own',
+          // The backend classifies scraped brands; fall back to the local list if it could not
+          itemType: data.item_type || (isLuxuryBrand(data.brand) ? 'marketplace' : 'own'),
           isItemTypeEditable: false
         }));
       }
@@ -526,32 +523,21 @@ Requires COGS Coverage: ${result.requiresCogsCoverage}
     }
   };
 
-  const fetchExceptionLimitEmails = async () => {
+  const fetchExceptionLimit = async (email) => {
     try {
-      const url = `https://sheets.googleapis.com/v4/spreadsheets/${GOOGLE_SHEETS_CONFIG.QC_SHEET_ID}/values/ExceptionLimit!A2:B?key=${GOOGLE_SHEETS_CONFIG.API_KEY}`;
-      const response = await fetch(url);
-      const data = await response.json();
+      const response = await fetch(`${API_URL}/api/exception-limit/${encodeURIComponent(email)}`, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('token')}`
+        }
+      });
 
-      if (data.values) {
-        const emailCounts = {};
-        const emailValues = {};
-        data.values.forEach(row => {
-          const email = row[0];
-          const value = parseFloat(row[1]) || 0;
-          if (email) {
-            emailCounts[email] = (emailCounts[email] || 0) + 1;
-            // Maintain numeric value for calculation
-            emailValues[email] = (emailValues[email] || 0) + value;
-          }
-        });
-        return { emailCounts, emailValues };
-      } else {
-        console.error("Error fetching exception limit emails: Data values not found");
-        return { emailCounts: {}, emailValues: {} };
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
       }
+      return await response.json();
     } catch (error) {
-      console.error("Error fetching exception limit emails:", error);
-      return { emailCounts: {}, emailValues: {} };
+      console.error("Error fetching exception limit:", error);
+      return { match: false, count: 0, total_value: 0 };
     }
   };
 
@@ -563,16 +549,14 @@ Requires COGS Coverage: ${result.requiresCogsCoverage}
       return;
     }
 
-    const { emailCounts, emailValues } = await fetchExceptionLimitEmails();
-    const match = emailToCheck in emailCounts;
+    const { match, count, total_value } = await fetchExceptionLimit(emailToCheck);
     
     // Set email match and count
     setEmailMatch(match);
-    setEmailCount(match ? emailCounts[emailToCheck] : 0);
+    setEmailCount(count);
     
     // Set total exception value, maintaining numeric value for calculations
-    const exceptionValue = match ? emailValues[emailToCheck] : 0;
-    setTotalExceptionValue(exceptionValue);
+    setTotalExceptionValue(total_value);
   };
 
   const handleEmailChange = (e) => {
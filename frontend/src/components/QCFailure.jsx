@@ -1,7 +1,8 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { MagnifyingGlassIcon, ArrowDownTrayIcon, CheckCircleIcon, XCircleIcon, ExclamationTriangleIcon, FunnelIcon, ChevronUpIcon, ChevronDownIcon } from '@heroicons/react/24/outline';
 import * as XLSX from 'xlsx';
-import { GOOGLE_SHEETS_CONFIG } from '../config';
+import { API_URL, GOOGLE_SHEETS_CONFIG } from '../config';
+import { fetchSheetValues } from '../api/sheets';
 
 const QCFailure = () => {
   const [cases, setCases] = useState([]);
@@ -30,46 +31,12 @@ const QCFailure = () => {
   const [currentUndecidedIndex, setCurrentUndecidedIndex] = useState(0);
   const caseRefs = useRef({});
 
-  const { QC_SHEET_ID, SHEET_RANGE, BRANDS_RANGE, API_KEY } = GOOGLE_SHEETS_CONFIG;
+  const { SHEET_RANGE, BRANDS_RANGE } = GOOGLE_SHEETS_CONFIG;
 
   const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes in milliseconds
   const MAX_RETRIES = 3;
   const INITIAL_RETRY_DELAY = 1000; // 1 second
 
-  const fetchWithRetry = async (url, options = {}, retryCount = 0) => {
-    try {
-      const response = await fetch(url, options);
-      
-      if (response.status === 429) {
-        if (retryCount >= MAX_RETRIES) {
-          throw new Error('Max retries reached for rate limit');
-        }
-        
-        // Exponential backoff with jitter
-        const delay = INITIAL_RETRY_DELAY * Math.pow(2, retryCount) + Math.random() * 1000;
-        await new Promise(resolve => setTimeout(resolve, delay));
-        
-        return fetchWithRetry(url, options, retryCount + 1);
-      }
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      
-      return response.json();
-    } catch (error) {
-      if (retryCount >= MAX_RETRIES) {
-        throw error;
-      }
-      
-      // Exponential backoff for network errors
-      const delay = INITIAL_RETRY_DELAY * Math.pow(2, retryCount);
-      await new Promise(resolve => setTimeout(resolve, delay));
-      
-      return fetchWithRetry(url, options, retryCount + 1);
-    }
-  };
-
   const getProductUrl = (sku) => `https://ounass.ae/${sku}.html`;
 
   const clearDecisions = () => {
@@ -89,12 +56,10 @@ const QCFailure = () => {
     console.log('Cleared scraping cache');
   };
 
-  const scrapeBrandName = async (url, retryCount = 0) => {
-    const maxRetries = 3;
-    const retryDelay = 1000; // 1 second
-
+  // The backend paces requests to the origin and retries 429/5xx itself
+  const scrapeBrandName = async (url) => {
     try {
-      const response = await fetch('http://localhost:5000/api/scrape-brand', {
+      const response = await fetch(`${API_URL}/api/scrape-brand`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -118,82 +83,136 @@ const QCFailure = () => {
         cached: data.cached
       };
     } catch (error) {
-      console.error(`Error scraping brand (attempt ${retryCount + 1}/${maxRetries}):`, error);
-      
-      if (retryCount < maxRetries - 1) {
-        await new Promise(resolve => setTimeout(resolve, retryDelay * Math.pow(2, retryCount)));
-        return scrapeBrandName(url, retryCount + 1);
-      }
-
-      // On final failure, don't cache the failure anymore
+      console.error('Error scraping brand:', error);
       return { brand: null, price: null, error: error.message };
     }
   };
 
-  const fetchBrandNames = async (products) => {
-    const uniqueProducts = [...new Set(products)];
-    const batchSize = 3; // Reduced batch size to 3
-    const failureCache = {};
-    const failureCacheTimeout = 5 * 60 * 1000; // Reduced to 5 minutes
-    
-    for (let i = 0; i < uniqueProducts.length; i += batchSize) {
-      const batch = uniqueProducts.slice(i, i + batchSize);
-      const promises = batch.map(async (sku) => {
-        const url = getProductUrl(sku);
-        
-        // Check if we already have the data in state
-        if (brandNames[url] && productPrices[url]) {
-          return;
-        }
+  const applyScrapeResults = (results) => {
+    const newBrands = {};
+    const newPrices = {};
+    results.forEach(({ url, brand, price, error }) => {
+      if (brand) newBrands[url] = brand;
+      if (price) newPrices[url] = price;
+      if (error) console.warn(`Failed to scrape data for ${url}: ${error}`);
+    });
 
-        // Check if we have a recent failure for this URL
-        const failureData = failureCache[url];
-        if (failureData && Date.now() - failureData.timestamp < failureCacheTimeout) {
-          console.log(`Skipping recently failed URL: ${url}`);
+    if (Object.keys(newBrands).length > 0) {
+      setBrandNames(prev => {
+        const updated = { ...prev, ...newBrands };
+        localStorage.setItem('brandNames', JSON.stringify(updated));
+        return updated;
+      });
+    }
+    if (Object.keys(newPrices).length > 0) {
+      setProductPrices(prev => {
+        const updated = { ...prev, ...newPrices };
+        localStorage.setItem('productPrices', JSON.stringify(updated));
+        return updated;
+      });
+    }
+  };
+
+  // Follow a backend scrape job's event stream until it ends. The server closes
+  // each stream after a while, so reconnect from the last event we saw.
+  const followScrapeJob = async (jobId) => {
+    let lastEventId = 0;
+    let retries = 0;
+
+    while (retries < MAX_RETRIES) {
+      try {
+        const response = await fetch(`${API_URL}/api/scrape-jobs/${jobId}/events`, {
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem('token')}`,
+            'Last-Event-ID': String(lastEventId),
+          },
+        });
+
+        if (response.status === 404) {
+          localStorage.removeItem('scrapeJobId');
           return;
         }
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
 
-        const { brand, price, error } = await scrapeBrandName(url);
-        
-        if (brand || price) {
-          if (brand) {
-            setBrandNames(prev => {
-              const updated = {
-                ...prev,
-                [url]: brand
-              };
-              localStorage.setItem('brandNames', JSON.stringify(updated));
-              return updated;
-            });
-          }
-          if (price) {
-            setProductPrices(prev => {
-              const updated = {
-                ...prev,
-                [url]: price
-              };
-              localStorage.setItem('productPrices', JSON.stringify(updated));
-              return updated;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          const events = buffer.split('\n\n');
+          buffer = events.pop();
+          for (const block of events) {
+            const event = { type: 'message', data: '' };
+            block.split('\n').forEach(line => {
+              if (line.startsWith('id: ')) lastEventId = parseInt(line.slice(4), 10);
+              else if (line.startsWith('event: ')) event.type = line.slice(7);
+              else if (line.startsWith('data: ')) event.data += line.slice(6);
             });
+
+            if (event.type === 'item') {
+              applyScrapeResults([JSON.parse(event.data)]);
+            } else if (event.type === 'progress' && JSON.parse(event.data).status === 'stalled') {
+              console.warn('Scrape job is waiting for the job worker to come back');
+            } else if (event.type === 'end') {
+              localStorage.removeItem('scrapeJobId');
+              return;
+            }
           }
-        } else if (error) {
-          console.warn(`Failed to scrape data for ${url}: ${error}`);
-          // Store failure in memory but not in localStorage
-          failureCache[url] = {
-            timestamp: Date.now(),
-            error: error
-          };
         }
+        retries = 0;
+      } catch (error) {
+        console.error('Error following scrape job:', error);
+        retries += 1;
+        await new Promise(resolve => setTimeout(resolve, INITIAL_RETRY_DELAY * Math.pow(2, retries)));
+      }
+    }
+  };
+
+  const fetchBrandNames = async (products) => {
+    const uniqueProducts = [...new Set(products)].filter(sku => {
+      const url = getProductUrl(sku);
+      // Skip products we already have the data for in state
+      return !(brandNames[url] && productPrices[url]);
+    });
+    if (uniqueProducts.length === 0) return;
+
+    try {
+      // The backend runs the scrape as a job, so it keeps going if this tab closes
+      const response = await fetch(`${API_URL}/api/scrape-jobs`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${localStorage.getItem('token')}`
+        },
+        body: JSON.stringify({ items: uniqueProducts.map(getProductUrl) }),
       });
 
-      await Promise.all(promises);
-      // Increased delay between batches to 2 seconds
-      if (i + batchSize < uniqueProducts.length) {
-        await new Promise(resolve => setTimeout(resolve, 2000));
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
       }
+
+      const job = await response.json();
+      localStorage.setItem('scrapeJobId', job.id);
+      await followScrapeJob(job.id);
+    } catch (error) {
+      console.error('Error starting scrape job:', error);
     }
   };
 
+  // Pick up a scrape job that was still running when the page was reloaded
+  useEffect(() => {
+    const jobId = localStorage.getItem('scrapeJobId');
+    if (jobId) {
+      followScrapeJob(jobId);
+    }
+  }, []);
+
   const fetchLuxuryBrands = async () => {
     try {
       // Check cache first
@@ -209,12 +228,11 @@ const QCFailure = () => {
         }
       }
 
-      const url = `https://sheets.googleapis.com/v4/spreadsheets/${QC_SHEET_ID}/values/${BRANDS_RANGE}?key=${API_KEY}`;
-      const data = await fetchWithRetry(url);
+      const values = await fetchSheetValues(BRANDS_RANGE);
 
-      if (data.values) {
+      if (values) {
         const brands = new Set();
-        data.values.forEach(row => {
+        values.forEach(row => {
           if (row[0]) brands.add(normalizeBrandName(row[0]));
           if (row[1]) brands.add(normalizeBrandName(row[1]));
         });
@@ -251,10 +269,9 @@ const QCFailure = () => {
         }
       }
 
-      const url = `https://sheets.googleapis.com/v4/spreadsheets/${QC_SHEET_ID}/values/${SHEET_RANGE}?key=${API_KEY}`;
-      const data = await fetchWithRetry(url);
+      const values = await fetchSheetValues(SHEET_RANGE);
 
-      if (!data.values) {
+      if (!values) {
         throw new Error("No data found in the sheet.");
       }
 
@@ -262,7 +279,7 @@ const QCFailure = () => {
       const uniqueCases = {};
       const allProducts = new Set();
       
-      data.values.forEach((row) => {
+      values.forEach((row) => {
         const caseId = row[0];
         
         if (!uniqueCases[caseId]) {
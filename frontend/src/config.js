@@ -11,3 +11,7 @@ export const GOOGLE_SHEETS_CONFIG = {
   SHEET_RANGE: process.env.REACT_APP_SHEET_RANGE || 'Final view!A1:E',
   BRANDS_RANGE: process.env.REACT_APP_BRANDS_RANGE || 'Brands!C2:C'
 };
+
+// Sheet ranges are read through the backend's shared cache instead of the Sheets API
+export const sheetsProxyUrl = (range, sheet = 'qc') =>
+  `${API_URL}/api/sheets/${encodeURIComponent(range)}?sheet=${sheet}`;